@@ -0,0 +1,109 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2024 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+#
+
+# Measure the startup time of the cli tools: the time to import lib389 and
+# the time to run "--help". The timings are logged so they can be tracked
+# between runs, set CLI_STARTUP_RUNS to change the number of measures.
+
+import os
+import ast
+import sys
+import time
+import logging
+import statistics
+import subprocess
+import pytest
+
+log = logging.getLogger(__name__)
+
+SBIN_DIR = os.environ.get('CLI_STARTUP_SBIN', '/usr/sbin')
+NB_RUNS = int(os.environ.get('CLI_STARTUP_RUNS', '10'))
+
+# Print the cli modules loaded once the parser of a tool is built
+LOADED_MODULES = """
+import runpy, sys
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_path(sys.argv[0], run_name='cli_startup')
+except SystemExit:
+    pass
+print(sorted(m for m in sys.modules if m.startswith('lib389.cli_')))
+"""
+
+
+def measure(cmd):
+    values = []
+    for _ in range(NB_RUNS):
+        start_time = time.time()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        values.append(time.time() - start_time)
+    return {'cmd': ' '.join(cmd),
+            'median': statistics.median(values),
+            'min': min(values),
+            'max': max(values)}
+
+
+def loaded_cli_modules(tool, *args):
+    cmd = [sys.executable, '-c', LOADED_MODULES, os.path.join(SBIN_DIR, tool), *args]
+    result = subprocess.run(cmd, capture_output=True, check=True, encoding='utf-8')
+    return ast.literal_eval(result.stdout.splitlines()[-1])
+
+
+def test_cli_startup_time():
+    """Measure the startup time of dsconf, dsctl and dsidm
+
+    :id: 0d6c1b6e-5f0a-4d57-9a3c-4b1e39e2f7a1
+    :setup: No instance is needed
+    :steps:
+        1. Measure the import time of lib389
+        2. Measure the time of "--help" for each cli tool
+    :expectedresults:
+        1. Success
+        2. Success
+    """
+    results = [measure([sys.executable, '-c', 'import lib389'])]
+    for tool in ('dsconf', 'dsctl', 'dsidm'):
+        results.append(measure([sys.executable, os.path.join(SBIN_DIR, tool), '--help']))
+    for res in results:
+        log.info(f"{res['cmd']}: median {res['median']:.3f}s "
+                 f"(min {res['min']:.3f}s, max {res['max']:.3f}s)")
+
+
+def test_cli_lazy_subcommands():
+    """Check the cli tools only import the modules of the used subcommand
+
+    :id: 6a2f8b90-1c3e-4c8d-b7a4-2e5d9f0c3a17
+    :setup: No instance is needed
+    :steps:
+        1. Build the parser of dsconf, dsctl and dsidm for "--help"
+        2. Build the parser of a subcommand of each tool
+        3. Build the parser of the alias of a subcommand
+    :expectedresults:
+        1. No subcommand module is imported
+        2. Only the module of the subcommand is imported
+        3. The module of the subcommand is imported
+    """
+    for tool, pkg in (('dsconf', 'lib389.cli_conf'), ('dsctl', 'lib389.cli_ctl'), ('dsidm', 'lib389.cli_idm')):
+        modules = loaded_cli_modules(tool, '--help')
+        assert [m for m in modules if m.startswith(pkg + '.') and m != 'lib389.cli_ctl.nsstate'] == []
+
+    modules = loaded_cli_modules('dsconf', 'localhost', 'backend', 'suffix', 'list')
+    assert [m for m in modules if m.startswith('lib389.cli_conf.')] == ['lib389.cli_conf.backend']
+    modules = loaded_cli_modules('dsctl', 'localhost', 'healthcheck', '--help')
+    assert 'lib389.cli_ctl.health' in modules
+    assert 'lib389.cli_ctl.dbtasks' not in modules
+    modules = loaded_cli_modules('dsidm', 'localhost', 'ou', 'list')
+    assert [m for m in modules if m.startswith('lib389.cli_idm.')] == ['lib389.cli_idm.organizationalunit']
+
+
+if __name__ == '__main__':
+    # Run isolated
+    # -s for DEBUG mode
+    CURRENT_FILE = os.path.realpath(__file__)
+    pytest.main("-s %s" % CURRENT_FILE)
@@ -6,6 +6,7 @@
 # See LICENSE for details.
 # --- END COPYRIGHT BLOCK ---
 #
+import gzip
 import time
 import subprocess
 import pytest
@@ -133,6 +134,65 @@ def test_dsconf_dbgen_users(topology_st, set_log_file_and_ldif):
     assert len(accounts.filter('(uid=*)')) > count_account
 
 
+def test_dsconf_dbgen_users_parallel(topology_st, set_log_file_and_ldif):
+    """Test ldifgen generates the same users ldif with several worker processes
+
+    :id: 8b0e6f4c-2d7a-4b8e-a1f3-5c9d0e7b6a21
+    :setup: Standalone instance
+    :steps:
+         1. Run ldifgen to generate ldif with users with a seed and one worker
+         2. Run ldifgen with the same seed and three workers to a compressed ldif
+         3. Run ldifgen with the same seed and split chunks
+    :expectedresults:
+         1. Success
+         2. The uncompressed content is the same as in step 1
+         3. The concatenated chunks are the same as in step 1
+    """
+
+    standalone = topology_st.standalone
+    gz_file = ldif_file + '.gz'
+
+    args = FakeArgs()
+    args.suffix = DEFAULT_SUFFIX
+    args.parent = None
+    args.number = 2500
+    args.rdn_cn = False
+    args.generic = False
+    args.start_idx = 0
+    args.localize = False
+    args.seed = '389'
+    args.workers = 1
+    args.chunk_size = 1000
+    args.split = False
+    args.ldif_file = ldif_file
+
+    log.info('Run ldifgen with one worker')
+    dbgen_create_users(standalone, log, args)
+    with open(ldif_file, 'rb') as f:
+        content = f.read()
+    assert content.count(b'\ndn: uid=') == 2500
+
+    log.info('Run ldifgen with three workers to a compressed file')
+    args.workers = 3
+    args.ldif_file = gz_file
+    dbgen_create_users(standalone, log, args)
+    with gzip.open(gz_file, 'rb') as f:
+        assert f.read() == content
+    os.remove(gz_file)
+
+    log.info('Run ldifgen with split chunks')
+    args.split = True
+    args.ldif_file = ldif_file
+    chunk_files = [ldif_file.replace('.ldif', f'-{idx:04d}.ldif') for idx in range(3)]
+    dbgen_create_users(standalone, log, args)
+    chunks = b''
+    for chunk_file in chunk_files:
+        with open(chunk_file, 'rb') as f:
+            chunks += f.read()
+        os.remove(chunk_file)
+    assert chunks == content
+
+
 @pytest.mark.skipif(ds_is_older("1.4.3"), reason="Not implemented")
 def test_dsconf_dbgen_groups(topology_st, set_log_file_and_ldif):
     """Test ldifgen (formerly dbgen) tool to create ldif with group
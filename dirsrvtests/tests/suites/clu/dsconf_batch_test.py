@@ -0,0 +1,94 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2024 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+#
+import logging
+import pytest
+import os
+from lib389.topologies import topology_st as topo
+from lib389.cli_base import FakeArgs
+from lib389.cli_conf.batch import batch_run
+
+pytestmark = pytest.mark.tier1
+
+logging.getLogger(__name__).setLevel(logging.DEBUG)
+log = logging.getLogger(__name__)
+
+BATCH_FILE = '/tmp/dsconf_batch.txt'
+
+
+@pytest.fixture(scope="function")
+def batch_file(request):
+    def fin():
+        if os.path.exists(BATCH_FILE):
+            os.remove(BATCH_FILE)
+
+    request.addfinalizer(fin)
+    return BATCH_FILE
+
+
+@pytest.fixture(scope="function")
+def restore_limits(topo, request):
+    inst = topo.standalone
+    limits = [(attr, inst.config.get_attr_val_utf8(attr)) for attr in ('nsslapd-sizelimit', 'nsslapd-timelimit')]
+
+    def fin():
+        log.info('Restore the limits')
+        inst.config.replace_many(*limits)
+
+    request.addfinalizer(fin)
+
+
+def test_dsconf_batch(topo, batch_file, restore_limits):
+    """Test running several dsconf subcommands over one connection
+
+    :id: 3f0e9d7c-8a51-4b1d-a2c6-5e7f90b4d3a8
+    :setup: Standalone Instance
+    :steps:
+        1. Run a batch of config changes with an invalid line
+        2. Check the valid changes are applied
+        3. Run the batch again with --stop-on-error
+        4. Check the changes after the failed line are not applied
+    :expectedresults:
+        1. The batch fails
+        2. Success
+        3. The batch fails
+        4. Success
+    """
+    inst = topo.standalone
+    with open(batch_file, 'w') as f:
+        f.write("# Set the limits\n"
+                "config replace nsslapd-sizelimit=1000\n"
+                "\n"
+                "config replace nsslapd-sizelimit\n"
+                "config replace nsslapd-timelimit=1800\n")
+
+    args = FakeArgs()
+    args.json = True
+    args.verbose = False
+    args.file = batch_file
+    args.stop_on_error = False
+
+    log.info('Run the batch')
+    assert batch_run(inst, None, log, args) is False
+    assert inst.config.get_attr_val_utf8('nsslapd-sizelimit') == '1000'
+    assert inst.config.get_attr_val_utf8('nsslapd-timelimit') == '1800'
+
+    log.info('Run the batch with --stop-on-error')
+    inst.config.replace_many(('nsslapd-sizelimit', '2000'), ('nsslapd-timelimit', '3600'))
+    args.json = False
+    args.stop_on_error = True
+    assert batch_run(inst, None, log, args) is False
+    assert inst.config.get_attr_val_utf8('nsslapd-sizelimit') == '1000'
+    assert inst.config.get_attr_val_utf8('nsslapd-timelimit') == '3600'
+
+
+if __name__ == '__main__':
+    # Run isolated
+    # -s for DEBUG mode
+    CURRENT_FILE = os.path.realpath(__file__)
+    pytest.main("-s %s" % CURRENT_FILE)
@@ -0,0 +1,93 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2024 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+#
+import io
+import json
+import logging
+import pytest
+import os
+from lib389.topologies import topology_st as topo
+from lib389.cli_base import FakeArgs
+from unittest.mock import patch
+from lib389.cli_conf.rpc import rpc_serve, COMMAND_FAILED, INVALID_PARAMS
+
+pytestmark = pytest.mark.tier1
+
+logging.getLogger(__name__).setLevel(logging.DEBUG)
+log = logging.getLogger(__name__)
+
+
+def rpc_requests(inst, args, requests):
+    """Run the requests through rpc_serve(), as dsconf does, with the
+    standard input and output replaced
+    """
+    lines = [json.dumps({'jsonrpc': '2.0', 'id': req_id, 'method': 'run', 'params': params})
+             for (req_id, params) in enumerate(requests)]
+    output = io.StringIO()
+    with patch('sys.stdin', io.StringIO('\n'.join(lines) + '\n')), patch('sys.stdout', output):
+        rpc_serve(inst, None, log, args)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    return {resp['id']: resp for resp in responses}
+
+
+def test_dsconf_rpc(topo):
+    """Test running dsconf subcommands as JSON-RPC requests
+
+    :id: 9b7c2e41-6d0a-4f3e-8c15-2a4f6e8d0b93
+    :setup: Standalone Instance
+    :steps:
+        1. Run concurrent requests reading the configuration
+        2. Run an invalid request and a failing one
+        3. Change the configuration and read it again
+    :expectedresults:
+        1. Each request gets the output of its subcommand
+        2. The requests get an error
+        3. The cached output is dropped, the new value is read
+    """
+    inst = topo.standalone
+    args = FakeArgs()
+    args.json = True
+    args.verbose = False
+    args.workers = 4
+    args.cache_ttl = 60
+
+    log.info('Run concurrent requests')
+    responses = rpc_requests(inst, args, [['config', 'get', 'nsslapd-sizelimit'],
+                                          ['backend', 'suffix', 'list'],
+                                          ['config', 'get', 'nsslapd-timelimit']])
+    assert len(responses) == 3
+    sizelimit = json.loads(responses[0]['result']['stdout'])['attrs']['nsslapd-sizelimit'][0]
+    assert 'items' in json.loads(responses[1]['result']['stdout'])
+    assert 'nsslapd-timelimit' in json.loads(responses[2]['result']['stdout'])['attrs']
+
+    log.info('Run invalid requests')
+    responses = rpc_requests(inst, args, [['nosuchcommand'], ['backend', 'get', 'nosuchbackend']])
+    assert responses[0]['error']['code'] == INVALID_PARAMS
+    assert responses[1]['error']['code'] == COMMAND_FAILED
+    assert 'desc' in json.loads(responses[1]['error']['message'])
+
+    log.info('Change the configuration')
+    # One worker runs the requests in order, the first read is cached
+    args.workers = 1
+    new_sizelimit = str(int(sizelimit) + 1)
+    try:
+        responses = rpc_requests(inst, args, [['config', 'get', 'nsslapd-sizelimit'],
+                                              ['config', 'replace', f'nsslapd-sizelimit={new_sizelimit}'],
+                                              ['config', 'get', 'nsslapd-sizelimit']])
+        assert json.loads(responses[0]['result']['stdout'])['attrs']['nsslapd-sizelimit'][0] == sizelimit
+        assert 'result' in responses[1]
+        assert json.loads(responses[2]['result']['stdout'])['attrs']['nsslapd-sizelimit'][0] == new_sizelimit
+    finally:
+        inst.config.replace('nsslapd-sizelimit', sizelimit)
+
+
+if __name__ == '__main__':
+    # Run isolated
+    # -s for DEBUG mode
+    CURRENT_FILE = os.path.realpath(__file__)
+    pytest.main("-s %s" % CURRENT_FILE)
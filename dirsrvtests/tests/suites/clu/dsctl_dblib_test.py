@@ -12,7 +12,7 @@ import ldap
 import os
 from lib389._constants import DEFAULT_SUFFIX
 from lib389.backend import DatabaseConfig
-from lib389.cli_ctl.dblib import (FakeArgs, dblib_bdb2mdb, dblib_mdb2bdb, dblib_cleanup)
+from lib389.cli_ctl.dblib import (FakeArgs, dblib_bdb2mdb, dblib_mdb2bdb, dblib_cleanup, DBLIB_LDIF_PREFIX)
 from lib389.idm.user import UserAccounts
 from lib389.replica import ReplicationManager
 from lib389.topologies import topology_m2 as topo_m2
@@ -117,3 +117,33 @@ def test_dblib_migration(topo_m2, init_user):
         dblib_cleanup(s1, log, args)
         _check_db(s1, log, 'mdb')
         repl.test_replication_topology([s1, s2])
+
+
+def test_dblib_migration_resume(topo_m2, init_user):
+    """
+    Verify that dsctl dblib migrations only keep the ldif file of the migrated backend
+
+    :id: 0b7f8b0c-35a4-4d55-9d0e-5b0c1c4b6a31
+    :setup: Two suppliers Instance
+    :steps:
+        1. Switch to the other database with --resume
+        2. Check the ldif directory content
+        3. Switch back to the initial database
+    :expectedresults:
+        1. Success (nothing to resume so a full migration is done)
+        2. No ldif file nor migration progress file is left
+        3. Success
+    """
+    s1 = topo_m2.ms["supplier1"]
+    db_lib = s1.get_db_lib()
+    args = FakeArgs({'tmpdir': None, 'resume': True})
+    ldifdir = s1.get_ldif_dir()
+    if db_lib == 'bdb':
+        migrations = ((dblib_bdb2mdb, 'mdb'), (dblib_mdb2bdb, 'bdb'))
+    else:
+        migrations = ((dblib_mdb2bdb, 'bdb'), (dblib_bdb2mdb, 'mdb'))
+    for migrate, impl in migrations:
+        migrate(s1, log, args)
+        assert not [f for f in os.listdir(ldifdir) if f.startswith(DBLIB_LDIF_PREFIX)]
+        dblib_cleanup(s1, log, args)
+        _check_db(s1, log, impl)
@@ -20,6 +20,10 @@ from lib389.topologies import topology_st
 from lib389.cli_base import FakeArgs
 from lib389.utils import ds_is_older
 from lib389.idm.user import nsUserAccounts
+from lib389.idm.account import AccountState, AccountStatusEvaluator
+from lib389.idm.role import ManagedRoles
+from lib389.plugins import AccountPolicyPlugin, AccountPolicyConfig
+from lib389._constants import DN_CONFIG, DN_PLUGIN, PLUGIN_ACCT_POLICY
 from . import check_value_in_log_and_reset
 
 pytestmark = pytest.mark.tier0
@@ -27,6 +31,8 @@ pytestmark = pytest.mark.tier0
 logging.getLogger(__name__).setLevel(logging.DEBUG)
 log = logging.getLogger(__name__)
 
+ACCP_CONF = f"{DN_CONFIG},cn={PLUGIN_ACCT_POLICY},{DN_PLUGIN}"
+
 
 @pytest.fixture(scope="function")
 def create_test_user(topology_st, request):
@@ -120,6 +126,61 @@ def test_dsidm_account_entry_status_with_lock(topology_st, create_test_user):
     entry_status(standalone, DEFAULT_SUFFIX, topology_st.logcap.log, args)
     check_value_in_log_and_reset(topology_st, content_list=entry_list, check_value=state_unlock)
 
+
+def test_dsidm_account_subtree_status_batch(topology_st):
+    """ Test the states computed by the batch status evaluator
+
+    :id: 8b4f0e7a-1c5e-4f0b-9a5f-3d2c7e6b9a10
+    :setup: Standalone instance
+    :steps:
+         1. Configure the Account Policy plugin with an inactivity limit of an hour
+         2. Create an active account, a locked one, one inactivated through a
+            role and one which did not login for longer than the limit
+         3. Compute the accounts status with AccountStatusEvaluator.search()
+    :expectedresults:
+         1. Success
+         2. Success
+         3. Every account is returned with its state
+    """
+
+    standalone = topology_st.standalone
+    plugin = AccountPolicyPlugin(standalone)
+    plugin.enable()
+    plugin.set('nsslapd-pluginarg0', ACCP_CONF)
+    accp = AccountPolicyConfig(standalone, dn=ACCP_CONF)
+    accp.set('alwaysrecordlogin', 'yes')
+    accp.set('stateattrname', 'lastLoginTime')
+    accp.set('altstateattrname', 'createTimestamp')
+    accp.set('specattrname', 'acctPolicySubentry')
+    accp.set('limitattrname', 'accountInactivityLimit')
+    accp.set('accountInactivityLimit', '3600')
+    standalone.restart()
+
+    users = nsUserAccounts(standalone, DEFAULT_SUFFIX)
+    role = ManagedRoles(standalone, DEFAULT_SUFFIX).create(properties={'cn': 'batch_status_role'})
+    (active, locked, inactivated, expired) = [users.create_test_user(uid=uid) for uid in range(2000, 2004)]
+    try:
+        locked.lock()
+        inactivated.add('nsRoleDN', role.dn)
+        role.lock()
+        expired.replace('lastLoginTime', '20000101000000Z')
+
+        evaluator = AccountStatusEvaluator(standalone)
+        states = {account.dn.lower(): status["state"]
+                  for account, status in evaluator.search(DEFAULT_SUFFIX, "(uid=test_user_20*)", page_size=2)}
+        assert states == {active.dn.lower(): AccountState.ACTIVATED,
+                          locked.dn.lower(): AccountState.DIRECTLY_LOCKED,
+                          inactivated.dn.lower(): AccountState.INDIRECTLY_LOCKED,
+                          expired.dn.lower(): AccountState.INACTIVITY_LIMIT_EXCEEDED}
+    finally:
+        for user in (active, locked, inactivated, expired):
+            user.delete()
+        role.unlock()
+        role.delete()
+        plugin.disable()
+        standalone.restart()
+
+
 if __name__ == '__main__':
     # Run isolated
     # -s for DEBUG mode
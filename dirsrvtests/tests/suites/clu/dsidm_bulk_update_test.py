@@ -85,6 +85,62 @@ def test_bulk_operations(topo, create_test_users):
         assert 'extensibleobject' not in user.get_attr_vals_utf8_l('objectclass')
 
 
+def test_bulk_operations_failures(topo, create_test_users):
+    """Test the failure report and the stop option of the pipelined bulk update
+
+    :id: 5f0c2f7e-93a1-4b4e-8f3d-1f6e2b8c7d45
+    :setup: Standalone Instance
+    :steps:
+        1. Add a description to one user
+        2. Bulk add the same description with a window of 2 updates
+        3. Bulk add the same description with the stop option, only
+           testuser2 having it
+        4. Remove the descriptions
+    :expectedresults:
+        1. Success
+        2. All the other users are updated, the failure is reported
+        3. A ValueError is raised, the users after testuser2 are not updated
+        4. Success
+    """
+    inst = topo.standalone
+    users = UserAccounts(inst, DEFAULT_SUFFIX)
+    users.get('testuser2').replace('description', 'bulk')
+
+    args = FakeArgs()
+    args.json = False
+    args.basedn = DEFAULT_SUFFIX
+    args.scope = ldap.SCOPE_SUBTREE
+    args.filter = "(uid=testuser*)"
+    args.stop = False
+    args.window = 2
+    args.changes = ['add:description:bulk']
+    bulk_update(inst, DEFAULT_SUFFIX, topo.logcap.log, args)
+    assert topo.logcap.contains("Successfully updated 4 entries.")
+    assert topo.logcap.contains("Failed to update 1 entries:")
+    for user in users.list():
+        if user.get_attr_val_utf8('uid').startswith('testuser'):
+            assert user.get_attr_val_utf8('description') == 'bulk'
+    topo.logcap.flush()
+
+    args.changes = ['delete:description']
+    bulk_update(inst, DEFAULT_SUFFIX, topo.logcap.log, args)
+    users.get('testuser2').replace('description', 'bulk')
+    topo.logcap.flush()
+
+    args.stop = True
+    args.changes = ['add:description:bulk']
+    with pytest.raises(ValueError):
+        bulk_update(inst, DEFAULT_SUFFIX, topo.logcap.log, args)
+    # The users are returned in the order they were created
+    for uid in ('testuser3', 'testuser4'):
+        assert users.get(uid).get_attr_val_utf8('description') is None
+
+    args.stop = False
+    args.changes = ['delete:description']
+    bulk_update(inst, DEFAULT_SUFFIX, topo.logcap.log, args)
+    topo.logcap.flush()
+
+
 if __name__ == '__main__':
     # Run isolated
     # -s for DEBUG mode
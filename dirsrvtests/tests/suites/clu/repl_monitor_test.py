@@ -10,6 +10,7 @@ import time
 import subprocess
 import pytest
 import re
+import json
 
 from lib389.cli_conf.replication import get_repl_monitor_info
 from lib389.tasks import *
@@ -269,6 +270,57 @@ def test_dsconf_replication_monitor(topology_m2, set_log_file):
     check_value_in_log_and_reset(content_list, connection_content, error_list=error_list)
 
 
+def test_dsconf_replication_monitor_watch(topology_m2, set_log_file):
+    """Test the replication monitor watch mode
+
+    :id: 4c1e3a9e-4a5b-4f3e-9d0c-2b6f0d1a7e52
+    :setup: 2 supplier topology
+    :steps:
+        1. Run the replication monitor in watch mode with JSON lines
+        2. Run the replication monitor in watch mode with the Prometheus format to a file
+    :expectedresults:
+        1. A line is written for each agreement and sample, with a known lag
+        2. The file holds the lag metric of the agreement
+    """
+
+    m1 = topology_m2.ms["supplier1"]
+    m2 = topology_m2.ms["supplier2"]
+    prom_file = '/tmp/monitor.prom'
+
+    args = FakeArgs()
+    args.connections = [m2.host + ':' + str(m2.port) + ':' + DN_DM + ':' + PW_DM]
+    args.aliases = None
+    args.json = False
+    args.watch = 1
+    args.count = 2
+    args.history = 10
+    args.timeout = 10
+    args.format = 'jsonl'
+    args.output = None
+
+    log.info('Run replication monitor in watch mode')
+    get_repl_monitor_info(m1, DEFAULT_SUFFIX, log, args)
+    with open(LOG_FILE, 'r+') as f:
+        samples = [json.loads(line) for line in f.read().splitlines() if line.startswith('{')]
+        f.truncate(0)
+    assert len(samples) == 2
+    for sample in samples:
+        assert sample['suffix'] == DEFAULT_SUFFIX
+        assert sample['error'] is None
+        assert sample['lag'] is not None
+
+    log.info('Run replication monitor in watch mode with the Prometheus format')
+    args.count = 1
+    args.format = 'prometheus'
+    args.output = prom_file
+    get_repl_monitor_info(m1, DEFAULT_SUFFIX, log, args)
+    with open(prom_file) as f:
+        content = f.read()
+    os.remove(prom_file)
+    assert '# TYPE ds_replication_lag_seconds gauge' in content
+    assert 'ds_replication_consumer_up{' in content
+
+
 if __name__ == '__main__':
     # Run isolated
     # -s for DEBUG mode
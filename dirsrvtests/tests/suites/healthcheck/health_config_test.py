@@ -569,6 +569,140 @@ def test_healthcheck_securitylog_buffering(topology_st):
     inst.config.set("nsslapd-securitylog-logbuffering", "on")
 
 
+def test_healthcheck_offline(topology_st):
+    """Check if HealthCheck --offline reports the configuration issues of a stopped instance
+
+    :id: 6f1d9c3a-4b7e-4e2d-9a80-1c5e7b3f2d64
+    :setup: Standalone instance
+    :steps:
+        1. Configure the MO Plugin with a memberOfGroupAttr which is not indexed
+        2. Stop the instance
+        3. Use HealthCheck with --offline and --json options
+        4. Use HealthCheck with --offline on a check needing the server
+        5. Start the instance and remove the memberOfGroupAttr
+    :expectedresults:
+        1. Success
+        2. Success
+        3. Healthcheck reports DSMOLE0001 code, and fails on this high severity issue
+        4. Healthcheck fails
+        5. Success
+    """
+
+    RET_CODE = 'DSMOLE0001'
+    MO_GROUP_ATTR = 'creatorsname'
+
+    standalone = topology_st.standalone
+
+    log.info('Enable MO plugin with a not indexed group attr')
+    plugin = MemberOfPlugin(standalone)
+    plugin.enable()
+    plugin.add('memberofgroupattr', MO_GROUP_ATTR)
+    standalone.stop()
+
+    args = FakeArgs()
+    args.instance = standalone.serverid
+    args.verbose = standalone.verbose
+    args.list_errors = False
+    args.list_checks = False
+    args.check = None
+    args.dry_run = False
+    args.json = True
+    args.offline = True
+
+    try:
+        log.info('Use healthcheck with --offline option')
+        assert health_check_run(standalone, topology_st.logcap.log, args) is False
+        assert topology_st.logcap.contains(RET_CODE)
+        topology_st.logcap.flush()
+
+        for check in ('monitor-disk-space', 'backends:userroot:search'):
+            args.check = [check]
+            with pytest.raises(ValueError):
+                health_check_run(standalone, topology_st.logcap.log, args)
+    finally:
+        standalone.start()
+        plugin.remove('memberofgroupattr', MO_GROUP_ATTR)
+        standalone.restart()
+
+
+def _offline_args(standalone, checks):
+    args = FakeArgs()
+    args.instance = standalone.serverid
+    args.verbose = standalone.verbose
+    args.list_errors = False
+    args.list_checks = False
+    args.check = checks
+    args.dry_run = False
+    args.json = True
+    args.offline = True
+    return args
+
+
+def test_healthcheck_offline_defaults(topology_st):
+    """Check if HealthCheck --offline does not report the defaults missing from the dse.ldif
+
+    :id: 5f12a755-df4c-4f32-ae3b-9f1534a4fd1b
+    :setup: Standalone instance
+    :steps:
+        1. Stop the instance
+        2. Use HealthCheck with --offline on the config checks
+        3. Start the instance
+    :expectedresults:
+        1. Success
+        2. Healthcheck reports no issue, the values which are not in the dse.ldif
+           are the defaults of the server
+        3. Success
+    """
+
+    standalone = topology_st.standalone
+    standalone.stop()
+    topology_st.logcap.flush()
+    try:
+        log.info('Use healthcheck with --offline option on a default configuration')
+        args = _offline_args(standalone, ['config'])
+        assert health_check_run(standalone, topology_st.logcap.log, args) is not False
+        for code in ('DSCLE0001', 'DSCLE0002', 'DSCLE0003', 'DSCLE0004', 'DSCLE0005'):
+            assert not topology_st.logcap.contains(code)
+        assert not topology_st.logcap.contains('failed')
+        topology_st.logcap.flush()
+    finally:
+        standalone.start()
+
+
+def test_healthcheck_offline_password_scheme(topology_st):
+    """Check if HealthCheck --offline reports a weak passwordStorageScheme
+
+    :id: 61c97f5c-655a-43f8-832d-c58fbbc850a8
+    :setup: Standalone instance
+    :steps:
+        1. Set passwordStorageScheme to CRYPT
+        2. Stop the instance
+        3. Use HealthCheck with --offline on config:passwordscheme
+        4. Start the instance and reset passwordStorageScheme
+    :expectedresults:
+        1. Success
+        2. Success
+        3. Healthcheck reports DSCLE0002, and fails on this high severity issue
+        4. Success
+    """
+
+    standalone = topology_st.standalone
+    scheme = standalone.config.get_attr_val_utf8('passwordStorageScheme')
+    standalone.config.set('passwordStorageScheme', 'CRYPT')
+    standalone.stop()
+    topology_st.logcap.flush()
+    try:
+        log.info('Use healthcheck with --offline option on config:passwordscheme')
+        args = _offline_args(standalone, ['config:passwordscheme'])
+        assert health_check_run(standalone, topology_st.logcap.log, args) is False
+        assert topology_st.logcap.contains('DSCLE0002')
+        assert topology_st.logcap.contains('passwordStorageScheme')
+        topology_st.logcap.flush()
+    finally:
+        standalone.start()
+        standalone.config.set('passwordStorageScheme', scheme)
+
+
 if __name__ == '__main__':
     # Run isolated
     # -s for DEBUG mode
@@ -1,6 +1,6 @@
 import cockpit from "cockpit";
 import React from "react";
-import { log_cmd, valid_dn } from "./lib/tools.jsx";
+import { log_cmd, valid_dn, dsconfSpawn } from "./lib/tools.jsx";
 import {
     ChainingConfig,
     ChainingDatabaseConfig
@@ -165,8 +165,7 @@ export class Database extends React.Component {
             "backend", "suffix", "list", "--suffix"
         ];
         log_cmd("loadSuffixList", "Get a list of all the suffixes", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const suffixList = JSON.parse(content);
                     this.setState(() => (
@@ -181,8 +180,7 @@ export class Database extends React.Component {
             "pwpolicy", "list-schemes"
         ];
         log_cmd("loadPwdStorageSchemes", "Get a list of all the password storage sehemes", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const schemes = JSON.parse(content);
                     this.setState(() => (
@@ -200,8 +198,7 @@ export class Database extends React.Component {
             "config", "get", "nsslapd-ndn-cache-max-size"
         ];
         log_cmd("loadNDN", "Load NDN cache size", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const attrs = config.attrs;
@@ -235,8 +232,7 @@ export class Database extends React.Component {
             "backend", "config", "get"
         ];
         log_cmd("loadGlobalConfig", "Load the database global configuration", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const attrs = config.attrs;
@@ -305,8 +301,7 @@ export class Database extends React.Component {
             "chaining", "config-get", "--avail-controls"
         ];
         log_cmd("loadAvailableControls", "Get available controls", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const availableOids = config.items.filter((el) => !this.state.chainingConfig.oidList.includes(el));
@@ -329,8 +324,7 @@ export class Database extends React.Component {
             "chaining", "config-get-def"
         ];
         log_cmd("loadDefaultConfig", "Load chaining default configuration", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const attr = config.attrs;
@@ -394,8 +388,7 @@ export class Database extends React.Component {
             "chaining", "config-get"
         ];
         log_cmd("loadChainingConfig", "Load chaining OIDs and Controls", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     let availableComps = config.attrs.nspossiblechainingcomponents;
@@ -450,8 +443,7 @@ export class Database extends React.Component {
             "backend", "get-tree",
         ];
         log_cmd("loadSuffixTree", "Start building the suffix tree", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     let suffixData = [];
                     if (content !== "") {
@@ -532,8 +524,7 @@ export class Database extends React.Component {
             "chaining", "link-get", suffix
         ];
         log_cmd("loadChainingLink", "Load chaining link configuration", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const attrs = config.attrs;
@@ -794,8 +785,7 @@ export class Database extends React.Component {
         }
 
         log_cmd("createSuffix", "Create a new backend", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     this.closeSuffixModal();
                     this.props.addNotification(
@@ -828,8 +818,7 @@ export class Database extends React.Component {
             "backend", "config", "get"
         ];
         log_cmd("getAutoTuning", "Check cache auto tuning", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     if ('nsslapd-cache-autosize' in config.attrs &&
@@ -851,8 +840,7 @@ export class Database extends React.Component {
         ];
         const tableKey = this.state.vlvTableKey + 1;
         log_cmd("loadVLV", "Load VLV indexes", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     this.setState({
@@ -871,8 +859,7 @@ export class Database extends React.Component {
             "backend", "attr-encrypt", "--list", "--just-names", suffix
         ];
         log_cmd("loadAttrEncrypt", "Load encrypted attrs", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const rows = [];
@@ -897,8 +884,7 @@ export class Database extends React.Component {
             "backend", "index", "list", suffix
         ];
         log_cmd("loadIndexes", "Load backend indexes", index_cmd);
-        cockpit
-                .spawn(index_cmd, { superuser: true, err: "message" })
+        dsconfSpawn(index_cmd)
                 .done(content => {
                     // Now do the Indexes
                     const config = JSON.parse(content);
@@ -949,8 +935,7 @@ export class Database extends React.Component {
             "backend", "suffix", "get", suffix
         ];
         log_cmd("loadReferrals", "get referrals", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     let refs = [];
@@ -979,8 +964,7 @@ export class Database extends React.Component {
             "backend", "suffix", "get", suffix
         ];
         log_cmd("loadSuffix", "Load suffix config", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     let refs = [];
@@ -1017,8 +1001,7 @@ export class Database extends React.Component {
                         "backend", "vlv-index", "list", suffix
                     ];
                     log_cmd("loadSuffix", "Load VLV indexes", cmd);
-                    cockpit
-                            .spawn(cmd, { superuser: true, err: "message" })
+                    dsconfSpawn(cmd)
                             .done(content => {
                                 const config = JSON.parse(content);
                                 this.setState({
@@ -1033,8 +1016,7 @@ export class Database extends React.Component {
                                     "backend", "attr-encrypt", "--list", "--just-names", suffix
                                 ];
                                 log_cmd("loadAttrEncrypt", "Load encrypted attrs", cmd);
-                                cockpit
-                                        .spawn(cmd, { superuser: true, err: "message" })
+                                dsconfSpawn(cmd)
                                         .done(content => {
                                             const config = JSON.parse(content);
                                             const rows = [];
@@ -1052,8 +1034,7 @@ export class Database extends React.Component {
                                                 "backend", "index", "list", suffix
                                             ];
                                             log_cmd("loadIndexes", "Load backend indexes", index_cmd);
-                                            cockpit
-                                                    .spawn(index_cmd, { superuser: true, err: "message" })
+                                            dsconfSpawn(index_cmd)
                                                     .done(content => {
                                                         // Now do the Indexes
                                                         const config = JSON.parse(content);
@@ -1140,8 +1121,7 @@ export class Database extends React.Component {
             "dsctl", "-j", this.props.serverId, "ldifs"
         ];
         log_cmd("loadLDIFs", "Load LDIF Files", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const rows = [];
@@ -1165,8 +1145,7 @@ export class Database extends React.Component {
             "dsctl", "-j", this.props.serverId, "backups"
         ];
         log_cmd("loadBackupsDatabase", "Load Backups", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const rows = [];
@@ -1186,8 +1165,7 @@ export class Database extends React.Component {
             "schema", "attributetypes", "list"
         ];
         log_cmd("loadAttrs", "Get attrs", attr_cmd);
-        cockpit
-                .spawn(attr_cmd, { superuser: true, err: "message" })
+        dsconfSpawn(attr_cmd)
                 .done(content => {
                     const attrContent = JSON.parse(content);
                     const attrs = [];
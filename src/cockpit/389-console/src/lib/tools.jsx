@@ -320,3 +320,101 @@ export function callCmdStreamPassword(config) {
                 proc.input(config.passwd + "\n", true);
             });
 }
+
+// The "dsconf rpc" worker of each LDAPI URL, or null when the server can not
+// run one and the commands are spawned as processes.
+const dsconfWorkers = {};
+
+function dsconfError(message) {
+    // Like the errors of cockpit.spawn(cmd, { err: "message" })
+    return { problem: null, exit_status: 1, message, toString: () => message };
+}
+
+function getDsconfWorker(url) {
+    let worker = dsconfWorkers[url];
+    if (worker !== undefined) {
+        return worker;
+    }
+
+    worker = {
+        proc: cockpit.spawn(["dsconf", "-j", url, "rpc"], { superuser: true, err: "message" }),
+        buffer: "",
+        nextId: 1,
+        pending: {},
+        answered: false,
+    };
+    dsconfWorkers[url] = worker;
+    worker.proc.stream(data => {
+        worker.buffer += data;
+        let idx;
+        while ((idx = worker.buffer.indexOf("\n")) >= 0) {
+            const line = worker.buffer.substring(0, idx);
+            worker.buffer = worker.buffer.substring(idx + 1);
+            let response;
+            try {
+                response = JSON.parse(line);
+            } catch (e) {
+                continue;
+            }
+            const call = worker.pending[response.id];
+            if (call === undefined) {
+                continue;
+            }
+            delete worker.pending[response.id];
+            worker.answered = true;
+            if (response.error) {
+                call.dfd.reject(dsconfError(response.error.message));
+            } else {
+                call.dfd.resolve(response.result.stdout);
+            }
+        }
+    });
+    worker.proc.always(() => {
+        const pending = worker.pending;
+        worker.pending = {};
+        if (worker.answered) {
+            // Start a new worker on the next command
+            delete dsconfWorkers[url];
+        } else {
+            // This server has no "dsconf rpc", spawn the commands instead
+            dsconfWorkers[url] = null;
+        }
+        for (const id in pending) {
+            const call = pending[id];
+            if (worker.answered) {
+                // The command may have been applied, don't run it twice
+                call.dfd.reject(dsconfError(JSON.stringify({ desc: "The dsconf worker exited" })));
+            } else {
+                cockpit.spawn(call.cmd, { superuser: true, err: "message" })
+                        .done(content => call.dfd.resolve(content))
+                        .fail(err => call.dfd.reject(err));
+            }
+        }
+    });
+    return worker;
+}
+
+// Run a "dsconf -j ldapi://..." command in the long-lived dsconf worker of the
+// server instead of spawning a process. It returns a promise like
+// cockpit.spawn(cmd, { superuser: true, err: "message" }), the other commands
+// are spawned.
+export function dsconfSpawn(cmd) {
+    const url = cmd[2];
+    if (cmd[0] !== "dsconf" || cmd[1] !== "-j" || typeof url !== "string" ||
+        !url.startsWith("ldapi://") || dsconfWorkers[url] === null) {
+        return cockpit.spawn(cmd, { superuser: true, err: "message" });
+    }
+
+    const worker = getDsconfWorker(url);
+    const dfd = cockpit.defer();
+    const id = worker.nextId++;
+    worker.pending[id] = { cmd, dfd };
+    const request = {
+        jsonrpc: "2.0",
+        id,
+        method: "run",
+        params: cmd.slice(3).map(arg => arg.toString()),
+    };
+    worker.proc.input(JSON.stringify(request) + "\n", true);
+    return dfd.promise;
+}
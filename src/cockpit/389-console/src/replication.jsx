@@ -1,6 +1,6 @@
 import cockpit from "cockpit";
 import React from "react";
-import { log_cmd } from "./lib/tools.jsx";
+import { log_cmd, dsconfSpawn } from "./lib/tools.jsx";
 import { ReplSuffix } from "./lib/replication/replSuffix.jsx";
 import PropTypes from "prop-types";
 import {
@@ -99,8 +99,7 @@ export class Replication extends React.Component {
         });
         const cmd = ['dsconf', '-j', 'ldapi://%2fvar%2frun%2fslapd-' + this.props.serverId + '.socket', 'replication', 'get-changelog'];
         log_cmd("reloadChangelog", "Reload the changelog", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     let clDir = "";
@@ -183,8 +182,7 @@ export class Replication extends React.Component {
             "backend", "get-tree",
         ];
         log_cmd("loadSuffixTree", "Start building the suffix tree", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     let treeData = [];
                     if (content !== "") {
@@ -348,8 +346,7 @@ export class Replication extends React.Component {
             "repl-agmt", "list", "--suffix", suffix
         ];
         log_cmd("reloadAgmts", "get repl agreements", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const obj = JSON.parse(content);
                     const rows = [];
@@ -424,8 +421,7 @@ export class Replication extends React.Component {
             "repl-winsync-agmt", "list", "--suffix", suffix
         ];
         log_cmd("reloadWinsyncAgmts", "Get Winsync Agreements", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const obj = JSON.parse(content);
                     const ws_rows = [];
@@ -500,8 +496,7 @@ export class Replication extends React.Component {
             "replication", "get", "--suffix", suffix
         ];
         log_cmd("reloadConfig", "Reload suffix repl config", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     let current_role = "";
@@ -562,8 +557,7 @@ export class Replication extends React.Component {
         const cmd = ['dsconf', '-j', 'ldapi://%2fvar%2frun%2fslapd-' + this.props.serverId + '.socket',
             'replication', 'get-ruv', '--suffix=' + suffix];
         log_cmd('reloadRUV', 'Get the suffix RUV', cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const ruvs = JSON.parse(content);
                     const ruv_rows = [];
@@ -608,8 +602,7 @@ export class Replication extends React.Component {
             "dsctl", "-j", this.props.serverId, "ldifs"
         ];
         log_cmd("loadLDIFs", "Load replication LDIF Files", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     const rows = [];
@@ -643,8 +636,7 @@ export class Replication extends React.Component {
             "replication", "get", "--suffix", suffix
         ];
         log_cmd("loadReplSuffix", "Load suffix repl config", cmd);
-        cockpit
-                .spawn(cmd, { superuser: true, err: "message" })
+        dsconfSpawn(cmd)
                 .done(content => {
                     const config = JSON.parse(content);
                     let current_role = "";
@@ -692,8 +684,7 @@ export class Replication extends React.Component {
                     cmd = ['dsconf', '-j', 'ldapi://%2fvar%2frun%2fslapd-' + this.props.serverId + '.socket',
                         'replication', 'get-changelog', '--suffix', suffix];
                     log_cmd("loadReplSuffix", "Load the replication info", cmd);
-                    cockpit
-                            .spawn(cmd, { superuser: true, err: "message" })
+                    dsconfSpawn(cmd)
                             .done(content => {
                                 const config = JSON.parse(content);
                                 let clMaxEntries = "";
@@ -731,8 +722,7 @@ export class Replication extends React.Component {
                                     "repl-agmt", "list", "--suffix", suffix
                                 ];
                                 log_cmd("loadReplSuffix", "get repl agreements", cmd);
-                                cockpit
-                                        .spawn(cmd, { superuser: true, err: "message" })
+                                dsconfSpawn(cmd)
                                         .done(content => {
                                             const obj = JSON.parse(content);
                                             const rows = [];
@@ -793,8 +783,7 @@ export class Replication extends React.Component {
                                                 "repl-winsync-agmt", "list", "--suffix", suffix
                                             ];
                                             log_cmd("loadReplSuffix", "Get Winsync Agreements", cmd);
-                                            cockpit
-                                                    .spawn(cmd, { superuser: true, err: "message" })
+                                            dsconfSpawn(cmd)
                                                     .done(content => {
                                                         const obj = JSON.parse(content);
                                                         const ws_rows = [];
@@ -853,8 +842,7 @@ export class Replication extends React.Component {
                                                         cmd = ['dsconf', '-j', 'ldapi://%2fvar%2frun%2fslapd-' + this.props.serverId + '.socket',
                                                             'replication', 'get-ruv', '--suffix=' + suffix];
                                                         log_cmd('loadReplSuffix', 'Get the suffix RUV', cmd);
-                                                        cockpit
-                                                                .spawn(cmd, { superuser: true, err: "message" })
+                                                        dsconfSpawn(cmd)
                                                                 .done(content => {
                                                                     const ruvs = JSON.parse(content);
                                                                     const ruv_rows = [];
@@ -948,8 +936,7 @@ export class Replication extends React.Component {
             "schema", "attributetypes", "list"
         ];
         log_cmd("Suffixes", "Get attrs", attr_cmd);
-        cockpit
-                .spawn(attr_cmd, { superuser: true, err: "message" })
+        dsconfSpawn(attr_cmd)
                 .done(content => {
                     const attrContent = JSON.parse(content);
                     const attrs = [];
@@ -39,6 +39,7 @@ import signal
 import errno
 import uuid
 import json
+import importlib
 from shutil import copy2
 from contextlib import suppress
 
@@ -94,6 +95,38 @@ DEBUGGING = os.getenv('DEBUGGING', default=False)
 # My logger
 logger = logging.getLogger(__name__)
 
+# The broker attributes of an online DirSrv and their (module, class),
+# see DirSrv.__getattr__
+_BROKERS = {
+    'agreement': ('lib389.agreement', 'AgreementLegacy'),
+    'replica': ('lib389.replica', 'ReplicaLegacy'),
+    'backend': ('lib389.backend', 'BackendLegacy'),
+    'config': ('lib389.config', 'Config'),
+    'index': ('lib389.index', 'IndexLegacy'),
+    'mappingtree': ('lib389.mappingTree', 'MappingTreeLegacy'),
+    'suffix': ('lib389.suffix', 'Suffix'),
+    'schema': ('lib389.schema', 'SchemaLegacy'),
+    'plugins': ('lib389.plugins', 'Plugins'),
+    'tasks': ('lib389.tasks', 'Tasks'),
+    'saslmap': ('lib389.saslmap', 'SaslMapping'),
+    'pwpolicy': ('lib389.pwpolicy', 'PwPolicyManager'),
+    'monitor': ('lib389.monitor', 'Monitor'),
+    'monitorldbm': ('lib389.monitor', 'MonitorLDBM'),
+    'rootdse': ('lib389.rootdse', 'RootDSE'),
+    'backends': ('lib389.backend', 'Backends'),
+    'mappingtrees': ('lib389.mappingTree', 'MappingTrees'),
+    'replicas': ('lib389.replica', 'Replicas'),
+    'aci': ('lib389.aci', 'Aci'),
+    'rsa': ('lib389.config', 'RSA'),
+    'encryption': ('lib389.config', 'Encryption'),
+    'ds_access_log': ('lib389.dirsrv_log', 'DirsrvAccessLog'),
+    'ds_error_log': ('lib389.dirsrv_log', 'DirsrvErrorLog'),
+    'ds_audit_log': ('lib389.dirsrv_log', 'DirsrvAuditLog'),
+    'ds_security_log': ('lib389.dirsrv_log', 'DirsrvSecurityLog'),
+    'ldclt': ('lib389.ldclt', 'Ldclt'),
+    'saslmaps': ('lib389.saslmap', 'SaslMappings'),
+}
+
 
 # Initiate the paths object here. Should this be part of the DirSrv class
 # for submodules?
@@ -317,59 +350,20 @@ class DirSrv(SimpleLDAPObject, object):
         self.simple_bind_s(ensure_str(self.binddn), self.bindpw, escapehatch='i am sure')
 
     def __add_brookers__(self):
-        from lib389.config import Config
-        from lib389.aci import Aci
-        from lib389.config import RSA
-        from lib389.config import Encryption
-        from lib389.dirsrv_log import DirsrvAccessLog, DirsrvErrorLog, DirsrvAuditLog, DirsrvSecurityLog
-        from lib389.ldclt import Ldclt
-        from lib389.mappingTree import MappingTrees
-        from lib389.mappingTree import MappingTreeLegacy as MappingTree
-        from lib389.backend import Backends
-        from lib389.backend import BackendLegacy as Backend
-        from lib389.suffix import Suffix
-        from lib389.replica import ReplicaLegacy as Replica
-        from lib389.replica import Replicas
-        from lib389.agreement import AgreementLegacy as Agreement
-        from lib389.schema import SchemaLegacy as Schema
-        from lib389.plugins import Plugins
-        from lib389.tasks import Tasks
-        from lib389.index import IndexLegacy as Index
-        from lib389.monitor import Monitor, MonitorLDBM
-        from lib389.rootdse import RootDSE
-        from lib389.saslmap import SaslMapping, SaslMappings
-        from lib389.pwpolicy import PwPolicyManager
-
-        # Need updating
-        self.agreement = Agreement(self)
-        self.replica = Replica(self)
-        self.backend = Backend(self)
-        self.config = Config(self)
-        self.index = Index(self)
-        self.mappingtree = MappingTree(self)
-        self.suffix = Suffix(self)
-        self.schema = Schema(self)
-        self.plugins = Plugins(self)
-        self.tasks = Tasks(self)
-        self.saslmap = SaslMapping(self)
-        self.pwpolicy = PwPolicyManager(self)
-        # Do we have a certdb path?
-        # if MAJOR < 3:
-        self.monitor = Monitor(self)
-        self.monitorldbm = MonitorLDBM(self)
-        self.rootdse = RootDSE(self)
-        self.backends = Backends(self)
-        self.mappingtrees = MappingTrees(self)
-        self.replicas = Replicas(self)
-        self.aci = Aci(self)
-        self.rsa = RSA(self)
-        self.encryption = Encryption(self)
-        self.ds_access_log = DirsrvAccessLog(self)
-        self.ds_error_log = DirsrvErrorLog(self)
-        self.ds_audit_log = DirsrvAuditLog(self)
-        self.ds_security_log = DirsrvSecurityLog(self)
-        self.ldclt = Ldclt(self)
-        self.saslmaps = SaslMappings(self)
+        # The brokers are created by __getattr__ on first access, so a short
+        # lived connection (like the cli tools) only imports what it uses.
+        # Drop the ones of a previous connection, they are recreated.
+        for name in _BROKERS:
+            self.__dict__.pop(name, None)
+        self._brokers_added = True
+
+    def __getattr__(self, name):
+        if name in _BROKERS and self.__dict__.get('_brokers_added', False):
+            (module, cls) = _BROKERS[name]
+            broker = getattr(importlib.import_module(module), cls)(self)
+            self.__dict__[name] = broker
+            return broker
+        return super(DirSrv, self).__getattr__(name)
 
     def __init__(self, verbose=False, external_log=None, containerised=False):
         """
@@ -892,7 +886,7 @@ class DirSrv(SimpleLDAPObject, object):
         self.state = DIRSRV_STATE_ALLOCATED
 
     def open(self, uri=None, saslmethod=None, sasltoken=None, certdir=None, starttls=False, connOnly=False, reqcert=None,
-                usercert=None, userkey=None):
+                usercert=None, userkey=None, timeout=None):
         '''
             It opens a ldap bound connection to dirsrv so that online
             administrative tasks are possible.  It binds with the binddn
@@ -905,6 +899,7 @@ class DirSrv(SimpleLDAPObject, object):
             @param saslmethod - None, or GSSAPI
             @param sasltoken - The ldap.sasl token type to bind with.
             @param certdir - Certificate directory for TLS
+            @param timeout - Connection and operation timeout in seconds
             @return None
 
             @raise LDAPError
@@ -923,6 +918,12 @@ class DirSrv(SimpleLDAPObject, object):
         else:
             super(DirSrv, self).__init__(uri, trace_level=TRACE_LEVEL)
 
+        if timeout is not None:
+            # The connection is only made by the first operation, so this
+            # bounds the connection too
+            self.set_option(ldap.OPT_NETWORK_TIMEOUT, timeout)
+            self.set_option(ldap.OPT_TIMEOUT, timeout)
+
         # Set new TLS context only if we changed some of the options
         new_tls_context = False
 
@@ -3065,25 +3066,8 @@ class DirSrv(SimpleLDAPObject, object):
                 return True
             return False
 
-    def dbscan(self, bename=None, index=None, key=None, width=None, isRaw=False, args=None, stopping=True) -> bytes:
-        """Wrapper around dbscan tool that analyzes and extracts information
-        from an import Directory Server database file
-
-        :param bename: The backend name to scan
-        :param index: Index name (e.g., cn or cn.db) to scan
-        :param key: Index key to dump
-        :param id: Entry id to dump
-        :param width: Entry truncate size (bytes)
-        :param isRaw: Dump as a raw data
-        :param args: use args as parameters instead of using bename, index, key
-        :param stopping: stop then restart the instance (if started)
-        :returns: dbscan output as bytes
-        """
-
-        DirSrvTools.lib389User(user=DEFAULT_USER)
+    def _dbscan_cmd(self, bename=None, index=None, key=None, width=None, isRaw=False, args=None):
         prog = os.path.join(self.ds_paths.bin_dir, DBSCAN)
-        if not self.status():
-                stopping = False
         cmd = [ prog ]
         if self.is_dbi_supported():
             cmd.extend(['-D', self.get_db_lib()])
@@ -3112,6 +3096,27 @@ class DirSrv(SimpleLDAPObject, object):
             cmd.extend(['-t', width])
         if isRaw:
             cmd.append('-R')
+        return cmd
+
+    def dbscan(self, bename=None, index=None, key=None, width=None, isRaw=False, args=None, stopping=True) -> bytes:
+        """Wrapper around dbscan tool that analyzes and extracts information
+        from an import Directory Server database file
+
+        :param bename: The backend name to scan
+        :param index: Index name (e.g., cn or cn.db) to scan
+        :param key: Index key to dump
+        :param id: Entry id to dump
+        :param width: Entry truncate size (bytes)
+        :param isRaw: Dump as a raw data
+        :param args: use args as parameters instead of using bename, index, key
+        :param stopping: stop then restart the instance (if started)
+        :returns: dbscan output as bytes
+        """
+
+        DirSrvTools.lib389User(user=DEFAULT_USER)
+        if not self.status():
+                stopping = False
+        cmd = self._dbscan_cmd(bename, index, key, width, isRaw, args)
         if stopping:
             self.stop()
         self.log.info('Running script: %s', cmd)
@@ -3125,6 +3130,42 @@ class DirSrv(SimpleLDAPObject, object):
             self.start()
         return result.stdout
 
+    def dbscan_lines(self, bename=None, index=None, key=None, width=None, isRaw=False, args=None, stopping=True):
+        """Same as dbscan() but yield the output lines while dbscan runs
+        instead of buffering the whole output
+
+        :param bename: The backend name to scan
+        :param index: Index name (e.g., cn or cn.db) to scan
+        :param key: Index key to dump
+        :param width: Entry truncate size (bytes)
+        :param isRaw: Dump as a raw data
+        :param args: use args as parameters instead of using bename, index, key
+        :param stopping: stop then restart the instance (if started)
+        :returns: A generator of the output lines (str)
+        """
+
+        if not self.status():
+                stopping = False
+        cmd = self._dbscan_cmd(bename, index, key, width, isRaw, args)
+        if stopping:
+            self.stop()
+        self.log.info('Running script: %s', cmd)
+        try:
+            with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  encoding='utf-8', errors='replace') as proc:
+                try:
+                    yield from proc.stdout
+                finally:
+                    # The caller may stop reading before the end
+                    if proc.poll() is None:
+                        proc.kill()
+                if proc.wait() != 0:
+                    self.log.error('Failed to run dbscan: "%s" returned %d', cmd, proc.returncode)
+                    raise ValueError('Failed to run dbscan')
+        finally:
+            if stopping:
+                self.start()
+
     def dbverify(self, bename):
         """
         @param bename - the backend name to verify
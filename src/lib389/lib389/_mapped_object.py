@@ -7,15 +7,20 @@
 # See LICENSE for details.
 # --- END COPYRIGHT BLOCK ---
 
+import re
+import threading
 import ldap
 import ldap.dn
 from ldap.controls import SimplePagedResultsControl
 from ldap import filter as ldap_filter
+from ldap.cidict import cidict
 import logging
 import json
+from collections import deque
+from contextlib import contextmanager
 from functools import partial
 from lib389._entry import Entry
-from lib389._constants import DIRSRV_STATE_ONLINE
+from lib389._constants import DIRSRV_STATE_ONLINE, DN_CONFIG
 from lib389._mapped_object_lint import DSLint, DSLints
 from lib389.utils import (
         ensure_bytes, ensure_str, ensure_int, ensure_list_bytes, ensure_list_str,
@@ -67,6 +72,41 @@ def _gen_filter(attrtypes, values, extra=None):
     return filt
 
 
+def _mods_to_modlist(mods):
+    """Turn [(action, key, value),] or [(ldap.MOD_DELETE, key),] mods
+    into a python-ldap modlist (see DSLdapObject.apply_mods())
+    """
+    mod_list = []
+    for mod in mods:
+        if len(mod) < 2:
+            # Error
+            raise ValueError('Not enough arguments in the mod op')
+        elif len(mod) == 2:  # no action
+            # This hack exists because the original lib389 Entry type
+            # does odd things.
+            action, key = mod
+            if action != ldap.MOD_DELETE:
+                raise ValueError('Only MOD_DELETE takes two arguments %s' % mod)
+            value = None
+            # Just add the raw mod, because we don't have a value
+            mod_list.append((action, key, value))
+        elif len(mod) == 3:
+            action, key, value = mod
+            if action != ldap.MOD_REPLACE and \
+               action != ldap.MOD_ADD and \
+               action != ldap.MOD_DELETE:
+                raise ValueError('Invalid mod action(%s)' % str(action))
+            if isinstance(value, list):
+                value = ensure_list_bytes(value)
+            else:
+                value = [ensure_bytes(value)]
+            mod_list.append((action, key, value))
+        else:
+            # Error too many items
+            raise ValueError('Too many arguments in the mod op')
+    return mod_list
+
+
 # Define wrappers around the ldap operation to have a clear diagnostic
 def _ldap_op_s(inst, f, fname, *args, **kwargs):
     # f.__name__ says 'inner' so the wanted name is provided as argument
@@ -79,22 +119,362 @@ def _ldap_op_s(inst, f, fname, *args, **kwargs):
             logging.getLogger().debug(f"args={e.args}")
         raise e
 
+def _is_readable(inst):
+    # The mapped objects read an instance when it is online, or when a
+    # snapshot of it is active (see SearchSnapshot)
+    return inst.state == DIRSRV_STATE_ONLINE or getattr(inst, '_search_snapshot', None) is not None
+
+def _invalidate_search_snapshot(inst):
+    snapshot = getattr(inst, '_search_snapshot', None)
+    if snapshot is not None:
+        snapshot.invalidate()
+
 def _add_ext_s(inst, *args, **kwargs):
+    _invalidate_search_snapshot(inst)
     return _ldap_op_s(inst, inst.add_ext_s, 'add_ext_s', *args, **kwargs)
 
 def _modify_ext_s(inst, *args, **kwargs):
+    _invalidate_search_snapshot(inst)
     return _ldap_op_s(inst, inst.modify_ext_s, 'modify_ext_s', *args, **kwargs)
 
 def _delete_ext_s(inst, *args, **kwargs):
+    _invalidate_search_snapshot(inst)
     return _ldap_op_s(inst, inst.delete_ext_s, 'delete_ext_s', *args, **kwargs)
 
 def _search_ext_s(inst, *args, **kwargs):
+    snapshot = getattr(inst, '_search_snapshot', None)
+    if snapshot is not None:
+        return snapshot.search_ext_s(partial(_ldap_op_s, inst, inst.search_ext_s, 'search_ext_s'), *args, **kwargs)
     return _ldap_op_s(inst, inst.search_ext_s, 'search_ext_s', *args, **kwargs)
 
 def _search_s(inst, *args, **kwargs):
     return _ldap_op_s(inst, inst.search_s, 'search_s', *args, **kwargs)
 
 
+def _dn_key(dn):
+    """Normalize a DN to compare it with other DNs"""
+    try:
+        return ldap.dn.dn2str(ldap.dn.str2dn(dn.lower()))
+    except ldap.DECODING_ERROR:
+        return dn.lower()
+
+
+def _parent_key(dn):
+    """Normalize the DN of the parent of an entry, like _dn_key()"""
+    try:
+        return ldap.dn.dn2str(ldap.dn.str2dn(dn.lower())[1:])
+    except ldap.DECODING_ERROR:
+        # Split at the first comma which is not escaped or quoted
+        (escaped, quoted) = (False, False)
+        for (idx, char) in enumerate(dn):
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                quoted = not quoted
+            elif char == ',' and not quoted:
+                return _dn_key(dn[idx + 1:].strip())
+        return ''
+
+
+def _filter_value(value):
+    """Unescape the value of a filter item (RFC 4515)"""
+    return ensure_str(re.sub(rb'\\([0-9a-fA-F]{2})', lambda m: bytes([int(m.group(1), 16)]), ensure_bytes(value)))
+
+
+def _parse_filter(filterstr):
+    """Parse an LDAP filter with the presence, equality and substring items,
+    and the and, or, not operators.
+
+    :param filterstr: The filter
+    :type filterstr: str
+    :returns: A tree of tuples: ('&', [...]), ('|', [...]), ('!', item),
+              ('present', attr), ('eq', attr, value), ('substr', attr, regex)
+    :raises: ValueError - if the filter is invalid or uses other items
+    """
+
+    def parse(pos):
+        if filterstr[pos] != '(':
+            raise ValueError(f'Unsupported filter: {filterstr}')
+        pos += 1
+        if filterstr[pos] in '&|':
+            op = filterstr[pos]
+            pos += 1
+            items = []
+            while filterstr[pos] == '(':
+                (item, pos) = parse(pos)
+                items.append(item)
+            node = (op, items)
+        elif filterstr[pos] == '!':
+            (item, pos) = parse(pos + 1)
+            node = ('!', item)
+        else:
+            # ')' is escaped in the values, the first one ends the item
+            end = filterstr.find(')', pos)
+            if end == -1:
+                raise ValueError(f'Invalid filter: {filterstr}')
+            (attr, sep, value) = filterstr[pos:end].partition('=')
+            if sep == '' or attr == '' or attr[-1] in '<>~' or ':' in attr or ';' in attr:
+                raise ValueError(f'Unsupported filter: {filterstr}')
+            if value == '*':
+                node = ('present', attr)
+            elif '*' in value:
+                pattern = '.*'.join(re.escape(_filter_value(part)) for part in value.split('*'))
+                node = ('substr', attr, re.compile(pattern, re.IGNORECASE | re.DOTALL))
+            else:
+                node = ('eq', attr, _filter_value(value).lower())
+            pos = end
+        if filterstr[pos] != ')':
+            raise ValueError(f'Unsupported filter: {filterstr}')
+        return (node, pos + 1)
+
+    if not filterstr.startswith('('):
+        filterstr = f'({filterstr})'
+    try:
+        (node, pos) = parse(0)
+    except IndexError:
+        raise ValueError(f'Invalid filter: {filterstr}')
+    if pos != len(filterstr):
+        raise ValueError(f'Invalid filter: {filterstr}')
+    return node
+
+
+def _match_filter(node, attrs):
+    """Match the attributes (lower case name -> (name, values)) of an entry
+    with a filter parsed by _parse_filter()
+    """
+    op = node[0]
+    if op == '&':
+        return all(_match_filter(item, attrs) for item in node[1])
+    if op == '|':
+        return any(_match_filter(item, attrs) for item in node[1])
+    if op == '!':
+        return not _match_filter(node[1], attrs)
+    values = attrs.get(node[1].lower())
+    if values is None:
+        return False
+    if op == 'present':
+        return True
+    values = [ensure_str(value) for value in values[1]]
+    if op == 'substr':
+        return any(node[2].fullmatch(value) for value in values)
+    wanted = node[2]
+    for value in values:
+        value = value.lower()
+        if value == wanted:
+            return True
+        if '=' in value and '=' in wanted and _dn_key(value) == _dn_key(wanted):
+            return True
+    return False
+
+
+class SearchSnapshot(object):
+    """Answer the searches made through the mapped objects from a snapshot
+    of the server, for a series of read only operations like a healthcheck.
+
+    The subtrees of the bases are read at once, the searches in them are
+    answered from memory. The other searches are sent to the server once,
+    and their result is kept. Any add, modify or delete made through the
+    mapped objects drops the snapshot, the following searches are sent to
+    the server.
+
+    The snapshot can be taken from a dse.ldif instead, when the server is
+    not running.  The searches under the bases are answered from it, and
+    the other searches fail with SERVER_DOWN.  The dse.ldif only has the
+    attributes which were set, the defaults of the server can be given for
+    the others.
+
+    Use it as a context manager:
+
+        with SearchSnapshot(inst):
+            ...
+
+    :param instance: An instance
+    :type instance: lib389.DirSrv
+    :param bases: The base DNs of the subtrees to read
+    :type bases: list
+    :param dse_ldif: Take the snapshot from this dse.ldif, not from the server
+    :type dse_ldif: lib389.dseldif.DSEldif
+    :param defaults: The values of the attributes missing from the dse.ldif
+                     entries, a dict of DNs and of dicts of attribute names
+                     and lists of str values
+    :type defaults: dict
+    """
+
+    # The operational attributes stored in a dse.ldif
+    _DSE_OPERATIONAL_ATTRS = ('creatorsname', 'modifiersname', 'createtimestamp', 'modifytimestamp')
+
+    def __init__(self, instance, bases=(DN_CONFIG,), dse_ldif=None, defaults=None):
+        self._instance = instance
+        self._bases = [_dn_key(base) for base in bases]
+        self._dse_ldif = dse_ldif
+        self._defaults = {_dn_key(dn): attrs for (dn, attrs) in (defaults or {}).items()}
+        self._lock = threading.Lock()
+        self._previous = None
+        self.clear()
+
+    def clear(self):
+        """Drop the snapshot"""
+        # dn key -> (dn, user attributes, operational attributes), the
+        # attributes are dicts of lower case name -> (name, values)
+        self._entries = {}
+        # dn key -> dn keys of the children, in the order of the server
+        self._children = {}
+        self._results = {}
+        self._valid = False
+
+    def invalidate(self):
+        """Drop the snapshot, the following searches are sent to the server"""
+        with self._lock:
+            self.clear()
+
+    def _add(self, dn, attrs, operational):
+        key = _dn_key(dn)
+        if key not in self._entries:
+            self._entries[key] = (dn, {}, {})
+            if key not in self._bases:
+                self._children.setdefault(_parent_key(dn), []).append(key)
+        for (name, values) in attrs.items():
+            self._entries[key][2 if operational else 1][name.lower()] = (name, values)
+
+    def take(self):
+        """Read the subtrees of the bases"""
+        with self._lock:
+            self.clear()
+            if self._dse_ldif is not None:
+                for (dn, attrs) in self._dse_ldif.get_entries():
+                    if self._in_snapshot(_dn_key(dn)):
+                        self._add(dn, {name: vals for (name, vals) in attrs.items()
+                                       if name.lower() not in self._DSE_OPERATIONAL_ATTRS}, False)
+                        self._add(dn, {name: vals for (name, vals) in attrs.items()
+                                       if name.lower() in self._DSE_OPERATIONAL_ATTRS}, True)
+                for (key, attrs) in self._defaults.items():
+                    if key in self._entries:
+                        user = self._entries[key][1]
+                        self._add(self._entries[key][0],
+                                  {name: [ensure_bytes(val) for val in vals] for (name, vals) in attrs.items()
+                                   if name.lower() not in user}, False)
+            else:
+                for base in self._bases:
+                    for (attrlist, operational) in ((['*'], False), (['+'], True)):
+                        entries = _ldap_op_s(self._instance, self._instance.search_ext_s, 'search_ext_s',
+                                             base, ldap.SCOPE_SUBTREE, '(objectClass=*)', attrlist=attrlist,
+                                             escapehatch='i am sure')
+                        for entry in entries:
+                            self._add(entry.dn, entry.data, operational)
+            self._valid = True
+
+    def __enter__(self):
+        self.take()
+        self._previous = getattr(self._instance, '_search_snapshot', None)
+        self._instance._search_snapshot = self
+        return self
+
+    def __exit__(self, *args):
+        self._instance._search_snapshot = self._previous
+        self._previous = None
+        self.invalidate()
+
+    def _in_snapshot(self, key):
+        return any(key == base or key.endswith(',' + base) for base in self._bases)
+
+    @staticmethod
+    def _entry(node, attrlist, attrsonly):
+        (dn, user, operational) = node
+        attrs = {}
+        for attr in attrlist or ['*']:
+            attr = attr.lower()
+            if attr == '*':
+                attrs.update(user.values())
+            elif attr == '+':
+                attrs.update(operational.values())
+            elif attr in user:
+                attrs.update([user[attr]])
+            elif attr in operational:
+                attrs.update([operational[attr]])
+        if attrsonly:
+            attrs = {name: [] for name in attrs}
+        return Entry((dn, attrs))
+
+    def _search_snapshot(self, base, scope, filterstr, attrlist, attrsonly):
+        """Search the snapshot, or return None if it can't answer"""
+        key = _dn_key(base)
+        offline = self._dse_ldif is not None
+        if not self._valid or not self._in_snapshot(key):
+            return None
+        if key not in self._entries:
+            if offline:
+                raise ldap.NO_SUCH_OBJECT({'desc': 'No such object', 'matched': ''})
+            return None
+        if 'ldapsubentry' in filterstr.lower() and not offline:
+            # The subentries are not in the snapshot
+            return None
+        try:
+            node = _parse_filter(filterstr)
+        except ValueError:
+            return None
+        if scope == ldap.SCOPE_BASE:
+            keys = [key]
+        elif scope == ldap.SCOPE_ONELEVEL:
+            keys = self._children.get(key, [])
+        else:
+            keys = [key]
+            idx = 0
+            while idx < len(keys):
+                keys.extend(self._children.get(keys[idx], []))
+                idx += 1
+        results = []
+        for entry_key in keys:
+            entry = self._entries[entry_key]
+            attrs = dict(entry[1])
+            attrs.update(entry[2])
+            if _match_filter(node, attrs):
+                results.append(self._entry(entry, attrlist, attrsonly))
+        return results
+
+    def search_ext_s(self, search, base, scope, filterstr='(objectClass=*)', attrlist=None, attrsonly=0,
+                     serverctrls=None, clientctrls=None, **kwargs):
+        """Answer a search_ext_s() from the snapshot
+
+        :param search: The function sending the search to the server
+        :type search: function
+        :returns: A list of Entry
+        """
+        if (serverctrls or clientctrls or set(kwargs) - {'escapehatch'}) and self._dse_ldif is None:
+            # Controls, timeouts or limits: always ask the server
+            return search(base, scope, filterstr, attrlist=attrlist, attrsonly=attrsonly,
+                          serverctrls=serverctrls, clientctrls=clientctrls, **kwargs)
+
+        with self._lock:
+            results = self._search_snapshot(base, scope, filterstr, attrlist, attrsonly)
+            if results is not None:
+                return results
+            if self._dse_ldif is not None:
+                raise ldap.SERVER_DOWN({'desc': "Can't contact LDAP server",
+                                        'info': f'Searching {base} with {filterstr} needs the server running'})
+            result_key = (_dn_key(base), scope, filterstr, tuple(attrlist) if attrlist else None, attrsonly)
+            valid = self._valid
+            if valid and result_key in self._results:
+                (results, error) = self._results[result_key]
+                if error is not None:
+                    raise error[0](*error[1])
+                return list(results)
+
+        try:
+            results = search(base, scope, filterstr, attrlist=attrlist, attrsonly=attrsonly,
+                             serverctrls=serverctrls, clientctrls=clientctrls, **kwargs)
+        except ldap.NO_SUCH_OBJECT as e:
+            with self._lock:
+                if valid and self._valid:
+                    self._results[result_key] = (None, (type(e), e.args))
+            raise
+        with self._lock:
+            if valid and self._valid:
+                self._results[result_key] = (results, None)
+        return list(results)
+
+
 class DSLogging(object):
     """The benefit of this is automatic name detection, and correct application
     of level and verbosity to the object.
@@ -121,6 +501,10 @@ class DSLdapObject(DSLogging, DSLint):
     :type dn: str
     """
 
+    # The entry pinned by prefetch(), and the attributes it was searched with
+    _pinned_attrlist = None
+    _pinned_entry = None
+
     # TODO: Automatically create objects when they are requested to have properties added
     def __init__(self, instance, dn=None):
         self._instance = instance
@@ -164,6 +548,85 @@ class DSLdapObject(DSLogging, DSLint):
                                            serverctrls=self._server_controls, clientctrls=self._client_controls,
                                            escapehatch='i am sure')[0]
 
+    def prefetch(self, attrlist=None):
+        """Fetch the entry once and answer the following attribute reads from
+        it instead of searching the server for every read. The entry stays
+        pinned until unpin() is called.
+
+        Writes made with this object invalidate the entry, it is fetched
+        again on the next read. Changes made through other objects or
+        connections are not seen until invalidate() is called.
+
+        :param attrlist: The attributes to fetch, all the real and
+                         operational attributes by default. Reads of other
+                         attributes still search the server.
+        :type attrlist: list
+        :returns: self
+        """
+
+        if attrlist is None:
+            attrlist = ['*', '+']
+        self._pinned_attrlist = list(attrlist)
+        self._pinned_entry = None
+        self._get_pinned_entry([])
+        return self
+
+    @contextmanager
+    def snapshot(self, attrlist=None):
+        """A context manager pinning the entry with prefetch() for the
+        duration of the block
+
+        :param attrlist: The attributes to fetch, see prefetch()
+        :type attrlist: list
+        """
+
+        self.prefetch(attrlist)
+        try:
+            yield self
+        finally:
+            self.unpin()
+
+    def invalidate(self):
+        """Drop the pinned entry, it is fetched again on the next read"""
+
+        self._pinned_entry = None
+
+    def unpin(self):
+        """Stop answering the attribute reads from a pinned entry"""
+
+        self._pinned_attrlist = None
+        self._pinned_entry = None
+
+    def _pin_entry(self, entry, attrlist):
+        """Pin an entry returned by a search made with attrlist"""
+
+        self._pinned_attrlist = list(attrlist)
+        self._pinned_entry = entry
+
+    def _get_pinned_entry(self, keys):
+        """Get the pinned entry if it holds all the keys
+
+        :param keys: The attribute names to read
+        :type keys: list
+        :returns: Entry or None if the attributes must be searched
+        """
+
+        if self._pinned_attrlist is None:
+            return None
+        attrlist = [attr.lower() for attr in self._pinned_attrlist]
+        if '*' not in attrlist or '+' not in attrlist:
+            for key in keys:
+                if key.lower() not in attrlist:
+                    return None
+        if self._pinned_entry is None:
+            entries = _search_ext_s(self._instance, self._dn, ldap.SCOPE_BASE, self._object_filter,
+                                    attrlist=self._pinned_attrlist, serverctrls=self._server_controls,
+                                    clientctrls=self._client_controls, escapehatch='i am sure')
+            if len(entries) == 0:
+                return None
+            self._pinned_entry = entries[0]
+        return self._pinned_entry
+
     def exists(self):
         """Check if the entry exists
 
@@ -288,13 +751,14 @@ class DSLdapObject(DSLogging, DSLint):
         :returns: True if attr is present
         """
 
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get presence on instance that is not ONLINE")
         self._log.debug("%s present(%r) %s" % (self._dn, attr, value))
 
-        _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter, attrlist=[attr, ],
-                                        serverctrls=self._server_controls, clientctrls=self._client_controls,
-                                        escapehatch='i am sure')[0]
+        if self._get_pinned_entry([attr]) is None:
+            _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter, attrlist=[attr, ],
+                                            serverctrls=self._server_controls, clientctrls=self._client_controls,
+                                            escapehatch='i am sure')[0]
         values = self.get_attr_vals_bytes(attr)
         self._log.debug("%s contains %s" % (self._dn, values))
 
@@ -336,6 +800,7 @@ class DSLdapObject(DSLogging, DSLint):
             else:
                 value = [ensure_bytes(arg[1])]
             mods.append((ldap.MOD_ADD, ensure_str(arg[0]), value))
+        self.invalidate()
         return _modify_ext_s(self._instance,self._dn, mods, serverctrls=self._server_controls,
                                             clientctrls=self._client_controls, escapehatch='i am sure')
 
@@ -370,6 +835,7 @@ class DSLdapObject(DSLogging, DSLint):
             else:
                 value = [ensure_bytes(arg[1])]
             mods.append((ldap.MOD_REPLACE, ensure_str(arg[0]), value))
+        self.invalidate()
         return _modify_ext_s(self._instance,self._dn, mods, serverctrls=self._server_controls,
                                            clientctrls=self._client_controls, escapehatch='i am sure')
 
@@ -514,6 +980,7 @@ class DSLdapObject(DSLogging, DSLint):
         elif value is not None:
             value = [ensure_bytes(value)]
 
+        self.invalidate()
         return _modify_ext_s(self._instance,self._dn, [(action, key, value)],
                                            serverctrls=self._server_controls, clientctrls=self._client_controls,
                                            escapehatch='i am sure')
@@ -526,34 +993,8 @@ class DSLdapObject(DSLogging, DSLint):
         :raises: ValueError - if a provided mod op is invalid
         """
 
-        mod_list = []
-        for mod in mods:
-            if len(mod) < 2:
-                # Error
-                raise ValueError('Not enough arguments in the mod op')
-            elif len(mod) == 2:  # no action
-                # This hack exists because the original lib389 Entry type
-                # does odd things.
-                action, key = mod
-                if action != ldap.MOD_DELETE:
-                    raise ValueError('Only MOD_DELETE takes two arguments %s' % mod)
-                value = None
-                # Just add the raw mod, because we don't have a value
-                mod_list.append((action, key, value))
-            elif len(mod) == 3:
-                action, key, value = mod
-                if action != ldap.MOD_REPLACE and \
-                   action != ldap.MOD_ADD and \
-                   action != ldap.MOD_DELETE:
-                    raise ValueError('Invalid mod action(%s)' % str(action))
-                if isinstance(value, list):
-                    value = ensure_list_bytes(value)
-                else:
-                    value = [ensure_bytes(value)]
-                mod_list.append((action, key, value))
-            else:
-                # Error too many items
-                raise ValueError('Too many arguments in the mod op')
+        mod_list = _mods_to_modlist(mods)
+        self.invalidate()
         return _modify_ext_s(self._instance,self._dn, mod_list, serverctrls=self._server_controls, clientctrls=self._client_controls, escapehatch='i am sure')
 
     def _unsafe_compare_attribute(self, other):
@@ -639,6 +1080,19 @@ class DSLdapObject(DSLogging, DSLint):
 
         return compare_attrs_dict
 
+    def _get_all_attrs_entry(self):
+        """Search the entry with all its real and operational attributes
+
+        :returns: A list with the entry, or an empty list
+        """
+
+        entry = self._get_pinned_entry(["*", "+"])
+        if entry is not None:
+            return [entry]
+        return _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
+                             attrlist=["*", "+"], serverctrls=self._server_controls,
+                             clientctrls=self._client_controls, escapehatch='i am sure')
+
     def get_all_attrs(self, use_json=False):
         """Get a dictionary having all the attributes of the entry
 
@@ -646,16 +1100,14 @@ class DSLdapObject(DSLogging, DSLint):
         """
 
         self._log.debug("%s get_all_attrs" % (self._dn))
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get properties on instance that is not ONLINE")
         else:
             # retrieving real(*) and operational attributes(+)
-            attrs_entry = _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
-                                                      attrlist=["*", "+"], serverctrls=self._server_controls,
-                                                      clientctrls=self._client_controls, escapehatch='i am sure')
+            attrs_entry = self._get_all_attrs_entry()
             if len(attrs_entry) > 0:
                 # getting dict from 'entry' object
-                attrs_dict = attrs_entry[0].data
+                attrs_dict = cidict(attrs_entry[0].data)
                 # Should we normalise the attr names here to lower()?
                 # This could have unforseen consequences ...
                 return attrs_dict
@@ -669,13 +1121,11 @@ class DSLdapObject(DSLogging, DSLint):
         """
 
         self._log.debug("%s get_all_attrs" % (self._dn))
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get properties on instance that is not ONLINE")
         else:
             # retrieving real(*) and operational attributes(+)
-            attrs_entry = _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
-                                                      attrlist=["*", "+"], serverctrls=self._server_controls,
-                                                      clientctrls=self._client_controls, escapehatch='i am sure')
+            attrs_entry = self._get_all_attrs_entry()
             if len(attrs_entry) > 0:
                 # getting dict from 'entry' object
                 r = {}
@@ -685,14 +1135,27 @@ class DSLdapObject(DSLogging, DSLint):
             else:
                 return {}
 
+    def _get_attrs_entry(self, keys):
+        """Search the entry with some attributes
+
+        :param keys: The attribute names
+        :type keys: list
+        :returns: A list with the entry, or an empty list
+        """
+
+        entry = self._get_pinned_entry(keys)
+        if entry is not None:
+            return [entry]
+        return _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
+                             attrlist=keys, serverctrls=self._server_controls,
+                             clientctrls=self._client_controls, escapehatch='i am sure')
+
     def get_attrs_vals(self, keys, use_json=False):
         self._log.debug("%s get_attrs_vals(%r)" % (self._dn, keys))
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get properties on instance that is not ONLINE")
         else:
-            entry = _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
-                                                attrlist=keys, serverctrls=self._server_controls,
-                                                clientctrls=self._client_controls, escapehatch='i am sure')
+            entry = self._get_attrs_entry(keys)
             if len(entry) > 0:
                 return entry[0].getValuesSet(keys)
             else:
@@ -700,11 +1163,9 @@ class DSLdapObject(DSLogging, DSLint):
 
     def get_attrs_vals_utf8(self, keys, use_json=False):
         self._log.debug("%s get_attrs_vals_utf8(%r)" % (self._dn, keys))
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get properties on instance that is not ONLINE")
-        entry = _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter, attrlist=keys,
-                                            serverctrls=self._server_controls, clientctrls=self._client_controls,
-                                            escapehatch='i am sure')
+        entry = self._get_attrs_entry(keys)
         if len(entry) > 0:
             vset = entry[0].getValuesSet(keys)
             r = {}
@@ -717,16 +1178,14 @@ class DSLdapObject(DSLogging, DSLint):
     def get_attr_vals(self, key, use_json=False):
         self._log.debug("%s get_attr_vals(%r)" % (self._dn, key))
         # We might need to add a state check for NONE dn.
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get properties on instance that is not ONLINE")
             # In the future, I plan to add a mode where if local == true, we
             # can use get on dse.ldif to get values offline.
         else:
             # It would be good to prevent the entry code intercepting this ....
             # We have to do this in this method, because else we ignore the scope base.
-            entry = _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
-                                                attrlist=[key], serverctrls=self._server_controls,
-                                                clientctrls=self._client_controls, escapehatch='i am sure')
+            entry = self._get_attrs_entry([key])
             if len(entry) > 0:
                 vals = entry[0].getValues(key)
                 if use_json:
@@ -745,14 +1204,12 @@ class DSLdapObject(DSLogging, DSLint):
     def get_attr_val(self, key, use_json=False):
         self._log.debug("%s getVal(%r)" % (self._dn, key))
         # We might need to add a state check for NONE dn.
-        if self._instance.state != DIRSRV_STATE_ONLINE:
+        if not _is_readable(self._instance):
             raise ValueError("Invalid state. Cannot get properties on instance that is not ONLINE")
             # In the future, I plan to add a mode where if local == true, we
             # can use get on dse.ldif to get values offline.
         else:
-            entry = _search_ext_s(self._instance,self._dn, ldap.SCOPE_BASE, self._object_filter,
-                                                attrlist=[key], serverctrls=self._server_controls,
-                                                clientctrls=self._client_controls, escapehatch='i am sure')
+            entry = self._get_attrs_entry([key])
             if len(entry) > 0:
                 return entry[0].getValue(key)
             else:
@@ -884,6 +1341,7 @@ class DSLdapObject(DSLogging, DSLint):
         if self._protected:
             return
 
+        self.invalidate()
         self._instance.rename_s(self._dn, new_rdn, newsuperior,
                                 serverctrls=self._server_controls, clientctrls=self._client_controls,
                                 delold=deloldrdn, escapehatch='i am sure')
@@ -906,6 +1364,7 @@ class DSLdapObject(DSLogging, DSLint):
 
         self._log.debug("%s delete" % (self._dn))
         if not self._protected:
+            self.unpin()
             # Is there a way to mark this as offline and kill it
             if recursive:
                 filterstr = "(|(objectclass=*)(objectclass=ldapsubentry))"
@@ -1124,16 +1583,41 @@ class DSLdapObjects(DSLogging, DSLints):
         # functions with very little work on the behalf of the overloader
         return self._childobject(instance=self._instance, dn=dn)
 
-    def list(self, paged_search=None, paged_critical=True):
+    def _get_prefetch_attrlist(self, prefetch):
+        """Get the attributes to search for the prefetch argument of list() and get()"""
+
+        if prefetch is True:
+            return ['*', '+']
+        return list(prefetch)
+
+    def _prefetched_instance(self, entry, attrlist):
+        """Map an entry to a child instance, pinning the entry if it was searched
+        with the attributes in attrlist (see DSLdapObject.prefetch())
+        """
+
+        inst = self._entry_to_instance(dn=entry.dn, entry=entry)
+        if attrlist is not None:
+            inst._pin_entry(entry, attrlist)
+        return inst
+
+    def list(self, paged_search=None, paged_critical=True, prefetch=False):
         """Get a list of children entries (DSLdapObject, Replica, etc.) using a base DN
         and objectClasses of our object (DSLdapObjects, Replicas, etc.)
 
         :param paged_search: None for no paged search, or an int of page size to use.
+        :param prefetch: Fetch the attributes of the children in the same search and
+                         pin them (see DSLdapObject.prefetch()). True for all the real
+                         and operational attributes, or a list of attributes.
         :returns: A list of children entries
         """
 
         # Filter based on the objectclasses and the basedn
         insts = None
+        prefetch_attrlist = None
+        attrlist = self._list_attrlist
+        if prefetch:
+            prefetch_attrlist = self._get_prefetch_attrlist(prefetch)
+            attrlist = prefetch_attrlist
         # This will yield and & filter for objectClass with as many terms as needed.
         filterstr = self._get_objectclass_filter()
         self._log.debug('list filter = %s' % filterstr)
@@ -1154,7 +1638,7 @@ class DSLdapObjects(DSLogging, DSLints):
                         base=self._basedn,
                         scope=self._scope,
                         filterstr=filterstr,
-                        attrlist=self._list_attrlist,
+                        attrlist=attrlist,
                         serverctrls=controls,
                         clientctrls=self._client_controls,
                         escapehatch='i am sure'
@@ -1177,7 +1661,7 @@ class DSLdapObjects(DSLogging, DSLints):
                 #End while
             # Result3 doesn't map through Entry, so we have to do it manually.
             results = [Entry(r) for r in results]
-            insts = [self._entry_to_instance(dn=r.dn, entry=r) for r in results]
+            insts = [self._prefetched_instance(r, prefetch_attrlist) for r in results]
             # End paged search
         else:
             # If not paged
@@ -1186,12 +1670,12 @@ class DSLdapObjects(DSLogging, DSLints):
                     base=self._basedn,
                     scope=self._scope,
                     filterstr=filterstr,
-                    attrlist=self._list_attrlist,
+                    attrlist=attrlist,
                     serverctrls=self._server_controls, clientctrls=self._client_controls,
                     escapehatch='i am sure'
                 )
                 # def __init__(self, instance, dn=None):
-                insts = [self._entry_to_instance(dn=r.dn, entry=r) for r in results]
+                insts = [self._prefetched_instance(r, prefetch_attrlist) for r in results]
             except ldap.NO_SUCH_OBJECT:
                 # There are no objects to select from, se we return an empty array
                 insts = []
@@ -1216,7 +1700,7 @@ class DSLdapObjects(DSLogging, DSLints):
         else:
             return False
 
-    def get(self, selector=[], dn=None, json=False):
+    def get(self, selector=[], dn=None, json=False, prefetch=False):
         """Get a child entry (DSLdapObject, Replica, etc.) with dn or selector
         using a base DN and objectClasses of our object (DSLdapObjects, Replicas, etc.)
 
@@ -1226,28 +1710,41 @@ class DSLdapObjects(DSLogging, DSLints):
         :type dn: str
         :param selector: An additional filter to search for, i.e. 'backend_name'. The attributes selected are based on object type, ie user will search for uid and cn.
         :type dn: str
+        :param prefetch: Fetch the attributes of the child in the same search and
+                         pin them (see DSLdapObject.prefetch()). True for all the real
+                         and operational attributes, or a list of attributes.
 
         :returns: A child entry
         """
 
         results = []
-        if dn is not None:
-            criteria = dn
-            search_filter = self._get_objectclass_filter()
-            results = self._get_dn(dn)
-        else:
-            criteria = selector
-            search_filter = self._get_selector_filter(selector)
-            results = self._get_selector(selector)
+        prefetch_attrlist = None
+        list_attrlist = self._list_attrlist
+        if prefetch:
+            # _get_dn and _get_selector are overridden by some types, so swap
+            # the attributes they search for rather than passing them along.
+            prefetch_attrlist = self._get_prefetch_attrlist(prefetch)
+            self._list_attrlist = prefetch_attrlist
+        try:
+            if dn is not None:
+                criteria = dn
+                search_filter = self._get_objectclass_filter()
+                results = self._get_dn(dn)
+            else:
+                criteria = selector
+                search_filter = self._get_selector_filter(selector)
+                results = self._get_selector(selector)
+        finally:
+            self._list_attrlist = list_attrlist
 
         if len(results) == 0:
             raise ldap.NO_SUCH_OBJECT(f"No object exists given the filter criteria: {criteria} {search_filter}")
         if len(results) > 1:
             raise ldap.UNWILLING_TO_PERFORM(f"Too many objects matched selection criteria: {criteria} {search_filter}")
         if json:
-            return self._entry_to_instance(results[0].dn, results[0]).get_all_attrs_json()
+            return self._prefetched_instance(results[0], prefetch_attrlist).get_all_attrs_json()
         else:
-            return self._entry_to_instance(results[0].dn, results[0])
+            return self._prefetched_instance(results[0], prefetch_attrlist)
 
     def _get_dn(self, dn):
         # This will yield and & filter for objectClass with as many terms as needed.
@@ -1359,6 +1856,92 @@ class DSLdapObjects(DSLogging, DSLints):
             insts = []
         return insts
 
+    def bulk_apply_mods(self, mods, search=None, scope=None, page_size=500, window=64, skip_base=False):
+        """Apply the same modifications to all the matching children entries.
+        The entries are streamed with a paged search and modified with
+        asynchronous operations, at most window of them being in progress.
+
+        :param mods: [(action, key, value),] or [(ldap.MOD_DELETE, key),]
+        :type mods: list of tuples
+        :param search: A filter the entries must match
+        :type search: str
+        :param scope: The search scope
+        :type scope: int
+        :param page_size: The number of entries returned per page
+        :type page_size: int
+        :param window: The maximum number of modify operations in progress
+        :type window: int
+        :param skip_base: Do not modify the base DN entry
+        :type skip_base: bool
+        :returns: A generator of (dn, error) tuples in the search order, error
+                  is None if the entry was modified, the ldap.LDAPError if the
+                  modification failed, or a ValueError for the skipped base entry
+        :raises: ValueError - if a provided mod op or the window is invalid
+        """
+
+        mod_list = _mods_to_modlist(mods)
+        if window < 1:
+            raise ValueError(f'Invalid window ({window}), it must be at least 1')
+        if search:
+            search_filter = _gen_and([self._get_objectclass_filter(), search])
+        else:
+            search_filter = self._get_objectclass_filter()
+        if scope is None:
+            scope = self._scope
+        self._log.debug(f'bulk modify filter = {search_filter} with scope {scope} and mods {mod_list}')
+        req_pr_ctrl = SimplePagedResultsControl(True, size=page_size, cookie='')
+        pending = deque()
+        search_msgid = None
+
+        def _search_page():
+            return self._instance.search_ext(base=self._basedn, scope=scope, filterstr=search_filter,
+                                             attrlist=['1.1'], serverctrls=[req_pr_ctrl] + (self._server_controls or []),
+                                             clientctrls=self._client_controls, escapehatch='i am sure')
+
+        def _wait_oldest():
+            dn, msgid = pending.popleft()
+            try:
+                self._instance.result3(msgid, escapehatch='i am sure')
+            except ldap.LDAPError as e:
+                return (dn, e)
+            return (dn, None)
+
+        try:
+            search_msgid = _search_page()
+            while search_msgid is not None:
+                try:
+                    rtype, rdata, rmsgid, rctrls = self._instance.result3(search_msgid, escapehatch='i am sure')
+                except ldap.NO_SUCH_OBJECT:
+                    rdata, rctrls = [], []
+                # Request the next page before modifying the entries of this one
+                search_msgid = None
+                pctrls = [c for c in rctrls if c.controlType == SimplePagedResultsControl.controlType]
+                if pctrls and pctrls[0].cookie:
+                    req_pr_ctrl.cookie = pctrls[0].cookie
+                    search_msgid = _search_page()
+                for dn, attrs in rdata:
+                    if dn is None:
+                        # Search reference
+                        continue
+                    if skip_base and dn.lower() == self._basedn.lower():
+                        yield (dn, ValueError("Base DN Entry Skipped"))
+                        continue
+                    while len(pending) >= window:
+                        yield _wait_oldest()
+                    msgid = self._instance.modify_ext(dn, mod_list, serverctrls=self._server_controls,
+                                                      clientctrls=self._client_controls, escapehatch='i am sure')
+                    pending.append((dn, msgid))
+            while pending:
+                yield _wait_oldest()
+        finally:
+            # The caller may stop before the end, so do not leave
+            # operations in progress on the connection
+            if search_msgid is not None:
+                self._instance.abandon(search_msgid)
+            while pending:
+                _wait_oldest()
+
+
 class CompositeDSLdapObject(DSLdapObject):
     """A virtual view as a single object that merges two entry attributes.
        This class is not supposed to be called directly but through subclasses.
@@ -8,9 +8,11 @@
 
 import ldap
 import re
+import threading
 import time
 import json
 import datetime
+import logging
 from lib389._constants import *
 from lib389.properties import *
 from lib389.cli_base import _get_arg
@@ -20,6 +22,184 @@ from lib389 import Entry, DirSrv, NoSuchEntryError, InvalidArgumentError
 from lib389._mapped_object import DSLdapObject, DSLdapObjects
 
 
+class RUVCache(object):
+    """The database RUV entries of the servers of a replication topology,
+    and the connections opened to read them. It is shared by the status of
+    many agreements so that each consumer is connected to once, and the RUV
+    of each server is searched once. It can be used by many threads.
+
+    :param verbose: Verbose mode of the opened connections
+    :type verbose: boolean
+    :param timeout: The network and operation timeout of the opened
+                    connections, in seconds. None for no timeout.
+    :type timeout: int
+    :param logger: A logging interface
+    :type logger: python logging
+    """
+
+    def __init__(self, verbose=False, timeout=None, logger=None):
+        self._verbose = verbose
+        self._timeout = timeout
+        if logger is not None:
+            self._log = logger
+        else:
+            self._log = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._values = {}
+        # Connection id -> "host:port" of the server, to share its RUV
+        self._servers = {}
+        self._opened = []
+
+    def _get(self, key, fetch, cache_errors=False):
+        """Get the value of key, calling fetch once for all the threads"""
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self._values.get(key)
+            if cached is None:
+                try:
+                    cached = (fetch(), None)
+                except ldap.LDAPError as e:
+                    if not cache_errors:
+                        raise e
+                    cached = (None, e)
+                self._values[key] = cached
+        value, error = cached
+        if error is not None:
+            raise error
+        return value
+
+    def register(self, server, instance):
+        """Tell which server an already open connection is connected to, so
+        that its RUV is shared with the agreements pointing at the server
+
+        :param server: The "host:port" of the server
+        :type server: str
+        :param instance: An open connection to the server
+        :type instance: lib389.DirSrv
+        """
+
+        with self._lock:
+            self._servers[id(instance)] = server.lower()
+
+    def get_connection(self, host, port, protocol, binddn, bindpw):
+        """Get an open connection to a server, opening it on the first call.
+        A failure to connect is remembered and raised again.
+
+        :param host: The server host name
+        :type host: str
+        :param port: The server port
+        :type port: str
+        :param protocol: The transport of the port (ldap, ssl, ldaps...)
+        :type protocol: str
+        :param binddn: The bind DN
+        :type binddn: str
+        :param bindpw: The bind password
+        :type bindpw: str
+        :returns: DirSrv
+        :raises: LDAPError
+        """
+
+        def open_connection():
+            conn = DirSrv(verbose=self._verbose)
+            args_conn = args_instance.copy()
+            args_conn[SER_HOST] = host
+            if protocol is not None and protocol.lower() in ("ssl", "ldaps"):
+                args_conn[SER_SECURE_PORT] = int(port)
+            else:
+                args_conn[SER_PORT] = int(port)
+            args_conn[SER_ROOT_DN] = binddn
+            args_conn[SER_ROOT_PW] = bindpw
+            conn.allocate(args_conn)
+            conn.open(timeout=self._timeout)
+            self.register(f"{host}:{port}", conn)
+            with self._lock:
+                self._opened.append(conn)
+            return conn
+
+        key = ('connection', host.lower(), str(port), binddn)
+        return self._get(key, open_connection, cache_errors=True)
+
+    def get_ruv_entry(self, instance, suffix):
+        """Get the values of the database RUV entry of a suffix
+
+        :param instance: An open connection to the server
+        :type instance: lib389.DirSrv
+        :param suffix: The replicated suffix
+        :type suffix: str
+        :returns: A dict with the nsds50ruv and nsds5agmtmaxcsn values, the
+                  lists are empty if there is no RUV entry
+        :raises: LDAPError
+        """
+
+        def search_ruv():
+            ruv = {'nsds50ruv': [], 'nsds5agmtmaxcsn': []}
+            try:
+                entries = instance.search_ext_s(suffix, ldap.SCOPE_SUBTREE, REPLICA_RUV_FILTER,
+                                                attrlist=list(ruv.keys()), escapehatch='i am sure')
+            except ldap.NO_SUCH_OBJECT:
+                entries = []
+            if not entries:
+                self._log.debug(f"Failed to retrieve database RUV entry of {suffix}")
+            else:
+                for attr in ruv:
+                    ruv[attr] = ensure_list_str(entries[0].getValues(attr))
+            return ruv
+
+        with self._lock:
+            server = self._servers.get(id(instance), id(instance))
+        return self._get(('ruv', server, normalizeDN(suffix)), search_ruv)
+
+    def invalidate(self):
+        """Drop the RUV entries and the failed connections, so that the RUVs
+        are searched again and the failed servers are retried. The open
+        connections are kept.
+        """
+
+        with self._lock:
+            for key in list(self._values.keys()):
+                value, error = self._values[key]
+                if key[0] == 'ruv' or error is not None:
+                    del self._values[key]
+
+    def discard(self, host, port, binddn):
+        """Close and forget a connection, after the server went away
+
+        :param host: The server host name
+        :type host: str
+        :param port: The server port
+        :type port: str
+        :param binddn: The bind DN of the connection
+        :type binddn: str
+        """
+
+        key = ('connection', host.lower(), str(port), binddn)
+        with self._lock:
+            value, error = self._values.pop(key, (None, None))
+            if value is not None:
+                self._servers.pop(id(value), None)
+                self._opened = [conn for conn in self._opened if conn is not value]
+        if value is not None:
+            try:
+                value.close()
+            except ldap.LDAPError:
+                pass
+
+    def close(self):
+        """Close the connections opened by the cache"""
+
+        with self._lock:
+            opened = self._opened
+            self._opened = []
+        for conn in opened:
+            try:
+                conn.close()
+            except ldap.LDAPError:
+                pass
+
+
 class Agreement(DSLdapObject):
     """A replication agreement from this server instance to
     another instance of directory server.
@@ -108,16 +288,21 @@ class Agreement(DSLdapObject):
     def get_name(self):
         return self.get_attr_val_utf8_l('cn')
 
-    def get_agmt_maxcsn(self):
+    def get_agmt_maxcsn(self, ruv_cache=None):
         """Get the agreement maxcsn from the database RUV entry
+        :param ruv_cache: The RUV entries already read in a replication report
+        :type ruv_cache: RUVCache
         :returns: CSN string if found, otherwise None is returned
         """
-        from lib389.replica import Replicas
         suffix = self.get_attr_val_utf8(REPL_ROOT)
         agmt_name = self.get_attr_val_utf8('cn')
-        replicas = Replicas(self._instance)
-        replica = replicas.get(suffix)
-        maxcsns = replica.get_ruv_agmt_maxcsns()
+        if ruv_cache is not None:
+            maxcsns = ruv_cache.get_ruv_entry(self._instance, suffix)['nsds5agmtmaxcsn']
+        else:
+            from lib389.replica import Replicas
+            replicas = Replicas(self._instance)
+            replica = replicas.get(suffix)
+            maxcsns = replica.get_ruv_agmt_maxcsns()
 
         if maxcsns is None or len(maxcsns) == 0:
             self._log.debug('get_agmt_maxcsn - Failed to get agmt maxcsn from RUV')
@@ -135,12 +320,14 @@ class Agreement(DSLdapObject):
         self._log.debug('get_agmt_maxcsn - did not find matching agmt maxcsn from RUV')
         return None
 
-    def get_consumer_maxcsn(self, binddn=None, bindpw=None):
+    def get_consumer_maxcsn(self, binddn=None, bindpw=None, ruv_cache=None):
         """Attempt to get the consumer's maxcsn from its database RUV entry
         :param binddn: Specifies a specific bind DN to use when contacting the remote consumer
         :type binddn: str
         :param bindpw: Password for the bind DN
         :type bindpw: str
+        :param ruv_cache: The connections and RUV entries already used in a replication report
+        :type ruv_cache: RUVCache
         :returns: CSN string if found, otherwise "Unavailable" is returned
         """
         host = self.get_attr_val_utf8(AGMT_HOST)
@@ -163,63 +350,56 @@ class Agreement(DSLdapObject):
         replica = replicas.get(suffix)
         rid = replica.get_attr_val_utf8(REPL_ID)
 
-        # Open a connection to the consumer
-        consumer = DirSrv(verbose=self._instance.verbose)
-        args_instance[SER_HOST] = host
-        if protocol == "ssl" or protocol == "ldaps":
-            args_instance[SER_SECURE_PORT] = int(port)
-        else:
-            args_instance[SER_PORT] = int(port)
-        args_instance[SER_ROOT_DN] = binddn
-        args_instance[SER_ROOT_PW] = bindpw
-        args_standalone = args_instance.copy()
-        consumer.allocate(args_standalone)
+        # Open a connection to the consumer, unless the report already did
+        cache = ruv_cache
+        if cache is None:
+            cache = RUVCache(verbose=self._instance.verbose, logger=self._log)
         try:
-            consumer.open()
-        except ldap.INVALID_CREDENTIALS as e:
-            raise(e)
-        except ldap.LDAPError as e:
-            self._log.debug('Connection to consumer ({}:{}) failed, error: {}'.format(host, port, e))
-            return result_msg
+            try:
+                consumer = cache.get_connection(host, port, protocol, binddn, bindpw)
+            except ldap.INVALID_CREDENTIALS as e:
+                raise(e)
+            except ldap.LDAPError as e:
+                self._log.debug('Connection to consumer ({}:{}) failed, error: {}'.format(host, port, e))
+                return result_msg
 
-        # Search for the tombstone RUV entry
-        try:
-            entry = consumer.search_s(suffix, ldap.SCOPE_SUBTREE,
-                                      REPLICA_RUV_FILTER, ['nsds50ruv'])
-            if not entry:
-                self._log.debug("Failed to retrieve database RUV entry from consumer")
-            else:
-                elements = ensure_list_str(entry[0].getValues('nsds50ruv'))
+            # Search for the tombstone RUV entry
+            try:
+                elements = cache.get_ruv_entry(consumer, suffix)['nsds50ruv']
                 for ruv in elements:
                     if ('replica %s ' % rid) in ruv:
                         ruv_parts = ruv.split()
                         if len(ruv_parts) == 5:
                             result_msg = ruv_parts[4]
                         break
-        except ldap.INVALID_CREDENTIALS as e:
-            raise(e)
-        except ldap.LDAPError as e:
-            self._log.debug('Failed to search for the suffix ' +
-                                     '({}) consumer ({}:{}) failed, error: {}'.format(
-                                         suffix, host, port, e))
-        consumer.close()
+            except ldap.INVALID_CREDENTIALS as e:
+                raise(e)
+            except ldap.LDAPError as e:
+                self._log.debug('Failed to search for the suffix ' +
+                                         '({}) consumer ({}:{}) failed, error: {}'.format(
+                                             suffix, host, port, e))
+        finally:
+            if ruv_cache is None:
+                cache.close()
         return result_msg
 
-    def get_agmt_status(self, binddn=None, bindpw=None, return_json=False):
+    def get_agmt_status(self, binddn=None, bindpw=None, return_json=False, ruv_cache=None):
         """Return the status message
         :param binddn: Specifies a specific bind DN to use when contacting the remote consumer
         :type binddn: str
         :param bindpw: Password for the bind DN
         :type bindpw: str
+        :param ruv_cache: The connections and RUV entries already used in a replication report
+        :type ruv_cache: RUVCache
         :returns: A status message about the replication agreement
         """
         con_maxcsn = "Unknown"
         try:
-            agmt_maxcsn = self.get_agmt_maxcsn()
+            agmt_maxcsn = self.get_agmt_maxcsn(ruv_cache=ruv_cache)
             agmt_status = json.loads(self.get_attr_val_utf8_l(AGMT_UPDATE_STATUS_JSON))
             if agmt_maxcsn is not None:
                 try:
-                    con_maxcsn = self.get_consumer_maxcsn(binddn=binddn, bindpw=bindpw)
+                    con_maxcsn = self.get_consumer_maxcsn(binddn=binddn, bindpw=bindpw, ruv_cache=ruv_cache)
                     if con_maxcsn:
                         if agmt_maxcsn == con_maxcsn:
                             if return_json:
@@ -263,7 +443,7 @@ class Agreement(DSLdapObject):
         except ldap.LDAPError as e:
             raise ValueError(str(e))
 
-    def get_lag_time(self, suffix, agmt_name, binddn=None, bindpw=None):
+    def get_lag_time(self, suffix, agmt_name, binddn=None, bindpw=None, ruv_cache=None):
         """Get the lag time between the supplier and the consumer
         :param suffix: The replication suffix
         :type suffix: str
@@ -273,13 +453,15 @@ class Agreement(DSLdapObject):
         :type binddn: str
         :param bindpw: Password for the bind DN
         :type bindpw: str
+        :param ruv_cache: The connections and RUV entries already used in a replication report
+        :type ruv_cache: RUVCache
         :returns: A time-formated string of the the replication lag (HH:MM:SS).
         :raises: ValueError - if unable to get consumer's maxcsn
         """
 
         try:
-            agmt_maxcsn = self.get_agmt_maxcsn()
-            con_maxcsn = self.get_consumer_maxcsn(binddn=binddn, bindpw=bindpw)
+            agmt_maxcsn = self.get_agmt_maxcsn(ruv_cache=ruv_cache)
+            con_maxcsn = self.get_consumer_maxcsn(binddn=binddn, bindpw=bindpw, ruv_cache=ruv_cache)
         except ldap.LDAPError as e:
             raise ValueError("Unable to get lag time: " + str(e))
 
@@ -306,7 +488,8 @@ class Agreement(DSLdapObject):
         # Return a nice formated timestamp
         return "{:0>8}".format(str(lag))
 
-    def status(self, winsync=False, just_status=False, use_json=False, binddn=None, bindpw=None, pwprompt=False):
+    def status(self, winsync=False, just_status=False, use_json=False, binddn=None, bindpw=None, pwprompt=False,
+               ruv_cache=None):
         """Get the status of a replication agreement
         :param winsync: Specifies if the the agreement is a winsync replication agreement
         :type winsync: boolean
@@ -320,9 +503,21 @@ class Agreement(DSLdapObject):
         :type bindpw: str
         :param pwprompt: If binddn or bindpw is None, ask for them interactively
         :type pwprompt: boolean
+        :param ruv_cache: The connections and RUV entries already used in a replication
+                          report. By default the consumer is contacted once for this status.
+        :type ruv_cache: RUVCache
         :returns: A status message
         :raises: ValueError - if failing to get agmt status
         """
+        if ruv_cache is None and not winsync:
+            # The status and the lag time both need the supplier and consumer RUVs
+            ruv_cache = RUVCache(verbose=self._instance.verbose, logger=self._log)
+            try:
+                return self.status(winsync=winsync, just_status=just_status, use_json=use_json,
+                                   binddn=binddn, bindpw=bindpw, pwprompt=pwprompt, ruv_cache=ruv_cache)
+            finally:
+                ruv_cache.close()
+
         status_attrs_dict = self.get_all_attrs()
         status_attrs_dict = dict((k.lower(), v) for k, v in list(status_attrs_dict.items()))
 
@@ -340,7 +535,7 @@ class Agreement(DSLdapObject):
                 if bindpw is None:
                     bindpw = _get_arg(None, msg=f"Enter password for ({binddn}) to the replicated suffix ({suffix}) on {host}:{port}", hidden=True)
             try:
-                status = self.get_agmt_status(binddn=binddn, bindpw=bindpw)
+                status = self.get_agmt_status(binddn=binddn, bindpw=bindpw, ruv_cache=ruv_cache)
             except ldap.INVALID_CREDENTIALS as e:
                 raise(e)
             except ValueError as e:
@@ -354,7 +549,7 @@ class Agreement(DSLdapObject):
             # Get the lag time
             suffix = ensure_str(status_attrs_dict['nsds5replicaroot'][0])
             agmt_name = ensure_str(status_attrs_dict['cn'][0])
-            lag_time = self.get_lag_time(suffix, agmt_name, binddn=binddn, bindpw=bindpw)
+            lag_time = self.get_lag_time(suffix, agmt_name, binddn=binddn, bindpw=bindpw, ruv_cache=ruv_cache)
         else:
             lag_time = "Not available for Winsync agreements"
             status = "Not available for Winsync agreements"
@@ -8,7 +8,9 @@
 # --- END COPYRIGHT BLOCK ---
 
 import ast
+import importlib
 import logging
+import os
 import sys
 import json
 import ldap
@@ -454,6 +456,38 @@ def setup_script_logger(name, verbose=False):
     return log
 
 
+def create_lazy_parsers(subparsers, commands, argv=None):
+    """Register the subcommands of a cli tool, only importing the module
+    of a subcommand when it is part of the command line.
+
+    The other subcommands get a placeholder parser with the same name and
+    help, so "--help" lists all of them without importing anything.
+    When argcomplete is running, all the modules are imported.
+
+    :param subparsers: The subparsers of the tool
+    :type subparsers: argparse._SubParsersAction
+    :param commands: The (module name, create function name, subcommands)
+                     tuples, subcommands is a list of (name, aliases, help)
+    :type commands: list
+    :param argv: The command line arguments (default is sys.argv[1:])
+    :type argv: list
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    load_all = '_ARGCOMPLETE' in os.environ
+    words = set(argv)
+    for (module, create, subcommands) in commands:
+        names = set()
+        for (name, aliases, _) in subcommands:
+            names.add(name)
+            names.update(aliases)
+        if load_all or not names.isdisjoint(words):
+            getattr(importlib.import_module(module), create)(subparsers)
+        else:
+            for (name, aliases, help) in subcommands:
+                subparsers.add_parser(name, aliases=aliases, help=help)
+
+
 def format_error_to_dict(exception):
     """python-ldap str(exception) processing is not consistent.
     This function makes sure that the result is dict
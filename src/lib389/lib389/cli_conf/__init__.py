@@ -8,6 +8,46 @@
 import ldap
 from lib389 import ensure_list_str
 
+# The dsconf subcommands: (module, create function, [(name, aliases, help)]),
+# a module is only imported when one of its subcommands is used, see
+# lib389.cli_base.create_lazy_parsers()
+COMMANDS = [
+    ('lib389.cli_conf.backend', 'create_parser', [
+        ('backend', [], "Manage database suffixes and backends")]),
+    ('lib389.cli_conf.backup', 'create_parser', [
+        ('backup', [], "Manage online backups")]),
+    ('lib389.cli_conf.chaining', 'create_parser', [
+        ('chaining', [], "Manage database chaining and database links")]),
+    ('lib389.cli_conf.config', 'create_parser', [
+        ('config', [], "Manage the server configuration")]),
+    ('lib389.cli_conf.directory_manager', 'create_parsers', [
+        ('directory_manager', [], "Manage the Directory Manager account")]),
+    ('lib389.cli_conf.monitor', 'create_parser', [
+        ('monitor', [], "Monitor the state of the instance")]),
+    ('lib389.cli_conf.plugin', 'create_parser', [
+        ('plugin', [], "Manage plug-ins available on the server")]),
+    ('lib389.cli_conf.pwpolicy', 'create_parser', [
+        ('pwpolicy', [], "Manage the global password policy settings"),
+        ('localpwp', [], "Manage the local user and subtree password policies")]),
+    ('lib389.cli_conf.replication', 'create_parser', [
+        ('replication', ['repl'], "Manage replication for a suffix"),
+        ('repl-agmt', [], "Manage replication agreements"),
+        ('repl-winsync-agmt', [], "Manage Winsync agreements"),
+        ('repl-tasks', [], "Manage replication tasks")]),
+    ('lib389.cli_conf.saslmappings', 'create_parser', [
+        ('sasl', [], "Manage SASL mappings")]),
+    ('lib389.cli_conf.security', 'create_parser', [
+        ('security', [], "Manage security settings")]),
+    ('lib389.cli_conf.schema', 'create_parser', [
+        ('schema', [], "Manage the directory schema")]),
+    ('lib389.cli_conf.conflicts', 'create_parser', [
+        ('repl-conflict', [], "Manage replication conflicts")]),
+    ('lib389.cli_conf.batch', 'create_parser', [
+        ('batch', [], "Run a list of subcommands over a single connection")]),
+    ('lib389.cli_conf.rpc', 'create_parser', [
+        ('rpc', [], "Serve subcommands as JSON-RPC requests over the standard input and output")]),
+]
+
 
 def _args_to_attrs(args, arg_to_attr):
     attrs = {}
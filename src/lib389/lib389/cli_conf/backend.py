@@ -16,12 +16,13 @@ from lib389.configurations.sample import (
     create_base_c,
     )
 from lib389.chaining import (ChainingLinks)
+from lib389.mappingTree import MappingTrees
 from lib389.monitor import MonitorLDBM
 from lib389.replica import Replicas
 from lib389.utils import ensure_str, is_a_dn, is_dn_parent
 from lib389.tasks import DBCompactTask
 from lib389._constants import INSTALL_LATEST_CONFIG
-from lib389.properties import BACKEND_SAMPLE_ENTRIES
+from lib389.properties import BACKEND_SAMPLE_ENTRIES, REPL_ROOT
 from lib389.cli_base import (
     _format_status,
     _generic_get,
@@ -31,7 +32,7 @@ from lib389.cli_base import (
     )
 import json
 import ldap
-from ldap.dn import str2dn
+from ldap.dn import str2dn, dn2str
 
 arg_to_attr = {
         'lookthroughlimit': 'nsslapd-lookthroughlimit',
@@ -92,7 +93,7 @@ def _args_to_attrs(args):
 
 
 def _search_backend_dn(inst, be_name):
-    be_insts = MANY(inst).list()
+    be_insts = MANY(inst).list(prefetch=['cn', 'nsslapd-suffix'])
     be_name = be_name.lower()
     for be in be_insts:
         cn = be.get_attr_val_utf8_l('cn')
@@ -102,35 +103,38 @@ def _search_backend_dn(inst, be_name):
 
 
 def _get_backend(inst, be_name):
-    be_insts = Backends(inst).list()
+    be_insts = Backends(inst).list(prefetch=['cn', 'nsslapd-suffix'])
     be_name = be_name.lower()
     for be in be_insts:
         be_suffix = be.get_attr_val_utf8_l('nsslapd-suffix')
         cn = be.get_attr_val_utf8_l('cn')
         if (is_a_dn(be_name) and str2dn(be_suffix) == str2dn(be_name)) or (not is_a_dn(be_name) and cn == be_name):
+            # The caller reads and changes the backend, don't serve it stale values
+            be.unpin()
             return be
 
     raise ValueError('Could not find backend suffix: {}'.format(be_name))
 
 
 def _get_index(inst, be_name, attr):
-    be_insts = Backends(inst).list()
+    be_insts = Backends(inst).list(prefetch=['cn', 'nsslapd-suffix'])
     be_name = be_name.lower()
     attr = attr.lower()
     for be in be_insts:
         be_suffix = be.get_attr_val_utf8_l('nsslapd-suffix')
         cn = be.get_attr_val_utf8_l('cn')
         if (is_a_dn(be_name) and str2dn(be_suffix) == str2dn(be_name)) or (not is_a_dn(be_name) and cn == be_name):
-            for index in be.get_indexes().list():
+            for index in be.get_indexes().list(prefetch=['cn']):
                 idx_name = index.get_attr_val_utf8_l('cn')
                 if idx_name == attr:
+                    index.unpin()
                     return index
     raise ValueError('Could not find index: {}'.format(attr))
 
 
 def backend_list(inst, basedn, log, args):
     be_list = []
-    be_insts = MANY(inst).list()
+    be_insts = MANY(inst).list(prefetch=['cn', 'nsslapd-suffix'])
     for be in be_insts:
         suffix = be.get_attr_val_utf8_l('nsslapd-suffix')
         be_name = be.get_attr_val_utf8_l('cn')
@@ -391,39 +395,77 @@ def build_node(suffix, be_name, subsuf=False, link=False, replicated=False):
     }
 
 
-def backend_build_tree(inst, be_insts, nodes):
-    """Recursively build the tree
+def _suffix_key(suffix):
+    """Normalize a suffix to look it up in the suffix tree snapshot
+    """
+    try:
+        return dn2str(str2dn(suffix.lower()))
+    except ldap.DECODING_ERROR:
+        return suffix.lower()
+
+
+def suffix_tree_snapshot(inst):
+    """Read the mapping trees, the backends, the database links and the
+    replicas with one search each, and index them to build the suffix tree
+    without any other request.
+
+    :param inst: An instance
+    :type inst: lib389.DirSrv
+    :returns: A dict with the "backends" (suffix -> backend name), the
+              "mapping_trees" (suffix -> (suffix, backend, parent suffix)),
+              the "children" (parent suffix -> list of mapping trees), the
+              "links" (set of database link names) and the "replicated"
+              (set of replicated suffixes)
+    """
+    backends = {}
+    for be in Backends(inst).list(prefetch=['cn', 'nsslapd-suffix']):
+        suffix = be.get_attr_val_utf8_l('nsslapd-suffix')
+        backends[_suffix_key(suffix)] = (suffix, be.get_attr_val_utf8('cn'))
+
+    mapping_trees = {}
+    children = {}
+    for mt in MappingTrees(inst).list(prefetch=['cn', 'nsslapd-backend', 'nsslapd-parent-suffix']):
+        mt_suffix = mt.get_attr_val_utf8_l('cn')
+        parent = mt.get_attr_val_utf8_l('nsslapd-parent-suffix')
+        node = (mt_suffix, mt.get_attr_val_utf8_l('nsslapd-backend'), parent)
+        # The mapping tree can be found with any of its names
+        for cn in mt.get_attr_vals_utf8_l('cn'):
+            mapping_trees.setdefault(_suffix_key(cn), node)
+        if parent is not None:
+            children.setdefault(_suffix_key(parent), []).append(node)
+
+    links = set(link.get_attr_val_utf8_l('cn') for link in ChainingLinks(inst).list(prefetch=['cn']))
+    replicated = set()
+    for replica in Replicas(inst).list(prefetch=[REPL_ROOT]):
+        repl_root = replica.get_attr_val_utf8_l(REPL_ROOT)
+        if repl_root is not None:
+            replicated.add(_suffix_key(repl_root))
+
+    return {"backends": backends,
+            "mapping_trees": mapping_trees,
+            "children": children,
+            "links": links,
+            "replicated": replicated}
+
+
+def backend_build_tree(tree, nodes):
+    """Recursively build the tree from a suffix_tree_snapshot()
     """
-    if len(nodes) == 0:
-        # Done
-        return
-
     for node in nodes:
-        node_suffix = node['id']
-        # Get sub suffixes and chaining of node
-        for be in be_insts:
-            be_suffix = be.get_attr_val_utf8_l('nsslapd-suffix')
-            if be_suffix == node_suffix.lower():
-                # We have our parent, now find the children
-                mts = be._mts.list()
-
-                for mt in mts:
-                    sub_parent = mt.get_attr_val_utf8_l('nsslapd-parent-suffix')
-                    sub_be = mt.get_attr_val_utf8_l('nsslapd-backend')
-                    sub_suffix = mt.get_attr_val_utf8_l('cn')
-                    if sub_parent == be_suffix:
-                        # We have a subsuffix (maybe a db link?)
-                        link = is_db_link(inst, sub_be)
-                        replicated = is_db_replicated(inst, sub_suffix)
-                        node['children'].append(build_node(sub_suffix,
-                                                        sub_be,
-                                                        subsuf=True,
-                                                        link=link,
-                                                        replicated=replicated))
-
-                # Recurse over the new subsuffixes
-                backend_build_tree(inst, be_insts, node['children'])
-                break
+        node_key = _suffix_key(node['id'])
+        # Only the suffixes of a local database have sub suffixes
+        if node_key not in tree['backends']:
+            continue
+        for (sub_suffix, sub_be, _) in tree['children'].get(node_key, []):
+            # We have a subsuffix (maybe a db link?)
+            node['children'].append(build_node(sub_suffix,
+                                               sub_be,
+                                               subsuf=True,
+                                               link=sub_be in tree['links'],
+                                               replicated=_suffix_key(sub_suffix) in tree['replicated']))
+
+        # Recurse over the new subsuffixes
+        backend_build_tree(tree, node['children'])
 
 
 def print_suffix_tree(nodes, level, log):
@@ -443,16 +485,12 @@ def backend_get_tree(inst, basedn, log, args):
     nodes = []
 
     # Get the top suffixes
-    be_insts = MANY(inst).list()
-    for be in be_insts:
-        suffix = be.get_attr_val_utf8_l('nsslapd-suffix')
-        be_name = be.get_attr_val_utf8('cn')
-        mt = be._mts.get(suffix)
-        sub = mt.get_attr_val_utf8_l('nsslapd-parent-suffix')
-        if sub is not None:
+    tree = suffix_tree_snapshot(inst)
+    for (key, (suffix, be_name)) in tree['backends'].items():
+        mt = tree['mapping_trees'].get(key)
+        if mt is not None and mt[2] is not None:
             continue
-        replicated = is_db_replicated(inst, suffix)
-        nodes.append(build_node(suffix, be_name, replicated=replicated))
+        nodes.append(build_node(suffix, be_name, replicated=key in tree['replicated']))
 
     # No suffixes, return empty list
     if len(nodes) == 0:
@@ -462,8 +500,7 @@ def backend_get_tree(inst, basedn, log, args):
             log.info("There are no suffixes defined")
     else:
         # Build the tree
-        be_insts = Backends(inst).list()
-        backend_build_tree(inst, be_insts, nodes)
+        backend_build_tree(tree, nodes)
 
         # Done
         if args.json:
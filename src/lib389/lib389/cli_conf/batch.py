@@ -0,0 +1,111 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2024 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+
+import argparse
+import importlib
+import json
+import shlex
+import sys
+from lib389.cli_base import format_error_to_dict
+from lib389.cli_conf import COMMANDS
+
+# The batch arguments which are not passed to the subcommands
+BATCH_ARGS = ('func', 'file', 'stop_on_error')
+# The subcommands running other subcommands, they can't be nested
+SESSION_MODULES = ('lib389.cli_conf.batch', 'lib389.cli_conf.rpc')
+
+
+def _batch_parser():
+    """Build the parser of a batch line, it has every dsconf subcommand
+    except batch and rpc.
+    """
+    parser = argparse.ArgumentParser(prog='dsconf instance', allow_abbrev=True)
+    subparsers = parser.add_subparsers(help="resources to act upon")
+    for (module, create, _) in COMMANDS:
+        if module not in SESSION_MODULES:
+            getattr(importlib.import_module(module), create)(subparsers)
+    return parser
+
+
+def _batch_lines(args):
+    if args.file is None or args.file == '-':
+        yield from sys.stdin
+    else:
+        with open(args.file, 'r') as f:
+            yield from f
+
+
+def _batch_result(log, args, lineno, line, error=None):
+    if args.json:
+        result = {'type': 'batch', 'line': lineno, 'command': line,
+                  'result': 'success' if error is None else 'error'}
+        if error is not None:
+            result['error'] = error
+        print(json.dumps(result), flush=True)
+    elif error is not None:
+        log.error(f"Line {lineno}: {line}: Error: " + " - ".join(str(val) for val in error.values()))
+
+
+def batch_run(inst, basedn, log, args):
+    """Run the dsconf subcommands of a file (or of the standard input), one
+    per line, using the connection of the batch. Empty lines and lines
+    starting with '#' are ignored.
+    """
+    parser = _batch_parser()
+    common = {key: val for (key, val) in vars(args).items() if key not in BATCH_ARGS}
+    stop_on_error = getattr(args, 'stop_on_error', False)
+    succeeded = 0
+    failed = 0
+    for (lineno, line) in enumerate(_batch_lines(args), start=1):
+        line = line.strip()
+        if line == '' or line.startswith('#'):
+            continue
+        try:
+            # argparse exits on errors, after printing the usage
+            line_args = parser.parse_args(shlex.split(line), namespace=argparse.Namespace(**common))
+        except (SystemExit, ValueError):
+            # ValueError: shlex could not split the line
+            line_args = None
+        if line_args is None or not hasattr(line_args, 'func'):
+            error = {'desc': 'Invalid command'}
+        else:
+            log.debug(f"Line {lineno}: {line}")
+            try:
+                error = None
+                if line_args.func(inst, basedn, log, line_args) is False:
+                    error = {'desc': 'Command failed'}
+            except Exception as e:
+                log.debug(e, exc_info=True)
+                error = format_error_to_dict(e)
+        _batch_result(log, args, lineno, line, error)
+        if error is None:
+            succeeded += 1
+        else:
+            failed += 1
+            if stop_on_error:
+                break
+
+    if args.json:
+        print(json.dumps({'type': 'batch', 'succeeded': succeeded, 'failed': failed}))
+    else:
+        log.info(f"Batch complete: {succeeded} command(s) succeeded, {failed} failed")
+    if failed:
+        return False
+
+
+def create_parser(subparsers):
+    batch_parser = subparsers.add_parser('batch', help="Run a list of subcommands over a single connection",
+        description="Read dsconf subcommands, one per line and without the instance options "
+                    "(for example: config replace nsslapd-sizelimit=1000), and run them over "
+                    "a single connection.  Empty lines and lines starting with '#' are ignored.  "
+                    "With --json, a JSON object is written for the result of each line.")
+    batch_parser.set_defaults(func=batch_run)
+    batch_parser.add_argument('-f', '--file', default=None,
+        help="The file with the subcommands (default is the standard input)")
+    batch_parser.add_argument('--stop-on-error', action='store_true', default=False,
+        help="Stop at the first subcommand that fails")
@@ -17,7 +17,8 @@ from lib389._constants import ReplicaRole, DSRC_HOME
 from lib389.cli_base.dsrc import dsrc_to_repl_monitor
 from lib389.cli_base import _get_arg
 from lib389.utils import is_a_dn, copy_with_permissions, ds_supports_new_changelog, get_passwd_from_file
-from lib389.replica import Replicas, ReplicationMonitor, BootstrapReplicationManager, Changelog5, ChangelogLDIF, Changelog
+from lib389.replica import (Replicas, ReplicationMonitor, ReplicationLagMonitor, BootstrapReplicationManager,
+                            Changelog5, ChangelogLDIF, Changelog, REPL_MONITOR_WORKERS, REPL_LAG_HISTORY)
 from lib389.tasks import CleanAllRUVTask, AbortCleanAllRUVTask
 from lib389._mapped_object import DSLdapObjects
 
@@ -452,8 +453,14 @@ def get_repl_monitor_info(inst, basedn, log, args):
         credentials_cache[key] = credentials
         return credentials
 
+    if getattr(args, 'watch', None):
+        watch_repl_lag(inst, log, args, get_credentials)
+        return
+
     repl_monitor = ReplicationMonitor(inst)
-    report_dict = repl_monitor.generate_report(get_credentials, args.json)
+    report_dict = repl_monitor.generate_report(get_credentials, args.json,
+                                               workers=getattr(args, 'workers', REPL_MONITOR_WORKERS),
+                                               timeout=getattr(args, 'timeout', None))
     report_items = []
 
     for instance, report_data in report_dict.items():
@@ -512,6 +519,38 @@ def get_repl_monitor_info(inst, basedn, log, args):
         log.info(json.dumps({"type": "list", "items": report_items}, indent=4))
 
 
+def watch_repl_lag(inst, log, args, get_credentials):
+    """Sample the lag of the agreements every args.watch seconds, and write
+    the samples as JSON lines, or the last samples in the Prometheus format
+    """
+    lag_monitor = ReplicationLagMonitor(inst, get_credentials, history=args.history, timeout=args.timeout)
+    try:
+        for samples in lag_monitor.watch(args.watch, count=args.count):
+            if args.format == "prometheus":
+                text = lag_monitor.to_prometheus()
+                if args.output:
+                    # Replace the file at once, it may be read at any time
+                    tmp_path = f"{args.output}.tmp"
+                    with open(tmp_path, "w") as f:
+                        f.write(text)
+                    os.replace(tmp_path, args.output)
+                else:
+                    log.info(text)
+            else:
+                lines = ReplicationLagMonitor.to_json_lines(samples)
+                if not lines:
+                    continue
+                if args.output:
+                    with open(args.output, "a") as f:
+                        f.write(lines + "\n")
+                else:
+                    log.info(lines)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lag_monitor.close()
+
+
 # This subcommand is available when 'not ds_supports_new_changelog'
 def create_cl(inst, basedn, log, args):
     cl = Changelog5(inst)
@@ -1209,25 +1248,62 @@ def dump_def_cl(inst, basedn, log, args):
     except:
         raise ValueError("Failed to export replication changelog")
 
+def _print_cl_analysis(log, args, result):
+    if args.json:
+        log.info(json.dumps({"type": "changelog_analysis", "analysis": result}, indent=4))
+        return
+    log.info(f"Changes: {result['changes']}")
+    if not result['changes']:
+        return
+    log.info(f"First change: {result['first_change']} ({result['first_csn']})")
+    log.info(f"Last change: {result['last_change']} ({result['last_csn']})")
+    log.info(f"Changes per second: {result['changes_per_second']} "
+             f"(peak: {result['peak_changes_per_second']} at {result['peak_second']})")
+    log.info("Operations:")
+    for (op, count) in result['operations'].items():
+        log.info(f"    {op}: {count}")
+    log.info("Replica IDs:")
+    for rid in result['rids']:
+        log.info(f"    {rid['rid']}: {rid['changes']} changes, {rid['changes_per_second']} per second "
+                 f"({rid['first_change']} - {rid['last_change']})")
+    log.info("Most modified entries:")
+    for entry in result['top_dns']:
+        log.info(f"    {entry['dn']}: {entry['changes']}")
+
+
 def dump_cl(inst, basedn, log, args):
+    analyze = getattr(args, 'analyze', False)
+    if not analyze and not args.output_file:
+        raise ValueError("The output file (-o) is required unless the changelog is analyzed (--analyze)")
+    cl_filter = {'min_csn': getattr(args, 'min_csn', None),
+                 'max_csn': getattr(args, 'max_csn', None),
+                 'rids': getattr(args, 'rid', None)}
     if not args.changelog_ldif:
         replicas = Replicas(inst)
-        replicas.process_and_dump_changelog(replica_root=args.replica_root,
-                                            output_file=args.output_file,
-                                            csn_only=args.csn_only,
-                                            preserve_ldif_done=args.preserve_ldif_done,
-                                            decode=args.decode)
+        result = replicas.process_and_dump_changelog(replica_root=args.replica_root,
+                                                     output_file=args.output_file,
+                                                     csn_only=args.csn_only,
+                                                     preserve_ldif_done=args.preserve_ldif_done,
+                                                     decode=args.decode,
+                                                     analyze=analyze,
+                                                     top=getattr(args, 'top', 10),
+                                                     **cl_filter)
     else:
         # Modify an existing LDIF file
         try:
             assert os.path.exists(args.changelog_ldif)
         except AssertionError:
             raise FileNotFoundError(f"File {args.changelog_ldif} was not found")
-        cl_ldif = ChangelogLDIF(args.changelog_ldif, output_file=args.output_file)
-        if args.csn_only:
+        cl_ldif = ChangelogLDIF(args.changelog_ldif, output_file=args.output_file, **cl_filter)
+        result = None
+        if analyze:
+            result = cl_ldif.analyze(top=getattr(args, 'top', 10))
+        elif args.csn_only:
             cl_ldif.grep_csn()
         else:
             cl_ldif.decode()
+    if analyze:
+        _print_cl_analysis(log, args, result)
 
 def restore_cl_def_ldif(inst, basedn, log, args):
     """
@@ -1401,9 +1477,21 @@ def create_parser(subparsers):
     repl_export_cl.add_argument('-i', '--changelog-ldif',
                                 help="Decodes changes in an LDIF file. Use this option if you already have a changelog LDIF file, "
                                      "but the changes in that file are encoded.")
-    repl_export_cl.add_argument('-o', '--output-file', required=True, help="Sets the path name for the final result")
+    repl_export_cl.add_argument('-o', '--output-file', help="Sets the path name for the final result")
     repl_export_cl.add_argument('-r', '--replica-root', required=True,
                                 help="Specifies the replica root whose changelog you want to export")
+    repl_export_cl.add_argument('--min-csn',
+                                help="Skips the changes older than this CSN (or CSN prefix), or than this UTC time "
+                                     "(for example \"2024-01-31 10:00:00\")")
+    repl_export_cl.add_argument('--max-csn',
+                                help="Skips the changes newer than this CSN (or CSN prefix), or than this UTC time")
+    repl_export_cl.add_argument('--rid', type=int, action='append',
+                                help="Only keeps the changes of this replica ID. This option can be set multiple times.")
+    repl_export_cl.add_argument('--analyze', action='store_true',
+                                help="Displays the number of changes per replica ID, the change rates, the operations, "
+                                     "and the most modified entries instead of writing the output file")
+    repl_export_cl.add_argument('--top', type=int, default=10,
+                                help="Sets the number of most modified entries displayed by --analyze (default: 10)")
 
     repl_def_export_cl = export_subcommands.add_parser('default', help='Export the replication changelog to the server\'s default LDIF directory')
     repl_def_export_cl.set_defaults(func=dump_def_cl)
@@ -1459,6 +1547,23 @@ def create_parser(subparsers):
     repl_monitor_parser.add_argument('-a', '--aliases', nargs="*",
                                      help="Enables displaying an alias instead of host:port, if an alias is "
                                           "assigned to a host:port combination. The format: alias=host:port")
+    repl_monitor_parser.add_argument('--workers', type=int, default=REPL_MONITOR_WORKERS,
+                                     help="Sets the number of servers contacted at the same time (default: %(default)s)")
+    repl_monitor_parser.add_argument('--timeout', type=int,
+                                     help="Sets the connection and operation timeout in seconds for each server")
+    repl_monitor_parser.add_argument('--watch', type=int, metavar='SECONDS',
+                                     help="Keeps sampling the lag of the agreements of this server every SECONDS "
+                                          "seconds, over persistent connections to the consumers")
+    repl_monitor_parser.add_argument('--count', type=int,
+                                     help="Sets the number of samples to take in watch mode (default: until interrupted)")
+    repl_monitor_parser.add_argument('--history', type=int, default=REPL_LAG_HISTORY,
+                                     help="Sets the number of samples kept for each agreement in watch mode (default: %(default)s)")
+    repl_monitor_parser.add_argument('--format', choices=['jsonl', 'prometheus'], default='jsonl',
+                                     help="Sets the watch mode output: a JSON line per agreement and sample, "
+                                          "or the last samples in the Prometheus text format (default: %(default)s)")
+    repl_monitor_parser.add_argument('--output', metavar='FILE',
+                                     help="Writes the watch mode output to FILE instead of the console. JSON lines are "
+                                          "appended, the Prometheus file is replaced after each sample")
 
     ############################################
     # Replication Agmts
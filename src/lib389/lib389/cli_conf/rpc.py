@@ -0,0 +1,433 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2024 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+
+import argparse
+import contextlib
+import contextvars
+import json
+import logging
+import re
+import sys
+import threading
+import time
+import ldap
+from concurrent import futures
+from lib389.cli_base import format_error_to_dict, StdOutFilter, StdErrFilter
+from lib389.cli_conf.batch import _batch_parser
+
+# The rpc arguments which are not passed to the subcommands
+RPC_ARGS = ('func', 'workers', 'cache_ttl')
+
+# JSON-RPC 2.0 error codes, COMMAND_FAILED is for the subcommands failures
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+COMMAND_FAILED = 1
+
+# The output of the subcommands reading the configuration can be cached until a
+# subcommand which may change it runs. The monitoring ones are never cached.
+CACHED_FUNC_RE = re.compile(r'(^|_)(get|list|show)(_|$)')
+LIVE_FUNC_RE = re.compile(r'monitor|status|ruv|conflict|glue')
+
+
+class ThreadOutput(object):
+    """A file object writing to the buffer of the current request, or to a
+    default file outside of a request. It replaces the standard output and
+    error, so what a subcommand prints ends in the response of its request
+    instead of the JSON-RPC stream.
+
+    The buffer is kept in a context variable, the threads started by a
+    subcommand write to the buffer of its request when they run in a copy
+    of its context (see contextvars.copy_context()).
+
+    :param default: The file used outside of a request
+    :type default: file object
+    """
+
+    def __init__(self, default):
+        self._default = default
+        self._buf = contextvars.ContextVar('rpc_output', default=None)
+
+    def set_buffer(self, buf):
+        """Set (or unset with None) the buffer of the current context"""
+        self._buf.set(buf)
+
+    def write(self, data):
+        buf = self._buf.get()
+        if buf is None:
+            return self._default.write(data)
+        buf.append(data)
+        return len(data)
+
+    def flush(self):
+        if self._buf.get() is None:
+            self._default.flush()
+
+
+class ReadWriteLock(object):
+    """A lock shared by the readers or held by a single writer. A waiting
+    writer blocks the new readers, so it is not starved by them.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class RpcServerDown(Exception):
+    """The connection used by a request was lost
+
+    :param connection: The counter of the connection
+    :type connection: int
+    """
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.connection = connection
+
+
+class RpcServer(object):
+    """Run the dsconf subcommands of JSON-RPC 2.0 requests, one request per
+    line, over a single connection. The requests run concurrently, and their
+    responses are written in the order they complete.
+
+    A request has the method "run" and the subcommand arguments as params,
+    for example:
+    {"jsonrpc": "2.0", "id": 1, "method": "run", "params": ["backend", "suffix", "list"]}
+    The result has the "stdout" and the "stderr" of the subcommand. A failed
+    subcommand gets an error with its dsconf JSON error as message. The
+    method "invalidate" drops the cached outputs.
+
+    :param inst: An instance
+    :type inst: lib389.DirSrv
+    :param log: The dsconf logger
+    :type log: logging.Logger
+    :param args: The arguments of the rpc subcommand
+    :type args: argparse.Namespace
+    :param output: The file to write the responses to
+    :type output: file object
+    """
+
+    def __init__(self, inst, log, args, output):
+        self._inst = inst
+        self._log = log
+        self._output = output
+        self._output_lock = threading.Lock()
+        self._parser = _batch_parser()
+        self._common = {key: val for (key, val) in vars(args).items() if key not in RPC_ARGS}
+        self._cache_ttl = args.cache_ttl
+        # The cached outputs, and a counter of the subcommands which may
+        # change the configuration, a read started before one of them is
+        # not cached.
+        self._cache = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        # The requests share the connection, a reconnection waits for the
+        # running ones and blocks the others until it is done. The counter
+        # tells the requests which failed on the same connection that it
+        # was already opened again.
+        self._conn_lock = ReadWriteLock()
+        self._connection = 0
+        self.stdout = ThreadOutput(sys.stderr)
+        self.stderr = ThreadOutput(sys.stderr)
+        self._request_log = self._request_logger(getattr(args, 'verbose', False))
+
+    def _request_logger(self, verbose):
+        """Build the logger of the subcommands, like setup_script_logger()
+        but writing to the buffers of the requests.
+        """
+        log = logging.Logger('dsconf')
+        if verbose:
+            log.setLevel(logging.DEBUG)
+            log_format = '%(levelname)s: %(message)s'
+        else:
+            log.setLevel(logging.INFO)
+            log_format = '%(message)s'
+        for (stream, log_filter) in ((self.stdout, StdOutFilter()), (self.stderr, StdErrFilter())):
+            log_handler = logging.StreamHandler(stream)
+            log_handler.setFormatter(logging.Formatter(log_format))
+            log_handler.addFilter(log_filter)
+            log.addHandler(log_handler)
+        return log
+
+    def _respond(self, req_id, result=None, error=None):
+        response = {'jsonrpc': '2.0', 'id': req_id}
+        if error is not None:
+            response['error'] = error
+        else:
+            response['result'] = result
+        with self._output_lock:
+            self._output.write(json.dumps(response) + '\n')
+            self._output.flush()
+
+    @staticmethod
+    def cacheable(func):
+        """Check if the output of a subcommand handler can be cached
+
+        :param func: The handler of the subcommand
+        :type func: function
+        :returns: bool
+        """
+        name = getattr(func, '__name__', '')
+        return CACHED_FUNC_RE.search(name) is not None and LIVE_FUNC_RE.search(name) is None
+
+    def invalidate(self):
+        """Drop the cached outputs"""
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def _parse(self, argv):
+        """Parse the arguments of a request, the argparse errors are returned
+        instead of exiting.
+        """
+        stderr = []
+        self.stderr.set_buffer(stderr)
+        try:
+            return (self._parser.parse_args(argv, namespace=argparse.Namespace(**self._common)), None)
+        except SystemExit:
+            return (None, ''.join(stderr).strip() or 'Invalid command')
+        finally:
+            self.stderr.set_buffer(None)
+
+    def _call(self, line_args):
+        """Run a subcommand handler, capturing what it prints and logs
+
+        :returns: A tuple of the output dict and of the dsconf error dict (or None)
+        """
+        stdout = []
+        stderr = []
+        self.stdout.set_buffer(stdout)
+        self.stderr.set_buffer(stderr)
+        error = None
+        try:
+            with self._conn_lock.read():
+                connection = self._connection
+                if line_args.func(self._inst, None, self._request_log, line_args) is False:
+                    error = {'desc': ''.join(stderr).strip() or 'Command failed'}
+        except ldap.SERVER_DOWN as e:
+            raise RpcServerDown(connection) from e
+        except Exception as e:
+            self._request_log.debug(e, exc_info=True)
+            error = format_error_to_dict(e)
+        finally:
+            self.stdout.set_buffer(None)
+            self.stderr.set_buffer(None)
+        return ({'stdout': ''.join(stdout), 'stderr': ''.join(stderr)}, error)
+
+    def _reconnect(self, connection):
+        """Open the connection again, after a restart of the server. It runs
+        alone, once the requests using the connection are done.
+
+        :param connection: The counter of the connection which failed
+        :type connection: int
+        """
+        with self._conn_lock.write():
+            self.invalidate()
+            if connection != self._connection:
+                # Another request already opened it again
+                return
+            self._log.debug("Reconnecting to the server")
+            self._connection += 1
+            self._inst.open(connOnly=True)
+
+    def _run(self, req_id, argv, line_args, notification=False):
+        cacheable = self.cacheable(line_args.func)
+        key = tuple(argv)
+        with self._lock:
+            generation = self._generation
+            if cacheable and key in self._cache:
+                (cached_at, output) = self._cache[key]
+                if time.monotonic() - cached_at < self._cache_ttl:
+                    if not notification:
+                        self._respond(req_id, result=output)
+                    return
+                del self._cache[key]
+            if not cacheable:
+                self._generation += 1
+                self._cache.clear()
+
+        try:
+            (output, error) = self._call(line_args)
+        except RpcServerDown as e:
+            # The server was restarted, a read is run again on a new
+            # connection, a write may have been applied so it is not.
+            try:
+                self._reconnect(e.connection)
+                if cacheable:
+                    with self._lock:
+                        generation = self._generation
+                    (output, error) = self._call(line_args)
+                else:
+                    (output, error) = ({'stdout': '', 'stderr': ''}, format_error_to_dict(e.__cause__))
+            except RpcServerDown as e:
+                (output, error) = ({'stdout': '', 'stderr': ''}, format_error_to_dict(e.__cause__))
+            except Exception as e:
+                (output, error) = ({'stdout': '', 'stderr': ''}, format_error_to_dict(e))
+
+        with self._lock:
+            if not cacheable:
+                self._generation += 1
+                self._cache.clear()
+            elif error is None and self._cache_ttl > 0 and generation == self._generation:
+                self._cache[key] = (time.monotonic(), output)
+
+        if notification:
+            return
+        if error is not None:
+            self._respond(req_id, error={'code': COMMAND_FAILED, 'message': json.dumps(error), 'data': output})
+        else:
+            self._respond(req_id, result=output)
+
+    def handle(self, line, pool):
+        """Handle a request line, the subcommands are submitted to the pool
+
+        :param line: The JSON-RPC request
+        :type line: str
+        :param pool: The executor running the subcommands
+        :type pool: concurrent.futures.Executor
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self._respond(None, error={'code': PARSE_ERROR, 'message': 'Parse error'})
+            return
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            self._respond(request.get('id') if isinstance(request, dict) else None,
+                          error={'code': INVALID_REQUEST, 'message': 'Invalid request'})
+            return
+
+        req_id = request.get('id')
+        # No response is sent to a notification (a request without an id)
+        notification = 'id' not in request
+        method = request['method']
+        params = request.get('params', [])
+        if method == 'invalidate':
+            self.invalidate()
+            if not notification:
+                self._respond(req_id, result=True)
+        elif method == 'run':
+            if isinstance(params, dict):
+                params = params.get('args')
+            if not isinstance(params, list) or not all(isinstance(arg, str) for arg in params):
+                if not notification:
+                    self._respond(req_id, error={'code': INVALID_PARAMS,
+                                                 'message': 'The params must be a list of arguments'})
+                return
+            (line_args, usage) = self._parse(params)
+            if line_args is None or not hasattr(line_args, 'func'):
+                if not notification:
+                    self._respond(req_id, error={'code': INVALID_PARAMS,
+                                                 'message': json.dumps({'desc': usage or 'Invalid command'})})
+                return
+            self._log.debug(f"Request {req_id}: {params}")
+            pool.submit(self._run, req_id, params, line_args, notification)
+        elif not notification:
+            self._respond(req_id, error={'code': METHOD_NOT_FOUND, 'message': f'Method not found: {method}'})
+
+    @contextlib.contextmanager
+    def redirect(self):
+        """Redirect the standard output and error, and the logging handlers
+        writing to them, to the buffers of the requests. The responses are
+        written to the output given to the server, so it must not be the
+        standard output itself once redirected (rpc_serve() passes it
+        before the redirection).
+        """
+        (real_stdout, real_stderr) = (sys.stdout, sys.stderr)
+        handlers = []
+        for logger in (logging.getLogger(), self._log):
+            for handler in logger.handlers:
+                if isinstance(handler, logging.StreamHandler) and handler.stream in (real_stdout, real_stderr):
+                    handlers.append((handler, handler.stream))
+                    handler.setStream(self.stdout if handler.stream is real_stdout else self.stderr)
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+        try:
+            yield
+        finally:
+            sys.stdout = real_stdout
+            sys.stderr = real_stderr
+            for (handler, stream) in handlers:
+                handler.setStream(stream)
+
+    def serve(self, lines, workers):
+        """Handle the request lines until the end of the input, and wait for
+        the requests still running. What the subcommands print or log goes
+        to the response of their request.
+
+        :param lines: The request lines
+        :type lines: iterable
+        :param workers: The number of requests run concurrently
+        :type workers: int
+        """
+        with self.redirect():
+            with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                for line in lines:
+                    line = line.strip()
+                    if line != '':
+                        self.handle(line, pool)
+
+
+def rpc_serve(inst, basedn, log, args):
+    """Serve the dsconf subcommands as JSON-RPC requests read from the
+    standard input, over the connection of the rpc subcommand.
+    """
+    server = RpcServer(inst, log, args, sys.stdout)
+    server.serve(sys.stdin, args.workers)
+
+
+def create_parser(subparsers):
+    rpc_parser = subparsers.add_parser('rpc', help="Serve subcommands as JSON-RPC requests over the standard input and output",
+        description="Read JSON-RPC 2.0 requests, one per line, and run them over a single connection.  "
+                    "The method \"run\" takes the subcommand arguments as params, without the instance "
+                    "options (for example: [\"backend\", \"suffix\", \"list\"]), and its result has the "
+                    "\"stdout\" and \"stderr\" of the subcommand.  The outputs of the subcommands reading "
+                    "the configuration can be cached (see --cache-ttl) until a subcommand which may change "
+                    "it runs, or until the method \"invalidate\" is called.")
+    rpc_parser.set_defaults(func=rpc_serve)
+    rpc_parser.add_argument('--workers', type=int, default=4,
+        help="The number of requests run concurrently (default: 4)")
+    rpc_parser.add_argument('--cache-ttl', type=float, default=0,
+        help="The number of seconds the output of a subcommand reading the configuration "
+             "is cached, 0 disables the cache (default: 0).  Only the changes made through "
+             "this worker drop the cache, so only enable it when nothing else changes the "
+             "configuration")
@@ -14,8 +14,10 @@ from lib389.dbgen import (
     dbgen_role,
     dbgen_mod_load,
     dbgen_nested_ldif,
+    DBGEN_CHUNK_SIZE,
 )
 from lib389.utils import is_a_dn
+import random
 
 DEFAULT_LDIF = "/ldifgen.ldif"
 
@@ -189,9 +191,17 @@ def dbgen_create_users(inst, log, args):
         args.ldif_file = adjust_ldif_name(inst, args.ldif_file)
         validate_ldif_file(args.ldif_file)
 
+    # Always use a seed so the LDIF can be generated again
+    if getattr(args, 'seed', None) is None:
+        args.seed = random.randrange(2**32)
+
     display_args(log, args)
-    dbgen_users(inst, args.number, args.ldif_file, args.suffix, generic=args.generic, parent=args.parent, startIdx=args.start_idx, rdnCN=False, pseudol10n=args.localize)
-    log.info(f"Successfully created LDIF file: {args.ldif_file}")
+    ldif_files = dbgen_users(inst, args.number, args.ldif_file, args.suffix, generic=args.generic, parent=args.parent,
+                             startIdx=args.start_idx, rdnCN=False, pseudol10n=args.localize, seed=args.seed,
+                             workers=getattr(args, 'workers', 1), chunk_size=getattr(args, 'chunk_size', DBGEN_CHUNK_SIZE),
+                             split=getattr(args, 'split', False))
+    for ldif_file in ldif_files:
+        log.info(f"Successfully created LDIF file: {ldif_file}")
 
 
 def dbgen_create_groups(inst, log, args):
@@ -512,7 +522,11 @@ def create_parser(subparsers):
     dbgen_users_parser.add_argument('--start-idx', default=0, help="For generic LDIF's you can choose the starting index for the user entries.  The default is \"0\".")
     dbgen_users_parser.add_argument('--rdn-cn', action='store_true', help="Use the attribute \"cn\" as the RDN attribute in the DN instead of \"uid\"")
     dbgen_users_parser.add_argument('--localize', action='store_true', help="Localize the LDIF data")
-    dbgen_users_parser.add_argument('--ldif-file', default="ldifgen.ldif", help=f"The LDIF file name.  Default location is the server's LDIF directory using the name 'ldifgen.ldif'")
+    dbgen_users_parser.add_argument('--seed', help="The seed of the random data.  The same seed and chunk size always generate the same LDIF.  By default a random seed is used and displayed.")
+    dbgen_users_parser.add_argument('--workers', type=int, default=1, help="The number of processes generating the entries.  The default is \"1\".")
+    dbgen_users_parser.add_argument('--chunk-size', type=int, default=DBGEN_CHUNK_SIZE, help=f"The number of entries generated at a time by a process.  The default is \"{DBGEN_CHUNK_SIZE}\".")
+    dbgen_users_parser.add_argument('--split', action='store_true', help="Write each chunk of entries to its own LDIF file (\"NAME-0000.ldif\", \"NAME-0001.ldif\", ...) instead of a single LDIF file")
+    dbgen_users_parser.add_argument('--ldif-file', default="ldifgen.ldif", help=f"The LDIF file name.  Default location is the server's LDIF directory using the name 'ldifgen.ldif'.  A name ending with \".gz\" is written gzip compressed.")
 
     # Create static groups
     dbgen_groups_parser = subcommands.add_parser('groups', help='Generate a LDIF containing groups and members')
@@ -13,6 +13,7 @@
 import os
 import re
 import glob
+import json
 import shutil
 from lib389.dseldif import DSEldif
 from lib389._constants import DEFAULT_LMDB_SIZE
@@ -22,6 +23,7 @@ from errno import ENOSPC
 
 
 DBLIB_LDIF_PREFIX = "__dblib-"
+DBLIB_STATE = f"{DBLIB_LDIF_PREFIX}state.json"
 DBSIZE_MARGIN = 1.2
 DBI_MARGIN = 60
 
@@ -118,8 +120,9 @@ def get_backends(log, dse, tmpdir):
                 'dbi': dbi
             })
     # now that we finish reading the dse.ldif we may update it if needed.
-    for dn, dir in update_dse:
-        dse.replace(dn, 'nsslapd-directory', dir)
+    with dse.transaction():
+        for dn, dir in update_dse:
+            dse.replace(dn, 'nsslapd-directory', dir)
     log.debug(f'lib389.cli_ctl.dblib.get_backends returns: {str(res)}')
     return res
 
@@ -188,6 +191,88 @@ def set_owner(list, uid, gid):
             pass
 
 
+def load_state(tmpdir, migration):
+    # Returns the progress of an interrupted migration (or None)
+    try:
+        with open(f'{tmpdir}/{DBLIB_STATE}') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('migration') != migration:
+        return None
+    return state
+
+
+def save_state(tmpdir, state):
+    # Store the migration progress so that an interrupted migration could be resumed
+    path = f'{tmpdir}/{DBLIB_STATE}'
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def set_dblib(dse, dn, dblib):
+    if dse.get(dn, 'nsslapd-backend-implement', True) != dblib:
+        dse.replace(dn, 'nsslapd-backend-implement', dblib)
+
+
+def migrate_backends(inst, log, dse, backends, state, tmpdir, srclib, dstlib):
+    """
+    Migrate the backends listed in the state one after the other:
+    the backend is exported with the source database library then imported
+    with the target one, and its ldif file is removed before handling the
+    next backend. So only one backend ldif file is stored at a time.
+    The changelog is dumped by dbscan once ns-slapd has exported the
+    entries: dbscan does not take the server lock, and must not open the
+    database environment while db2ldif uses it.
+    """
+    cfgdn = backends['config']['dn']
+    uid = inst.get_user_uid()
+    gid = inst.get_group_gid()
+    encrypt = False       # Should maybe be a args param
+    names = list(state['backends'])
+    total = sum([state['backends'][bename]['weight'] for bename in names]) or 1
+    progress = 0
+    for idx, bename in enumerate(names, 1):
+        be = backends[bename]
+        bestate = state['backends'][bename]
+        step = f"{progress*100/total:2f}% ({bename} {idx}/{len(names)})"
+        if bestate['status'] == 'done':
+            log.info(f"Backends migration {step} already migrated")
+            progress += bestate['weight']
+            continue
+        if bestate['status'] != 'exported' or not os.path.isfile(be['ldifname']):
+            log.info(f"Backends migration {step} exporting")
+            set_dblib(dse, cfgdn, srclib)
+            log.debug(f"inst.db2ldif({bename}, None, None, {encrypt}, True, {be['ldifname']})")
+            if not inst.db2ldif(bename, None, None, encrypt, True, be['ldifname'], False):
+                raise ValueError(f"Failed to export backend {bename} in {be['ldifname']}")
+            bestate['cl5'] = export_changelog(be, srclib)
+            bestate['status'] = 'exported'
+            save_state(tmpdir, state)
+
+        log.info(f"Backends migration {step} importing")
+        set_dblib(dse, cfgdn, dstlib)
+        # bdb backend directories are named after the backend name as written in the dse.ldif
+        importname = be['bename'] if dstlib == 'mdb' else be['ecbename']
+        os.chown(be['ldifname'], uid, gid)
+        log.debug(f"inst.ldif2db({importname}, None, None, {encrypt}, {be['ldifname']})")
+        if inst.ldif2db(importname, None, None, encrypt, be['ldifname']) is False:
+            raise ValueError(f"Failed to import backend {bename} from {be['ldifname']}")
+        if bestate['cl5'] is True:
+            import_changelog(be, dstlib)
+        if dstlib == 'bdb':
+            set_owner(glob.glob(f'{be["ecdbdir"]}/*'), uid, gid)
+        bestate['status'] = 'done'
+        save_state(tmpdir, state)
+        rm(be['ldifname'])
+        rm(be['cl5name'])
+        progress += bestate['weight']
+    # Also switch the dse.ldif when resuming a migration whose backends are all migrated
+    set_dblib(dse, cfgdn, dstlib)
+    log.info("Backends migration 100%")
+
+
 def dblib_bdb2mdb(inst, log, args):
     global _log
     _log = log
@@ -209,131 +294,114 @@ def dblib_bdb2mdb(inst, log, args):
     backends = get_backends(log, dse, tmpdir)
     dbmapdir = backends['config']['dbdir']
     dblib = backends['config']['dblib']
+    uid = inst.get_user_uid()
+    gid = inst.get_group_gid()
+    state = load_state(tmpdir, 'bdb2mdb') if getattr(args, 'resume', False) else None
 
-    if dblib == "mdb":
+    if state is not None:
+        log.info(f"Resuming the migration from Berkeley database to lmdb ({tmpdir}/{DBLIB_STATE})")
+    elif dblib == "mdb":
         log.error(f"Instance {inst.serverid} is already configured with lmdb.")
         return
+    else:
+        # Remove ldif files and mdb files
+        dblib_cleanup(inst, log, args)
+        rm(f'{tmpdir}/{DBLIB_STATE}')
+
+        # Compute the needed space and the lmdb map configuration
+        total_dbsize = 0
+        ldifsize = 0
+        total_dbi = 3
+        for bename, be in backends.items():
+            # Keep only backend associated with a db
+            if be['dbsize'] == 0:
+                continue
+            total_dbsize += be['dbsize']
+            # Backend ldif files are removed once imported so only the largest one is stored
+            ldifsize = max(ldifsize, be['entrysize'])
+            total_dbi += be['dbi']
+
+        required_dbsize = round(total_dbsize * DBSIZE_MARGIN)
+
+        # Compute a dbmap size greater than required_dbsize
+        dbmap_size = parse_size(DEFAULT_LMDB_SIZE)
+        while (required_dbsize > dbmap_size):
+            dbmap_size = round(dbmap_size * 1.25)
+
+        # Round up number of dbis
+        nbdbis = 1
+        while nbdbis < total_dbi + DBI_MARGIN:
+            nbdbis *= 2
+
+        log.info(f"Required space for LDIF files is about {format_size(ldifsize)}")
+        log.info(f"Required space for DBMAP files is about {format_size(required_dbsize)}")
+        log.info(f"Required number of dbi is {nbdbis}")
+
+        # Generate the info file (so dbscan could generate the map)
+        with open(f'{dbmapdir}/{MDB_INFO}', 'w') as f:
+            f.write('LIBVERSION=9025\n')
+            f.write('DATAVERSION=0\n')
+            f.write(f'MAXSIZE={dbmap_size}\n')
+            f.write('MAXREADERS=50\n')
+            f.write(f'MAXDBS={nbdbis}\n')
+        os.chown(f'{dbmapdir}/{MDB_INFO}', uid, gid)
+
+        total, used, free = shutil.disk_usage(dbmapdir)
+        if os.stat(dbmapdir).st_dev != os.stat(tmpdir).st_dev:
+            # Ldif and db are on different filesystems
+            # Let check that we have enough space in tmpdir for ldif files
+            total, used, free = shutil.disk_usage(tmpdir)
+            if free < ldifsize:
+                raise OSError(ENOSPC, f"Not enough space on {tmpdir} to migrate to lmdb " +
+                                      f"(In {tmpdir}, {format_size(ldifsize)} is " +
+                                      f"needed but only {format_size(free)} is available)")
+            ldifsize = 0    # do not count ldifsize when checking dbmapdir size
+
+        # Let check that we have enough space in dbmapdir for the db and ldif files
+        total, used, free = shutil.disk_usage(dbmapdir)
+        if free < required_dbsize + ldifsize:
+            raise OSError(ENOSPC, f"Not enough space on {tmpdir} to migrate to lmdb " +
+                                  f"(In {dbmapdir}, " +
+                                  f"{format_size(required_dbsize + ldifsize)} is "
+                                  f"needed but only {format_size(free)} is available)")
+        # Lets use dbmap_size if possible, otherwise use required_dbsize
+        if free < dbmap_size + ldifsize:
+            dbmap_size = required_dbsize
+
+        log.info("Updating dse.ldif file")
+        # Add the lmdb config entry (nsslapd-backend-implement is switched
+        # to mdb before importing the first backend)
+        dn = f"cn=mdb,{backends['config']['dn']}"
+        with dse.transaction():
+            try:
+                dse.delete_dn(dn)
+            except Exception:
+                pass
+            dse.add_entry([
+                f"dn: {dn}\n",
+                "objectClass: extensibleobject\n",
+                "objectClass: top\n",
+                "cn: mdb\n",
+                f"nsslapd-mdb-max-size: {dbmap_size}\n",
+                "nsslapd-mdb-max-readers: 0\n",
+                f"nsslapd-mdb-max-dbs: {nbdbis}\n",
+                "nsslapd-db-durable-transaction: on\n",
+                "nsslapd-search-bypass-filter-test: on\n",
+                "nsslapd-serial-lock: on\n"
+            ])
+
+        state = {'migration': 'bdb2mdb', 'backends': {}}
+        for bename, be in backends.items():
+            # Keep only backend associated with a db
+            if be['dbsize'] == 0:
+                continue
+            state['backends'][bename] = {'status': 'pending', 'weight': be['dbsize']}
+        save_state(tmpdir, state)
 
-    # Remove ldif files and mdb files
-    dblib_cleanup(inst, log, args)
-
-    # Compute the needed space and the lmdb map configuration
-    total_dbsize = 0
-    total_entrysize = 0
-    total_dbi = 3
-    for bename, be in backends.items():
-        # Keep only backend associated with a db
-        if be['dbsize'] == 0:
-            continue
-        total_dbsize += be['dbsize']
-        total_entrysize += be['entrysize']
-        total_dbi += be['dbi']
-
-    required_dbsize = round(total_dbsize * DBSIZE_MARGIN)
-
-    # Compute a dbmap size greater than required_dbsize
-    dbmap_size = parse_size(DEFAULT_LMDB_SIZE)
-    while (required_dbsize > dbmap_size):
-        dbmap_size = round(dbmap_size * 1.25)
-
-    # Round up number of dbis
-    nbdbis = 1
-    while nbdbis < total_dbi + DBI_MARGIN:
-        nbdbis *= 2
-
-    log.info(f"Required space for LDIF files is about {format_size(total_entrysize)}")
-    log.info(f"Required space for DBMAP files is about {format_size(required_dbsize)}")
-    log.info(f"Required number of dbi is {nbdbis}")
-
-    # Generate the info file (so dbscan could generate the map)
-    uid = inst.get_user_uid()
-    gid = inst.get_group_gid()
-    with open(f'{dbmapdir}/{MDB_INFO}', 'w') as f:
-        f.write('LIBVERSION=9025\n')
-        f.write('DATAVERSION=0\n')
-        f.write(f'MAXSIZE={dbmap_size}\n')
-        f.write('MAXREADERS=50\n')
-        f.write(f'MAXDBS={nbdbis}\n')
-    os.chown(f'{dbmapdir}/{MDB_INFO}', uid, gid)
-
-    total, used, free = shutil.disk_usage(dbmapdir)
-    if os.stat(dbmapdir).st_dev != os.stat(tmpdir).st_dev:
-        # Ldif and db are on different filesystems
-        # Let check that we have enough space in tmpdir for ldif files
-        total, used, free = shutil.disk_usage(tmpdir)
-        if free < total_entrysize:
-            raise OSError(ENOSPC, "Not enough space on {tmpdir} to migrate to lmdb " +
-                                  "(In {tmpdir}, {format_size(total_entrysize)} is "+
-                                  "needed but only {format_size(free)} is available)")
-        total_entrysize = 0    # do not count total_entrysize when checking dbmapdir size
-
-    # Let check that we have enough space in dbmapdir for the db and ldif files
-    total, used, free = shutil.disk_usage(dbmapdir)
-    size = required_dbsize + total_entrysize
-    if free < required_dbsize + total_entrysize:
-            raise OSError(ENOSPC, "Not enough space on {tmpdir} to migrate to lmdb " +
-                                  "(In {dbmapdir}, " +
-                                  "{format_size(required_dbsize + total_entrysize)} is "
-                                  "needed but only {format_size(free)} is available)")
-    # Lets use dbmap_size if possible, otherwise use required_dbsize
-    if free < dbmap_size + total_entrysize:
-        dbmap_size = required_dbsize
-
-    progress = 0
-    encrypt = False       # Should maybe be a args param
-    for bename, be in backends.items():
-        # Keep only backend associated with a db
-        if be['dbsize'] == 0:
-            continue
-        log.info(f"Backends exportation {progress*100/total_dbsize:2f}% ({bename})")
-        log.debug(f"inst.db2ldif({bename}, None, None, {encrypt}, True, {be['ldifname']})")
-        inst.db2ldif(bename, None, None, encrypt, True, be['ldifname'], False)
-        be['cl5'] = export_changelog(be, 'bdb')
-        progress += be['dbsize']
-    log.info("Backends exportation 100%")
-
-    log.info("Updating dse.ldif file")
-    # switch nsslapd-backend-implement in the dse.ldif
-    cfgbe = backends['config']
-    dn = cfgbe['dn']
-    dse.replace(dn, 'nsslapd-backend-implement', 'mdb')
-
-    # Add the lmdb config entry
-    dn = f'cn=mdb,{dn}'
-    try:
-        dse.delete_dn(dn)
-    except Exception:
-        pass
-    dse.add_entry([
-        f"dn: {dn}\n",
-        "objectClass: extensibleobject\n",
-        "objectClass: top\n",
-        "cn: mdb\n",
-        f"nsslapd-mdb-max-size: {dbmap_size}\n",
-        "nsslapd-mdb-max-readers: 0\n",
-        f"nsslapd-mdb-max-dbs: {nbdbis}\n",
-        "nsslapd-db-durable-transaction: on\n",
-        "nsslapd-search-bypass-filter-test: on\n",
-        "nsslapd-serial-lock: on\n"
-    ])
-
-    # Reimport all exported backends and changelog
-    progress = 0
-    encrypt = False       # Should maybe be a args param
-    for bename, be in backends.items():
-        # Keep only backend associated with a db
-        if be['dbsize'] == 0:
-            continue
-        log.info(f"Backends importation {progress*100/total_dbsize:2f}% ({bename})")
-        os.chown(be['ldifname'], uid, gid)
-        log.debug(f"inst.ldif2db({bename}, None, None, {encrypt}, {be['ldifname']})")
-        inst.ldif2db(bename, None, None, encrypt, be['ldifname'])
-        if be['cl5'] is True:
-            import_changelog(be, 'mdb')
-        progress += be['dbsize']
-    dbhome=backends["config"]["dbdir"]
-    set_owner(glob.glob(f'{dbhome}/*.mdb'), uid, gid)
-    log.info("Backends importation 100%")
+    # Export then reimport the backends and changelogs
+    migrate_backends(inst, log, dse, backends, state, tmpdir, 'bdb', 'mdb')
+    set_owner(glob.glob(f'{dbmapdir}/*.mdb'), uid, gid)
+    rm(f'{tmpdir}/{DBLIB_STATE}')
     inst.start()
     log.info("Migration from Berkeley database to lmdb is done.")
 
@@ -361,13 +429,9 @@ def dblib_mdb2bdb(inst, log, args):
     dbhome = inst.ds_paths.db_home_dir
     dblib = backends['config']['dblib']
     dbis = get_mdb_dbis(dbmapdir)
-
-    if dblib == "bdb":
-        log.error(f"Instance {inst.serverid} is already configured with bdb.")
-        return
-
-    # Remove ldif files and bdb files
-    dblib_cleanup(inst, log, args)
+    uid = inst.get_user_uid()
+    gid = inst.get_group_gid()
+    state = load_state(tmpdir, 'mdb2bdb') if getattr(args, 'resume', False) else None
 
     for be in dbis:
         if be is None:
@@ -375,86 +439,63 @@ def dblib_mdb2bdb(inst, log, args):
         id2entry = dbis[be]['id2entry.db']
         if int(id2entry['nbentries']) > 0:
             backends[be]['has_id2entry'] = True
+            backends[be]['nbentries'] = int(id2entry['nbentries'])
 
-    # Compute the needed space and the lmdb map configuration
-    dbmap_size = os.path.getsize(f'{dbmapdir}/{MDB_MAP}')
-    # Clearly over evaluated (but better than nothing )
-    total_entrysize = dbmap_size
-
-    log.info(f"Required space for LDIF files is about {format_size(total_entrysize)}")
-    log.info(f"Required space for bdb files is about {format_size(dbmap_size)}")
-
-    if os.stat(dbmapdir).st_dev != os.stat(tmpdir).st_dev:
-        # Ldif and db are on different filesystems
-        # Let check that we have enough space for ldif files
-        total, used, free = shutil.disk_usage(tmpdir)
-        if free < total_entrysize:
-            raise OSError(ENOSPC, "Not enough space on {tmpdir} to migrate to bdb " +
-                                  "(In {tmpdir}, {format_size(total_entrysize)} bytes "+
-                                  "are needed but only {format_size(free)} are available)")
-        total_entrysize = 0    # do not count total_entrysize when checking dbmapdir size
-
-    # Let check that we have enough space for the db and ldif files
-    total, used, free = shutil.disk_usage(dbmapdir)
-    if free < dbmap_size + total_entrysize:
-            raise OSError(ENOSPC, "Not enough space on {tmpdir} to migrate to bdb " +
-                                  "(In {dbmapdir}, {format_size(dbmap_size+total_entrysize)} "+
-                                  "is needed but only {format_size(free)} is available)")
+    if state is not None:
+        log.info(f"Resuming the migration from lmdb to Berkeley database ({tmpdir}/{DBLIB_STATE})")
+    elif dblib == "bdb":
+        log.error(f"Instance {inst.serverid} is already configured with bdb.")
+        return
+    else:
+        # Remove ldif files and bdb files
+        dblib_cleanup(inst, log, args)
+        rm(f'{tmpdir}/{DBLIB_STATE}')
+
+        # Compute the needed space and the lmdb map configuration
+        dbmap_size = os.path.getsize(f'{dbmapdir}/{MDB_MAP}')
+        # Clearly over evaluated (but better than nothing )
+        # (only one backend ldif file is stored at a time)
+        ldifsize = dbmap_size
+
+        log.info(f"Required space for LDIF files is about {format_size(ldifsize)}")
+        log.info(f"Required space for bdb files is about {format_size(dbmap_size)}")
+
+        if os.stat(dbmapdir).st_dev != os.stat(tmpdir).st_dev:
+            # Ldif and db are on different filesystems
+            # Let check that we have enough space for ldif files
+            total, used, free = shutil.disk_usage(tmpdir)
+            if free < ldifsize:
+                raise OSError(ENOSPC, f"Not enough space on {tmpdir} to migrate to bdb " +
+                                      f"(In {tmpdir}, {format_size(ldifsize)} bytes " +
+                                      f"are needed but only {format_size(free)} are available)")
+            ldifsize = 0    # do not count ldifsize when checking dbmapdir size
+
+        # Let check that we have enough space for the db and ldif files
+        total, used, free = shutil.disk_usage(dbmapdir)
+        if free < dbmap_size + ldifsize:
+            raise OSError(ENOSPC, f"Not enough space on {tmpdir} to migrate to bdb " +
+                                  f"(In {dbmapdir}, {format_size(dbmap_size + ldifsize)} " +
+                                  f"is needed but only {format_size(free)} is available)")
+
+        # bdb entries should still be in the dse.ldif
+        # nsslapd-backend-implement is switched to bdb before importing the first backend
+        state = {'migration': 'mdb2bdb', 'backends': {}}
+        for bename, be in backends.items():
+            # Keep only backend associated with a db
+            if 'has_id2entry' not in be:
+                continue
+            state['backends'][bename] = {'status': 'pending', 'weight': be['nbentries']}
+        save_state(tmpdir, state)
 
-    progress = 0
-    encrypt = False       # Should maybe be a args param
-    total_dbsize = 0
-    for bename, be in backends.items():
-        # Keep only backend associated with a db
-        if 'has_id2entry' not in be:
-            continue
-        total_dbsize += 1
-    uid = inst.get_user_uid()
-    gid = inst.get_group_gid()
-    for bename, be in backends.items():
-        # Keep only backend associated with a db
-        if 'has_id2entry' not in be:
-            continue
-        log.info(f"Backends exportation {progress*100/total_dbsize:2f}% ({bename})")
-        log.debug(f"inst.db2ldif({bename}, None, None, {encrypt}, True, {be['ldifname']})")
-        inst.db2ldif(bename, None, None, encrypt, True, be['ldifname'], False)
-        be['cl5'] = export_changelog(be, 'mdb')
-        progress += 1
-    log.info("Backends exportation 100%")
+    # Export then reimport the backends and changelogs
+    migrate_backends(inst, log, dse, backends, state, tmpdir, 'mdb', 'bdb')
     set_owner(glob.glob(f'{dbmapdir}/*'), uid, gid)
-
-    log.info("Updating dse.ldif file")
-    # switch nsslapd-backend-implement in the dse.ldif
-    cfgbe = backends['config']
-    dn = cfgbe['dn']
-    dse.replace(dn, 'nsslapd-backend-implement', 'bdb')
-
-    # bdb entries should still be here
-
-    # Reimport all exported backends and changelog
-    progress = 0
-    encrypt = False      # Should maybe be a args param
-    for bename, be in backends.items():
-        # Keep only backend associated with a db
-        if 'has_id2entry' not in be:
-            continue
-        log.info(f"Backends importation {progress*100/total_dbsize:2f}% ({bename})")
-        log.debug(f"inst.ldif2db({be['ecbename']}, None, None, {encrypt}, {be['ldifname']})")
-        log.debug(f'dbdir={be["dbdir"]}')
-        os.chown(be['ldifname'], uid, gid)
-        inst.ldif2db(be['ecbename'], None, None, encrypt, be['ldifname'])
-        if be['cl5'] is True:
-            import_changelog(be, 'bdb')
-        set_owner(glob.glob(f'{be["ecdbdir"]}/*'), uid, gid)
-        progress += be['dbsize']
-
     set_owner(glob.glob(f'{dbhome}/__db.*'), uid, gid)
     set_owner(glob.glob(f'{dbmapdir}/__db.*'), uid, gid)
     set_owner(glob.glob(f'{dbhome}/log.*'), uid, gid)
     set_owner(glob.glob(f'{dbmapdir}/log.*'), uid, gid)
-    set_owner((f'{dbhome}/DBVERSION', f'{dbmapdir}/DBVERSION', f'{dbhome}/guardian', '{dbmapdir}/guardian'), uid, gid)
-
-    log.info("Backends importation 100%")
+    set_owner((f'{dbhome}/DBVERSION', f'{dbmapdir}/DBVERSION', f'{dbhome}/guardian', f'{dbmapdir}/guardian'), uid, gid)
+    rm(f'{tmpdir}/{DBLIB_STATE}')
     inst.start()
     log.info("Migration from ldbm to Berkeley database is done.")
 
@@ -478,7 +519,8 @@ def dblib_cleanup(inst, log, args):
     dblib = backends['config']['dblib']
     log.info(f"cleanup dbmapdir={dbmapdir} dbhome={dbhome} dblib={dblib}")
 
-    # Remove all ldif and changelog file
+    # Remove all ldif and changelog file and the migration progress
+    rm(f'{tmpdir}/{DBLIB_STATE}')
     for bename, be in backends.items():
         # Keep only backend associated with a db
         if 'has_id2entry' not in be and be['dbsize'] == 0:
@@ -519,10 +561,14 @@ def create_parser(subparsers):
     dblib_bdb2mdb_parser = subcommands.add_parser('bdb2mdb', help='Migrate bdb databases to lmdb')
     dblib_bdb2mdb_parser.set_defaults(func=dblib_bdb2mdb)
     dblib_bdb2mdb_parser.add_argument('--tmpdir', help="ldif migration files directory path.")
+    dblib_bdb2mdb_parser.add_argument('--resume', action='store_true', default=False,
+                                      help="Resume an interrupted migration (already migrated backends are skipped).")
 
     dblib_mdb2bdb_parser = subcommands.add_parser('mdb2bdb', help='Migrate lmdb databases to bdb')
     dblib_mdb2bdb_parser.set_defaults(func=dblib_mdb2bdb)
     dblib_mdb2bdb_parser.add_argument('--tmpdir', help="ldif migration files directory path.")
+    dblib_mdb2bdb_parser.add_argument('--resume', action='store_true', default=False,
+                                      help="Resume an interrupted migration (already migrated backends are skipped).")
 
     dblib_cleanup_parser = subcommands.add_parser('cleanup', help='Remove migration ldif file and old database')
     dblib_cleanup_parser.set_defaults(func=dblib_cleanup)
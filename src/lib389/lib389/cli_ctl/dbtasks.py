@@ -8,7 +8,10 @@
 # --- END COPYRIGHT BLOCK ---
 
 import os
-from lib389._constants import TaskWarning
+import json
+from lib389._constants import TaskWarning, DN_CONFIG_LDBM, DN_LDBM
+from lib389.dseldif import DSEldif
+from lib389.index import DEFAULT_IDLISTSCANLIMIT, IndexKeyStats, dbscan_index_keys
 from pathlib import Path
 
 
@@ -125,6 +128,51 @@ def dbtasks_verify(inst, log, args):
         log.info("dbverify successful")
 
 
+def dbtasks_index_analyze(inst, log, args):
+    dse = DSEldif(inst)
+    bename = args.backend
+    indexes = args.attr or [index for index in dse.get_indexes(bename) if index.lower() != 'entryrdn']
+    if not indexes:
+        raise ValueError(f"No index found for backend {bename}")
+    scanlimit = int(dse.get(DN_CONFIG_LDBM, 'nsslapd-idlistscanlimit', single=True) or DEFAULT_IDLISTSCANLIMIT)
+    if args.limit is not None:
+        scanlimit = args.limit
+    # lmdb can be read while the server runs, bdb can not
+    stopped = False
+    if inst.get_db_lib() != 'mdb' and inst.status():
+        log.info("Stopping the instance, a bdb database can not be scanned while the server is running")
+        inst.stop()
+        stopped = True
+    results = []
+    try:
+        for index in indexes:
+            limits = dse.get(f'cn={index},cn=index,cn={bename},{DN_LDBM}', 'nsIndexIDListScanLimit') or []
+            stats = IndexKeyStats(index, scanlimit, limits, top=args.top)
+            lines = inst.dbscan_lines(args=['-n', '-r', '-f', os.path.join(inst.dbdir, bename, index + '.db')],
+                                      stopping=False)
+            for (key, count) in dbscan_index_keys(lines):
+                stats.add(key, count)
+            results.append(stats)
+    finally:
+        if stopped:
+            inst.start()
+
+    if args.json:
+        print(json.dumps({'type': 'list', 'items': [stats.to_dict() for stats in results]}, indent=4))
+        return
+    for stats in results:
+        log.info(f"Index: {stats.name}")
+        log.info(f"  Keys: {stats.keys}  IDs: {stats.ids}")
+        for (ktype, tstats) in sorted(stats.types.items()):
+            log.info(f"  {ktype}: {tstats['keys']} keys, {tstats['ids']} IDs, longest ID list: {tstats['max']}")
+        log.info("  ID list lengths: " + ", ".join(f"{bucket}: {nb}" for (bucket, nb) in stats.histogram_dict().items() if nb))
+        if stats.largest():
+            log.info("  Largest keys: " + ", ".join(f"{key} ({count})" for (key, count) in stats.largest()))
+        for reco in stats.recommendations():
+            log.info(f"  Recommendation: {reco}")
+        log.info("")
+
+
 def create_parser(subcommands):
     db2index_parser = subcommands.add_parser('db2index', help="Initialise a reindex of the server database. The server must be stopped for this to proceed.")
     # db2index_parser.add_argument('suffix', help="The suffix to reindex. IE dc=example,dc=com.")
@@ -171,3 +219,13 @@ def create_parser(subcommands):
     ldifs_parser = subcommands.add_parser('ldifs', help="List all the LDIF files located in the server's LDIF directory")
     ldifs_parser.add_argument('--delete', nargs=1, help="Delete LDIF file")
     ldifs_parser.set_defaults(func=dbtasks_ldifs)
+
+    index_analyze_parser = subcommands.add_parser('index-analyze', help="Report the key distribution of the indexes of a backend, "
+                                                  "the keys reaching ALLIDS or the ID list scan limit, and the suggested index changes. "
+                                                  "A bdb database can only be scanned while the server is stopped.")
+    index_analyze_parser.add_argument('backend', help="The backend to analyze. IE userRoot")
+    index_analyze_parser.add_argument('--attr', nargs="*", help="The indexes to analyze (default is all the indexes of the backend). IE --attr cn uid", default=None)
+    index_analyze_parser.add_argument('--limit', type=int, default=None,
+                                      help="The ID list scan limit to check the keys against (default is nsslapd-idlistscanlimit)")
+    index_analyze_parser.add_argument('--top', type=int, default=10, help="The number of keys with the longest ID lists to report per index")
+    index_analyze_parser.set_defaults(func=dbtasks_index_analyze)
@@ -8,7 +8,8 @@
 
 import json
 import re
-from lib389._mapped_object import DSLdapObjects
+from concurrent import futures
+from lib389._mapped_object import DSLdapObjects, SearchSnapshot
 from lib389._mapped_object_lint import DSLint
 from lib389.cli_base import connect_instance, disconnect_instance
 from lib389.cli_base.dsrc import dsrc_to_ldap, dsrc_arg_concat
@@ -22,7 +23,7 @@ from lib389.dirsrv_log import DirsrvAccessLog
 from lib389.tunables import Tunables
 from lib389 import lint
 from lib389 import plugins
-from lib389._constants import DSRC_HOME
+from lib389._constants import DSRC_HOME, DN_CONFIG
 from functools import partial
 from typing import Iterable
 
@@ -43,6 +44,34 @@ CHECK_OBJECTS = [
     Tunables,
 ]
 
+# The checks run by --offline: they only need cn=config, which is read from
+# the dse.ldif, and the files of the instance.  None allows all the checks
+# of an object.
+OFFLINE_CHECKS = {
+    'config': None,
+    'encryption': None,
+    'backends': ('mappingtree', 'cl_trimming'),
+    'fschecks': None,
+    'refint': None,
+    'memberof': None,
+    'dseldif': None,
+    'tls': None,
+    'tunables': None,
+}
+
+# The dse.ldif only has the cn=config attributes which were set, the checks
+# run by --offline get the server defaults of the ones they read.
+OFFLINE_DEFAULTS = {
+    DN_CONFIG: {
+        'nsslapd-logging-hr-timestamps-enabled': ['on'],
+        'passwordStorageScheme': ['PBKDF2-SHA512'],
+        'nsslapd-rootpwstoragescheme': ['PBKDF2-SHA512'],
+        'nsslapd-allow-unauthenticated-binds': ['off'],
+        'nsslapd-accesslog-logbuffering': ['on'],
+        'nsslapd-securitylog-logbuffering': ['on'],
+    },
+}
+
 
 def _format_check_output(log, result, idx):
     log.info(f"\n\n[{idx}] DS Lint Error: {result['dsle']}")
@@ -88,22 +117,53 @@ def _list_checks(inst, specs: Iterable[str]):
             raise ValueError('No such object specifier')
 
 
-def _print_checks(inst, log, specs: Iterable[str]) -> None:
-    for o, s in _list_checks(inst, specs):
+def _offline_checks(checks):
+    for o, s in checks:
+        if o.lint_uid() in OFFLINE_CHECKS:
+            # The last part of the spec is the name of the lint method
+            allowed = OFFLINE_CHECKS[o.lint_uid()]
+            if allowed is None or s[0].split(':')[-1] in allowed:
+                yield o, s
+
+
+def _print_checks(inst, log, checks) -> None:
+    for o, s in checks:
         log.info(f'{o.lint_uid()}:{s[0]}')
 
-def _run(inst, log, args, checks):
+def _run_check(log, args, o, s):
+    # The lints are generators, they are consumed in the worker thread.  A
+    # failing check keeps the results it yielded before the error.
+    if not args.json:
+        log.info(f"Checking {o.lint_uid()}:{s[0]} ...")
+    results = []
+    try:
+        for result in o.lint(s[0]) or []:
+            results.append(result)
+    except Exception as e:
+        # Offline, a failure is likely a value missing from the dse.ldif,
+        # so it is reported instead of passing silently
+        if getattr(args, 'offline', False):
+            log.error(f"The check {o.lint_uid()}:{s[0]} failed: {e}")
+        else:
+            log.debug(f"The check {o.lint_uid()}:{s[0]} failed: {e}")
+    return results
+
+
+def _run(inst, log, args, checks, snapshot=None):
     if not args.json:
         log.info("Beginning lint report, this could take a while ...")
 
+    # The checks are independent and read only: they run concurrently, and
+    # their searches in cn=config are answered from a single snapshot of it.
+    # The report keeps the order of the checks.
     report = []
-    for o, s in checks:
-        if not args.json:
-            log.info(f"Checking {o.lint_uid()}:{s[0]} ...")
-        try:
-            report += o.lint(s[0]) or []
-        except:
-            continue
+    with snapshot or SearchSnapshot(inst):
+        with futures.ThreadPoolExecutor(max_workers=max(1, getattr(args, 'jobs', 1) or 1)) as pool:
+            pending = []
+            for o, s in checks:
+                pending.append(pool.submit(_run_check, log, args, o, s))
+            for future in pending:
+                report += future.result()
 
     if not args.json:
         log.info("Healthcheck complete.")
@@ -127,6 +187,7 @@ def _run(inst, log, args, checks):
             log.info('\n\n===== End Of Report ({} Issue{} found) ====='.format(count, plural))
         else:
             log.info(json.dumps(report, indent=4))
+    return report
 
 
 def health_check_run(inst, log, args):
@@ -137,6 +198,9 @@ def health_check_run(inst, log, args):
         _list_errors(log)
         return
 
+    if getattr(args, 'offline', False):
+        return health_check_run_offline(inst, log, args)
+
     # update the args for connect_instance()
     args.basedn = None
     args.binddn = None
@@ -154,7 +218,7 @@ def health_check_run(inst, log, args):
     checks = args.check or dict(_list_targets(inst)).keys()
 
     if args.list_checks or args.dry_run:
-        _print_checks(inst, log, checks)
+        _print_checks(inst, log, _list_checks(inst, checks))
         return
 
     _run(inst, log, args, _list_checks(inst, checks))
@@ -162,6 +226,40 @@ def health_check_run(inst, log, args):
     disconnect_instance(inst)
 
 
+def health_check_run_offline(inst, log, args):
+    """Perform the health checks which only need the configuration and the
+    files of the local instance, without connecting to the server.  The
+    configuration is read from the dse.ldif.
+    """
+
+    try:
+        dse_ldif = DSEldif(inst)
+    except OSError as e:
+        raise ValueError(f'Failed to read the dse.ldif of the Directory Server instance: {e}')
+
+    # The checks are listed from the snapshot too, the backends are in it
+    snapshot = SearchSnapshot(inst, dse_ldif=dse_ldif, defaults=OFFLINE_DEFAULTS)
+    with snapshot:
+        if args.check:
+            # Reject the specs selecting only checks which need the server,
+            # like monitor-disk-space or backends:userroot:search
+            for spec in args.check:
+                if next(_offline_checks(_list_checks(inst, [spec])), None) is None:
+                    raise ValueError(f'The check {spec} needs the server running, it can not be run offline')
+            checks = args.check
+        else:
+            checks = [uid for uid in dict(_list_targets(inst)).keys() if uid in OFFLINE_CHECKS]
+
+        if args.list_checks or args.dry_run:
+            _print_checks(inst, log, _offline_checks(_list_checks(inst, checks)))
+            return
+
+    report = _run(inst, log, args, _offline_checks(_list_checks(inst, checks)), snapshot=snapshot)
+    # Fail on the high severity issues, so this can gate the start of the server
+    if any(item['severity'].upper() == 'HIGH' for item in report):
+        return False
+
+
 def create_parser(subparsers):
     run_healthcheck_parser = subparsers.add_parser('healthcheck', help=
         "Run a healthcheck report on a local Directory Server instance. This "
@@ -175,3 +273,10 @@ def create_parser(subparsers):
     run_healthcheck_parser.add_argument('--check', nargs='+', default=None,
                                         help='Areas to check. These can be obtained by --list-checks. Every element on the left of the colon (:)'
                                              ' may be replaced by an asterisk if multiple options on the right are available.')
+    run_healthcheck_parser.add_argument('--jobs', type=int, default=4,
+                                        help='The number of checks run concurrently (default: 4)')
+    run_healthcheck_parser.add_argument('--offline', action='store_true', default=False,
+                                        help='Do not connect to the server, only run the checks of the configuration '
+                                             'and of the files of the instance.  The configuration is read from '
+                                             'the dse.ldif, so this can be run while the server is stopped.  It '
+                                             'fails if a high severity issue is found.')
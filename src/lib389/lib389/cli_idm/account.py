@@ -7,11 +7,12 @@
 # See LICENSE for details.
 # --- END COPYRIGHT BLOCK ---
 
+import argparse
 import json
 import ldap
 import math
 from datetime import datetime
-from lib389.idm.account import Account, Accounts, AccountState
+from lib389.idm.account import Account, Accounts, AccountState, AccountStatusEvaluator
 from lib389.cli_base import (
     _generic_get_dn,
     _generic_list,
@@ -19,12 +20,21 @@ from lib389.cli_base import (
     _generic_modify_dn,
     _get_arg,
     _get_dn_arg,
+    _generic_modify_change_to_mod,
     _warn,
     )
 from lib389.cli_idm import _generic_rename_dn
 
 MANY = Accounts
 SINGULAR = Account
+BULK_UPDATE_WINDOW = 64
+
+
+def _window_arg(value):
+    window = int(value)
+    if window < 1:
+        raise argparse.ArgumentTypeError(f"invalid window: {value} (it must be at least 1)")
+    return window
 
 
 def list(inst, basedn, log, args):
@@ -102,12 +112,12 @@ def subtree_status(inst, basedn, log, args):
         datetime_inactive_time = datetime.strptime(args.become_inactive_on, '%Y-%m-%dT%H:%M:%S')
         epoch_inactive_time = datetime.timestamp(datetime_inactive_time)
 
-    account_list = Accounts(inst, basedn).filter(filter, scope=scope)
-    if not account_list:
-        raise ValueError(f"No entries were found under {basedn}")
-
-    for entry in account_list:
-        status = entry.status()
+    # The account policy, CoS templates and disabled roles are loaded once,
+    # and the accounts are streamed with all the attributes needed for their status
+    found = False
+    evaluator = AccountStatusEvaluator(inst)
+    for entry, status in evaluator.search(basedn, filter, scope=scope):
+        found = True
         state = status["state"]
         params = status["params"]
         if args.inactive_only and state == AccountState.ACTIVATED:
@@ -117,10 +127,14 @@ def subtree_status(inst, basedn, log, args):
                epoch_inactive_time <= (params["Time Until Inactive"] + status["calc_time"]):
                 continue
         _print_entry_status(status, entry.dn, log, args)
+    if not found:
+        raise ValueError(f"No entries were found under {basedn}")
 
 
 def bulk_update(inst, basedn, log, args):
     basedn = _get_dn_arg(args.basedn, msg="Enter basedn to search")
+    if not args.changes:
+        raise ValueError("Missing modify actions to perform.")
     search_filter = "(objectclass=*)"
     scope = ldap.SCOPE_SUBTREE
     scope_str = "sub"
@@ -129,31 +143,41 @@ def bulk_update(inst, basedn, log, args):
         scope_str = "one"
     if args.filter:
         search_filter = args.filter
+    mods = [_generic_modify_change_to_mod(x) for x in args.changes]
+    log.debug("Requested mods: %s" % mods)
     log.info(f"Searching '{basedn}' filter '{search_filter}' scope '{scope_str}' ...")
-    entry_list = Accounts(inst, basedn).filter(search_filter, scope=scope)
-    if not entry_list:
-        raise ValueError(f"No entries were found.")
-    log.info(f"Found {len(entry_list)} matching entries.")
 
+    # Stream the matching entries and modify them asynchronously
+    mod_log = log.getChild('_generic_modify_dn')
+    # With --stop, the entries are modified one at a time: no update is
+    # sent after the failing one
+    window = 1 if args.stop else getattr(args, 'window', BULK_UPDATE_WINDOW)
+    updates = Accounts(inst, basedn).bulk_apply_mods(mods, search_filter, scope=scope, skip_base=True,
+                                                     window=window)
+    found = 0
     failed_list = []
     success_list = []
-    for entry in entry_list:
-        if entry.dn.lower() == basedn.lower():
+    for dn, error in updates:
+        found += 1
+        if error is None:
+            mod_log.info('Successfully modified %s' % dn)
+            success_list.append(dn)
+        elif not isinstance(error, ldap.LDAPError):
             # skip parent
-            failed_list.append(entry.dn + " (Base DN Entry Skipped)")
-            continue
-        try:
-            _generic_modify_dn(inst, basedn, log.getChild('_generic_modify_dn'), MANY, entry.dn, args)
-            success_list.append(entry.dn)
-        except ldap.LDAPError as e:
-            if "desc" in e.args[0]:
-                failed_list.append(entry.dn + f" ({e.args[0]['desc']})")
-                log.debug(f"Failed to update {entry.dn} ({e.args[0]['desc']})")
+            failed_list.append(dn + f" ({error})")
+        else:
+            if "desc" in error.args[0]:
+                failed_list.append(dn + f" ({error.args[0]['desc']})")
+                log.debug(f"Failed to update {dn} ({error.args[0]['desc']})")
             else:
-                failed_list.append(entry.dn + f" ({str(e)})")
-                log.debug(f"Failed to update {entry.dn} ({str(e)})")
+                failed_list.append(dn + f" ({str(error)})")
+                log.debug(f"Failed to update {dn} ({str(error)})")
             if args.stop:
-                raise ValueError(f"Failed to update entry ({entry.dn}), error: {str(e)}")
+                updates.close()
+                raise ValueError(f"Failed to update entry ({dn}), error: {str(error)}")
+    if not found:
+        raise ValueError(f"No entries were found.")
+    log.info(f"Found {found} matching entries.")
 
     log.info(f"Updates Finished.\nSuccessfully updated {len(success_list)} entries.")
     if len(failed_list) > 0:
@@ -276,4 +300,7 @@ like modify, locking and unlocking. To create an account, see "user" subcommand
     bulk_update_parser.add_argument('-s', '--scope', choices=['one', 'sub'], help="Search scope (one, sub - default is sub")
     bulk_update_parser.add_argument('-x', '--stop', action='store_true', default=False,
                                     help="Stop processing updates when an error occurs. Default is False")
+    bulk_update_parser.add_argument('--window', type=_window_arg, default=BULK_UPDATE_WINDOW,
+                                    help="The maximum number of updates in progress at the same time, "
+                                         f"it is 1 with --stop. Default is {BULK_UPDATE_WINDOW}")
     bulk_update_parser.add_argument('changes', nargs='+', help="A list of changes to apply in format: <add|delete|replace>:<attribute>:<value>")
@@ -9,10 +9,14 @@
 # Replacement of the dbgen.pl utility
 
 from lib389.utils import (ensure_str, pseudolocalize)
+from concurrent import futures
 import random
 import os
 import pwd
 import grp
+import gzip
+import shutil
+import tempfile
 
 global node_count
 
@@ -128,6 +132,13 @@ ou: {OU}
 
 """
 
+# Number of user entries generated per chunk, and formatted per write
+DBGEN_CHUNK_SIZE = 10000
+DBGEN_BATCH_SIZE = 500
+
+# Name lists of the dbgen_users() worker processes
+_dbgen_names = None
+
 RANDOM_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqurstuvwxyz0123456789_#@%&()?~$^`~*-=+{}|"\'.,<>'
 
 
@@ -220,13 +231,137 @@ def write_generic_user(LDIF, index, number, parent, name="user", changetype="",
     ))
     return dn
 
-def dbgen_users(instance, number, ldif_file, suffix, generic=False, entry_name="user", parent=None, startIdx=0, rdnCN=False, pseudol10n=False):
+def _dbgen_rng(seed, chunk_idx):
+    # Every chunk gets its own generator so the output only depends on the
+    # seed and the chunk size, never on the number of worker processes
+    return random.Random(f"{seed}-{chunk_idx}")
+
+
+def _dbgen_open(ldif_file, mode='w'):
+    # LDIF files ending with ".gz" are written compressed.  Concatenated gzip
+    # members are a valid gzip stream, so compressed chunks can be appended
+    if ldif_file.endswith('.gz'):
+        return gzip.open(ldif_file, mode + 't', compresslevel=6)
+    return open(ldif_file, mode)
+
+
+def _dbgen_split_name(ldif_file, chunk_idx):
+    # users.ldif -> users-0000.ldif, users.ldif.gz -> users-0000.ldif.gz
+    base, ext = os.path.splitext(ldif_file)
+    if ext == '.gz':
+        base, ldif_ext = os.path.splitext(base)
+        ext = ldif_ext + ext
+    return f"{base}-{chunk_idx:04d}{ext}"
+
+
+def _dbgen_users_header(suffix, parent, pseudol10n):
+    header = [get_node(suffix)]
+    for ou in DBGEN_OUS:
+        ou = pseudolocalize(ou) if pseudol10n else ou
+        header.append(DBGEN_OU_TEMPLATE.format(SUFFIX=suffix, OU=ou))
+
+    if parent is not None:
+        parent_rdn = parent.split(',')[0].split('=')[1]
+        if parent_rdn.lower() not in DBGEN_OUS:
+            header.append(get_node(parent))
+    return ''.join(header)
+
+
+def _dbgen_write_users(LDIF, rng, givennames, familynames, opts, first_idx, last_idx):
+    """
+    Write the user entries first_idx to last_idx (inclusive).  The entries are
+    formatted in batches to keep the number of write calls down.
+    """
+    batch = []
+    for i in range(first_idx, last_idx + 1):
+        # Pick a random ou
+        ou = rng.choice(DBGEN_OUS)
+        first = rng.choice(givennames)
+        last = rng.choice(familynames)
+        if opts['generic']:
+            i += opts['startIdx']
+            name = opts['entry_name'] + get_index(i, opts['number'])
+            uid = name
+            cn = name
+        else:
+            uid = "%s%s%s" % (first[0], last, i)
+            cn = f"{first} {last}"
+        initials = "%s. %s" % (first[0], last[0])
+        l = rng.choice(DBGEN_LOCATIONS)
+        title = "%s %s" % (rng.choice(DBGEN_TITLE_LEVELS), rng.choice(DBGEN_POSITIONS))
+        if opts['pseudol10n']:
+            ou = pseudolocalize(ou)
+            first = pseudolocalize(first)
+            last = pseudolocalize(last)
+            initials = pseudolocalize(initials)
+            l = pseudolocalize(l)
+            title = pseudolocalize(title)
+
+        if opts['rdnCN']:
+            # Not using "uid" so use "cn" instead
+            dn = f"cn={cn},{opts['parent']}"
+        else:
+            dn = f"uid={uid},{opts['parent']}"
+
+        batch.append(DBGEN_TEMPLATE.format(
+            DN=dn,
+            CHANGETYPE="",
+            UID=uid,
+            UIDNUMBER=i,
+            FIRST=first,
+            LAST=last,
+            CN=cn,
+            INITIALS=initials,
+            OU=ou,
+            LOCATION=l,
+            TITLE=title,
+        ))
+        if len(batch) == DBGEN_BATCH_SIZE:
+            LDIF.write(''.join(batch))
+            batch = []
+    if batch:
+        LDIF.write(''.join(batch))
+
+
+def _dbgen_init_worker(givennames, familynames):
+    # Hand the name lists to the worker process once instead of once per chunk
+    global _dbgen_names
+    _dbgen_names = (givennames, familynames)
+
+
+def _dbgen_users_chunk(opts, chunk_idx, first_idx, last_idx, path, header=None):
+    # Runs in a worker process, see _dbgen_init_worker()
+    givennames, familynames = _dbgen_names
+    with _dbgen_open(path) as LDIF:
+        if header is not None:
+            LDIF.write(header)
+        _dbgen_write_users(LDIF, _dbgen_rng(opts['seed'], chunk_idx),
+                           givennames, familynames, opts, first_idx, last_idx)
+    return path
+
+
+def dbgen_users(instance, number, ldif_file, suffix, generic=False, entry_name="user", parent=None, startIdx=0, rdnCN=False, pseudol10n=False,
+                seed=None, workers=1, chunk_size=DBGEN_CHUNK_SIZE, split=False):
     """
     Generate an LDIF of randomly named entries
+
+    The entries are generated in chunks of chunk_size entries, each one with
+    its own random generator derived from the seed, so the same seed and chunk
+    size always produce the same LDIF whatever the number of workers.  With
+    more than one worker the chunks are generated by a pool of processes.  If
+    ldif_file ends with ".gz" the LDIF is gzip compressed, and with split the
+    chunks are written to separate files (the first one holding the suffix and
+    container entries) instead of being concatenated.
+
+    Returns the list of LDIF files that were written.
     """
     # Lets insure that integer parameters are not string
-    number=int(number)
-    startIdx=int(startIdx)
+    number = int(number)
+    startIdx = int(startIdx)
+    workers = max(int(workers), 1)
+    chunk_size = max(int(chunk_size), 1)
+    if seed is None:
+        seed = random.randrange(2**32)
     familyname_file = os.path.join(instance.ds_paths.data_dir, 'dirsrv/data/dbgen-FamilyNames')
     givename_file = os.path.join(instance.ds_paths.data_dir, 'dirsrv/data/dbgen-GivenNames')
     familynames = []
@@ -236,68 +371,84 @@ def dbgen_users(instance, number, ldif_file, suffix, generic=False, entry_name="
     with open(givename_file, 'r') as f:
         givennames = [n.strip() for n in f]
 
-    with open(ldif_file, 'w') as LDIF:
-        LDIF.write(get_node(suffix))
-        for ou in DBGEN_OUS:
-            ou = pseudolocalize(ou) if pseudol10n else ou
-            LDIF.write(DBGEN_OU_TEMPLATE.format(SUFFIX=suffix, OU=ou))
-
-        if parent is not None:
-            parent_rdn = parent.split(',')[0].split('=')[1]
-            if parent_rdn.lower() not in DBGEN_OUS:
-                LDIF.write(get_node(parent))
-
-        for i in range(1, int(number) + 1):
-            # Pick a random ou
-            ou = random.choice(DBGEN_OUS)
-            first = random.choice(givennames)
-            last = random.choice(familynames)
-            if generic:
-                i += startIdx
-                name = entry_name + get_index(i, number)
-                uid = name
-                cn = name
-            else:
-                first = random.choice(givennames)
-                last = random.choice(familynames)
-                uid = "%s%s%s" % (first[0], last, i)
-                cn = f"{first} {last}"
-            # How do we subscript from a generator?
-            initials = "%s. %s" % (first[0], last[0])
-            l = random.choice(DBGEN_LOCATIONS)
-            title = "%s %s" % (random.choice(DBGEN_TITLE_LEVELS), random.choice(DBGEN_POSITIONS))
-            if pseudol10n:
-                ou = pseudolocalize(ou)
-                first = pseudolocalize(first)
-                last = pseudolocalize(last)
-                initials = pseudolocalize(initials)
-                l = pseudolocalize(l)
-                title = pseudolocalize(title)
-
-            if parent is None:
-                parent = f"ou={ou},{suffix}"
-
-            if rdnCN:
-                # Not using "uid" so use "cn" instead
-                dn = f"cn={cn},{parent}"
-            else:
-                dn = f"uid={uid},{parent}"
-
-            LDIF.write(DBGEN_TEMPLATE.format(
-                DN=dn,
-                CHANGETYPE="",
-                UID=uid,
-                UIDNUMBER=i,
-                FIRST=first,
-                LAST=last,
-                CN=cn,
-                INITIALS=initials,
-                OU=ou,
-                LOCATION=l,
-                TITLE=title,
-            ))
-
-    finalize_ldif_file(instance, ldif_file)
+    header = _dbgen_users_header(suffix, parent, pseudol10n)
+    if parent is None:
+        # All the entries go under the random ou of the first entry
+        ou = _dbgen_rng(seed, 0).choice(DBGEN_OUS)
+        ou = pseudolocalize(ou) if pseudol10n else ou
+        parent = f"ou={ou},{suffix}"
+
+    opts = {
+        'seed': seed,
+        'number': number,
+        'generic': generic,
+        'entry_name': entry_name,
+        'parent': parent,
+        'startIdx': startIdx,
+        'rdnCN': rdnCN,
+        'pseudol10n': pseudol10n,
+    }
+    chunks = [(idx, first_idx, min(first_idx + chunk_size - 1, number))
+              for idx, first_idx in enumerate(range(1, number + 1, chunk_size))]
+
+    if split:
+        ldif_files = [_dbgen_split_name(ldif_file, idx) for idx in range(max(len(chunks), 1))]
+        if not chunks:
+            with _dbgen_open(ldif_files[0]) as LDIF:
+                LDIF.write(header)
+        elif workers == 1:
+            _dbgen_init_worker(givennames, familynames)
+            for (idx, first_idx, last_idx) in chunks:
+                _dbgen_users_chunk(opts, idx, first_idx, last_idx, ldif_files[idx],
+                                   header if idx == 0 else None)
+        else:
+            with futures.ProcessPoolExecutor(max_workers=workers, initializer=_dbgen_init_worker,
+                                             initargs=(givennames, familynames)) as executor:
+                jobs = [executor.submit(_dbgen_users_chunk, opts, idx, first_idx, last_idx,
+                                        ldif_files[idx], header if idx == 0 else None)
+                        for (idx, first_idx, last_idx) in chunks]
+                for job in jobs:
+                    job.result()
+    elif workers == 1:
+        ldif_files = [ldif_file]
+        with _dbgen_open(ldif_file) as LDIF:
+            LDIF.write(header)
+            for (idx, first_idx, last_idx) in chunks:
+                _dbgen_write_users(LDIF, _dbgen_rng(seed, idx), givennames, familynames,
+                                   opts, first_idx, last_idx)
+    else:
+        # Generate the chunks next to the LDIF file, and append them in order
+        # as soon as they are done
+        ldif_files = [ldif_file]
+        ldif_dir = os.path.dirname(os.path.abspath(ldif_file))
+        # The chunk files are compressed like the LDIF file
+        chunk_suffix = '.gz' if ldif_file.endswith('.gz') else ''
+        chunk_files = []
+        try:
+            for _ in chunks:
+                (fd, path) = tempfile.mkstemp(prefix='.dbgen-', suffix=chunk_suffix, dir=ldif_dir)
+                os.close(fd)
+                chunk_files.append(path)
+            with _dbgen_open(ldif_file) as LDIF:
+                LDIF.write(header)
+            with futures.ProcessPoolExecutor(max_workers=workers, initializer=_dbgen_init_worker,
+                                             initargs=(givennames, familynames)) as executor, \
+                    open(ldif_file, 'ab') as LDIF:
+                jobs = [executor.submit(_dbgen_users_chunk, opts, idx, first_idx, last_idx, chunk_files[idx])
+                        for (idx, first_idx, last_idx) in chunks]
+                for job in jobs:
+                    path = job.result()
+                    with open(path, 'rb') as chunk:
+                        shutil.copyfileobj(chunk, LDIF)
+                    os.remove(path)
+        finally:
+            for path in chunk_files:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    for path in ldif_files:
+        finalize_ldif_file(instance, path)
+    return ldif_files
 
 
 def dbgen_groups(instance, ldif_file, props):
@@ -515,7 +666,10 @@ def dbgen_mod_load(ldif_file, props):
         }
     """
 
-    entry_dn_list = []  # List used to delete entries at the end of the LDIF
+    # The entries to delete at the end of the LDIF are the initial entries that
+    # were not deleted or renamed, followed by the added and renamed entries
+    removed_dns = set()
+    added_dns = []
     if props['modAttrs'] is None:
         props['modAttrs'] = ['description', 'title']
 
@@ -525,15 +679,11 @@ def dbgen_mod_load(ldif_file, props):
             LDIF.write(get_node(props['parent']))
 
         # Create entries
-        for user_idx in range(1, props['numUsers'] + 1):
-            if props['createUsers']:
-                dn = write_generic_user(
+        if props['createUsers']:
+            for user_idx in range(1, props['numUsers'] + 1):
+                write_generic_user(
                     LDIF, user_idx, props['numUsers'], props['parent'],
                     changetype="\nchangetype: add")
-                entry_dn_list.append(dn)
-            else:
-                dn = f"uid=user{get_index(user_idx, props['numUsers'])},{props['parent']}"
-                entry_dn_list.append(dn)
 
         # Set the types of operations and how many of them to perform
         addc = int(props['addUsers'])
@@ -555,7 +705,7 @@ def dbgen_mod_load(ldif_file, props):
                     dn = write_generic_user(
                         LDIF, addc, props['addUsers'], props['parent'],
                         name="addUser", changetype="\nchangetype: add")
-                    entry_dn_list.append(dn)
+                    added_dns.append(dn)
                     addc -= 1
                 elif op == 'mod':
                     if modc == 0:
@@ -581,8 +731,7 @@ def dbgen_mod_load(ldif_file, props):
                     LDIF.write("changetype: delete\n")
                     LDIF.write(" \n")
                     delc -= 1
-                    if dn_val in entry_dn_list:
-                        entry_dn_list.remove(dn_val)
+                    removed_dns.add(dn_val)
                 elif op == 'modrdn':
                     if mrdnc == 0:
                         # no more modrdns to do
@@ -597,9 +746,8 @@ def dbgen_mod_load(ldif_file, props):
                     LDIF.write("\n")
                     mrdnc -= 1
                     # Revise the DN list: add the new DN, and remove the old DN
-                    entry_dn_list.append(new_dn_val)
-                    if dn_val in entry_dn_list:
-                        entry_dn_list.remove(dn_val)
+                    added_dns.append(new_dn_val)
+                    removed_dns.add(dn_val)
 
                 # Update the total count
                 total_ops -= 1
@@ -613,7 +761,7 @@ def dbgen_mod_load(ldif_file, props):
                     LDIF, addc, props['addUsers'], props['parent'],
                     name="addUser", changetype="\nchangetype: add")
                 addc -= 1
-                entry_dn_list.append(dn)
+                added_dns.append(dn)
 
             # Mods
             while modc != 0:
@@ -637,9 +785,8 @@ def dbgen_mod_load(ldif_file, props):
                 LDIF.write("\n")
                 mrdnc -= 1
                 # Revise the DN list: add the new DN, and remove the old DN
-                entry_dn_list.append(new_dn_val)
-                if dn_val in entry_dn_list:
-                    entry_dn_list.remove(dn_val)
+                added_dns.append(new_dn_val)
+                removed_dns.add(dn_val)
 
             # Deletes
             while delc != 0:
@@ -648,12 +795,18 @@ def dbgen_mod_load(ldif_file, props):
                 LDIF.write("changetype: delete\n")
                 LDIF.write(" \n")
                 delc -= 1
-                if dn_val in entry_dn_list:
-                    entry_dn_list.remove(dn_val)
+                removed_dns.add(dn_val)
 
         # Cleanup - delete all known entries
         if props['deleteUsers']:
-            for dn in entry_dn_list:
+            for user_idx in range(1, props['numUsers'] + 1):
+                dn = f"uid=user{get_index(user_idx, props['numUsers'])},{props['parent']}"
+                if dn in removed_dns:
+                    continue
+                LDIF.write(f"dn: {dn}\n")
+                LDIF.write("changetype: delete\n")
+                LDIF.write(" \n")
+            for dn in added_dns:
                 LDIF.write(f"dn: {dn}\n")
                 LDIF.write("changetype: delete\n")
                 LDIF.write(" \n")
@@ -13,9 +13,13 @@ import copy
 import json
 import re
 import gzip
+import shutil
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 from dateutil.parser import parse as dt_parse
 from glob import glob
-from lib389.utils import ensure_bytes
 from lib389._mapped_object_lint import DSLint
 from lib389.lint import (
     DSLOGNOTES0001,  # Unindexed search
@@ -34,12 +38,35 @@ MONTH_LOOKUP = {
     'Jun': 6,
     'Jul': 7,
     'Aug': 8,
-    'Oct': 9,
-    'Sep': 10,
+    'Sep': 9,
+    'Oct': 10,
     'Nov': 11,
     'Dec': 12,
 }
 
+# Rotated logs are renamed to <log>.<creation time>, e.g. access.20160515-104822
+ROTATION_TIME_FORMAT = '%Y%m%d-%H%M%S'
+# Size of the blocks read when reading a log backwards
+REVERSE_BLOCK_SIZE = 64 * 1024
+# Size of the blocks of text parsed at once by AccessLogStats
+PARSE_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Operation types of AccessLogStats.optype, UNKNOWN is used when the request
+# line of a result was not logged
+ACCESS_OP_TYPES = ['UNKNOWN', 'SRCH', 'MOD', 'ADD', 'DEL', 'MODRDN', 'BIND',
+                   'UNBIND', 'CMP', 'EXT', 'ABANDON']
+ACCESS_OP_LOOKUP = {optype: idx for idx, optype in enumerate(ACCESS_OP_TYPES)}
+
+# A single regex matches both the operation requests and results so a block of
+# lines is parsed with one finditer() call
+ACCESS_OP_REGEX = re.compile(
+    r'^\[(?P<timestamp>[^\]]*)\] conn=(?P<conn>\d+) op=(?P<op>-?\d+) (?:'
+    r'RESULT err=(?P<err>\d+) tag=\d+ nentries=(?P<nentries>\d+)'
+    r'(?: wtime=(?P<wtime>[0-9.]+) optime=(?P<optime>[0-9.]+))? etime=(?P<etime>[0-9.]+)'
+    r'|(?P<optype>SRCH|MODRDN|MOD|ADD|DEL|BIND|UNBIND|CMP|EXT|ABANDON)\b'
+    r'(?: base="[^"]*" scope=\d+ filter="(?P<filter>[^"]*)")?)',
+    re.MULTILINE)
+
 
 class DirsrvLog(DSLint):
     """Class of functions to working with the various Directory Server logs
@@ -52,6 +79,7 @@ class DirsrvLog(DSLint):
         self.log = self.dirsrv.log
         self.prog_timestamp = re.compile(r'\[(?P<day>\d*)\/(?P<month>\w*)\/(?P<year>\d*):(?P<hour>\d*):(?P<minute>\d*):(?P<second>\d*)(.(?P<nanosecond>\d*))+\s(?P<tz>[\+\-]\d*)')   # noqa
         self.prog_datetime = re.compile(r'^(?P<timestamp>\[.*\])')
+        self.prog_line_time = re.compile(r'\[(\d+)/(\w+)/(\d+):(\d+):(\d+):(\d+)')
         self.jsonFormat = False
 
     def _get_log_path(self):
@@ -59,79 +87,225 @@ class DirsrvLog(DSLint):
         raise Exception("Log type not defined.")
 
     def _get_all_log_paths(self):
-        """Return all the log paths"""
-        return glob("%s.*-*" % self._get_log_path()) + [self._get_log_path()]
+        """Return all the log paths, the rotated logs from the oldest to the
+        newest followed by the current log"""
+        return [path for ctime, path in self._get_log_rotations()]
+
+    def _get_log_rotations(self):
+        """Return the creation time and the path of all the logs, oldest first.
+        The creation time of the current log is not known and is None.
+        @return - a list of (datetime, path) tuples
+        """
+        lpath = self._get_log_path()
+        if lpath is None:
+            return []
+        rotations = []
+        for path in glob("%s.*-*" % lpath):
+            name = path[len(lpath) + 1:]
+            if name.endswith('.gz'):
+                name = name[:-len('.gz')]
+            try:
+                rotations.append((datetime.strptime(name, ROTATION_TIME_FORMAT), path))
+            except ValueError:
+                # Not a rotated log
+                continue
+        rotations.sort()
+        return rotations + [(None, lpath)]
+
+    def _get_log_paths_between(self, since=None, until=None):
+        """Return the paths of the logs that can contain lines logged in a time
+        window, using the rotated logs creation time.
+        @param since - a naive local datetime or None
+        @param until - a naive local datetime or None
+        @return - a list of paths, oldest first
+        """
+        paths = []
+        rotations = self._get_log_rotations()
+        for idx, (ctime, path) in enumerate(rotations):
+            if until is not None and ctime is not None and ctime > until:
+                # This log and the following ones were created after the window
+                break
+            if since is not None and idx + 1 < len(rotations):
+                end = rotations[idx + 1][0]
+                if end is not None and end <= since:
+                    # This log was rotated before the window
+                    continue
+            paths.append(path)
+        return paths
+
+    def _get_line_time(self, line):
+        """Return the time of a log line, without the timezone
+        @param line - a log line
+        @return - a naive local datetime, or None if the line has no timestamp
+        """
+        ts = self.prog_line_time.search(line, 0, 64)
+        if ts is None:
+            return None
+        day, month, year, hour, minute, second = ts.groups()
+        if month not in MONTH_LOOKUP:
+            return None
+        return datetime(int(year), MONTH_LOOKUP[month], int(day),
+                        int(hour), int(minute), int(second))
+
+    def _readlines_forward(self, path):
+        """Yield the lines of a log, uncompressing it if needed"""
+        if path.endswith('.gz'):
+            lf = gzip.open(path, 'rt')
+        else:
+            lf = open(path, 'r')
+        with lf:
+            yield from lf
+
+    def _readlines_reverse(self, path):
+        """Yield the lines of a log from the last to the first one"""
+        if path.endswith('.gz'):
+            # Compressed logs can't be read backwards, so they are uncompressed
+            # to a temporary file first
+            with gzip.open(path, 'rb') as gz, tempfile.TemporaryFile() as lf:
+                shutil.copyfileobj(gz, lf)
+                yield from self._readblocks_reverse(lf)
+        else:
+            with open(path, 'rb') as lf:
+                yield from self._readblocks_reverse(lf)
+
+    def _readblocks_reverse(self, lf):
+        """Yield the lines of a binary file object from the last to the first
+        one, reading it by blocks from its end"""
+        pos = lf.seek(0, 2)
+        partial = b''
+        eol = None
+        while pos > 0:
+            size = min(REVERSE_BLOCK_SIZE, pos)
+            pos -= size
+            lf.seek(pos)
+            block = lf.read(size) + partial
+            if eol is None:
+                # Only the last line of the file may not end with a newline
+                eol = '\n' if block.endswith(b'\n') else ''
+                if eol:
+                    block = block[:-1]
+            lines = block.split(b'\n')
+            # The first line may continue in the previous block
+            partial = lines.pop(0)
+            for line in reversed(lines):
+                yield line.decode() + eol
+                eol = '\n'
+        if eol is not None:
+            yield partial.decode() + eol
+
+    def iter_lines(self, archive=False, since=None, until=None, reverse=False):
+        """Iterate over the lines of the log without loading it in memory.
+        Lines without a timestamp are kept with the timestamped line they follow.
+
+        @param archive - also read the rotated and compressed logs, in time order
+        @param since - a datetime, skip the lines logged before it
+        @param until - a datetime, stop at the first line logged after it
+        @param reverse - read the newest lines first
+        @return - a generator of the log lines
+        """
+        # Logs are written in the server local time
+        if since is not None and since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+        if until is not None and until.tzinfo is not None:
+            until = until.astimezone().replace(tzinfo=None)
+        windowed = since is not None or until is not None
+
+        if archive:
+            paths = self._get_log_paths_between(since, until)
+        else:
+            lpath = self._get_log_path()
+            paths = [] if lpath is None else [lpath]
+        if reverse:
+            paths.reverse()
+
+        in_window = not windowed
+        for path in paths:
+            if reverse:
+                lines = self._readlines_reverse(path)
+            else:
+                lines = self._readlines_forward(path)
+            for line in lines:
+                if windowed:
+                    line_time = self._get_line_time(line)
+                    if line_time is not None:
+                        if reverse:
+                            if since is not None and line_time < since:
+                                return
+                            in_window = until is None or line_time <= until
+                        else:
+                            if until is not None and line_time > until:
+                                return
+                            in_window = since is None or line_time >= since
+                    if not in_window:
+                        continue
+                yield line
+
+    def iter_match(self, pattern, archive=False, since=None, until=None, reverse=False, limit=None):
+        """Iterate over the log lines matching a pattern without loading the
+        log in memory.  See iter_lines() for the other parameters.
+
+        @param pattern - a regex pattern
+        @param limit - stop after this many matching lines
+        @return - a generator of the matching lines
+        """
+        if limit is not None and limit <= 0:
+            return
+        count = 0
+        prog = re.compile(pattern)
+        for line in self.iter_lines(archive=archive, since=since, until=until, reverse=reverse):
+            if prog.match(line):
+                yield line
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
+    def match_last(self, pattern, count=1, archive=False, since=None):
+        """Return the last lines matching a pattern.  The logs are read from
+        their end so only the newest lines are read.
+
+        @param pattern - a regex pattern
+        @param count - the maximum number of lines to return
+        @param archive - also search the rotated and compressed logs
+        @param since - a datetime, do not search the lines logged before it
+        @return - the matching lines, oldest first
+        """
+        lines = list(self.iter_match(pattern, archive=archive, since=since, reverse=True, limit=count))
+        lines.reverse()
+        return lines
 
     def readlines_archive(self):
         """
         Returns an array of all the lines in all logs, included rotated logs
         and compressed logs. (gzip)
-        Will likely be very slow. Try using match instead.
+        Will likely be very slow. Try using iter_lines or match instead.
 
         @return - an array of all the lines in all logs
         """
-        lines = []
-        for log in self._get_all_log_paths():
-            # Open the log
-            if log.endswith(ensure_bytes('.gz')):
-                with gzip.open(log, 'r') as lf:
-                    lines += lf.readlines()
-            else:
-                with open(log, 'r') as lf:
-                    lines += lf.readlines()
-        return lines
+        return list(self.iter_lines(archive=True))
 
     def readlines(self):
         """Returns an array of all the lines in the log.
-        Will likely be very slow. Try using match instead.
+        Will likely be very slow. Try using iter_lines or match instead.
 
         @return - an array of all the lines in the log.
         """
-        lines = []
         self.lpath = self._get_log_path()
-        if self.lpath is not None:
-            # Open the log
-            with open(self.lpath, 'r') as lf:
-                lines = lf.readlines()
-        return lines
+        return list(self.iter_lines())
 
     def match_archive(self, pattern):
         """Search all the log files, including "zipped" logs
         @param pattern - a regex pattern
         @return - results of the pattern matching
         """
-        results = []
-        prog = re.compile(pattern)
-        for log in self._get_all_log_paths():
-            if log.endswith(ensure_bytes('.gz')):
-                with gzip.open(log, 'r') as lf:
-                    for line in lf:
-                        mres = prog.match(line)
-                        if mres:
-                            results.append(line)
-            else:
-                with open(log, 'r') as lf:
-                    for line in lf:
-                        mres = prog.match(line)
-                        if mres:
-                            results.append(line)
-        return results
+        return list(self.iter_match(pattern, archive=True))
 
     def match(self, pattern):
         """Search the current log file for the pattern
         @param pattern - a regex pattern
         @return - results of the pattern matching
         """
-        results = []
-        prog = re.compile(pattern)
         self.lpath = self._get_log_path()
-        if self.lpath is not None:
-            with open(self.lpath, 'r') as lf:
-                for line in lf:
-                    mres = prog.match(line)
-                    if mres:
-                        results.append(line)
-        return results
+        return list(self.iter_match(pattern))
 
     def parse_timestamp(self, ts):
         """Parse a logs timestamps and break it down into its individual parts
@@ -306,6 +480,290 @@ class DirsrvAccessLog(DirsrvLog):
         """
         return map(self.parse_line, lines)
 
+    def get_stats(self, archive=False, since=None, until=None, workers=1):
+        """Parse the operations of the log in columns, see AccessLogStats.
+        This is much faster than parse_lines() and is meant for large logs.
+
+        @param archive - also parse the rotated and compressed logs
+        @param since - a datetime, skip the logs rotated before it
+        @param until - a datetime, skip the logs created after it
+        @param workers - the number of processes parsing the logs concurrently
+        @return - an AccessLogStats object
+        """
+        if since is not None and since.tzinfo is not None:
+            since = since.astimezone().replace(tzinfo=None)
+        if until is not None and until.tzinfo is not None:
+            until = until.astimezone().replace(tzinfo=None)
+        if archive:
+            paths = self._get_log_paths_between(since, until)
+        else:
+            paths = [self._get_log_path()]
+        return AccessLogStats.parse_files(paths, workers=workers)
+
+
+class AccessLogStats(object):
+    """Operation statistics of access logs, stored in columns.
+
+    Every operation result is a row, and every column is a compact array:
+        time     - the result time, in seconds since the epoch
+        conn     - the connection number
+        op       - the operation number
+        optype   - the index of the operation type in ACCESS_OP_TYPES
+        err      - the result code
+        nentries - the number of returned entries
+        wtime    - the work queue wait time (nan in older logs)
+        optime   - the operation time (nan in older logs)
+        etime    - the elapsed time
+        filter   - the index of the search filter in filters, or -1
+    """
+    COLUMNS = [('time', 'd'), ('conn', 'Q'), ('op', 'q'), ('optype', 'B'),
+               ('err', 'l'), ('nentries', 'q'), ('wtime', 'd'), ('optime', 'd'),
+               ('etime', 'd'), ('filter', 'q')]
+
+    def __init__(self):
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array(typecode))
+        self.filters = []
+        # Requests still waiting for their result, (conn, op) -> (optype, filter)
+        self._pending = {}
+        # Results without a request, (conn, op) -> row
+        self._orphans = {}
+
+    def __len__(self):
+        return len(self.etime)
+
+    @classmethod
+    def parse_file(cls, path):
+        """Parse a log file, gzip compressed logs are supported
+        @param path - the log file path
+        @return - an AccessLogStats object
+        """
+        stats = cls()
+        filter_lookup = {}
+        ts_cache = {}
+        pending = stats._pending
+        nan = float('nan')
+
+        for block in cls._read_blocks(path):
+            for m in ACCESS_OP_REGEX.finditer(block):
+                (timestamp, conn, op, err, nentries, wtime, optime, etime,
+                 optype, search_filter) = m.groups()
+                key = (int(conn), int(op))
+                if optype is not None:
+                    if search_filter is None:
+                        filter_idx = -1
+                    else:
+                        filter_idx = filter_lookup.get(search_filter)
+                        if filter_idx is None:
+                            filter_idx = filter_lookup[search_filter] = len(stats.filters)
+                            stats.filters.append(search_filter)
+                    pending[key] = (ACCESS_OP_LOOKUP[optype], filter_idx)
+                    continue
+
+                request = pending.pop(key, None)
+                if request is None:
+                    # The request was logged in a previous log
+                    stats._orphans[key] = len(stats.etime)
+                    request = (0, -1)
+                # Timestamps only need to be converted once per second
+                ts_key = timestamp[:20] + timestamp[-5:]
+                second = ts_cache.get(ts_key)
+                if second is None:
+                    if len(ts_cache) > 100000:
+                        ts_cache.clear()
+                    second = ts_cache[ts_key] = cls._parse_epoch(timestamp)
+                if timestamp[20:21] == '.':
+                    second += int(timestamp[21:30]) / 1000000000
+
+                stats.time.append(second)
+                stats.conn.append(key[0])
+                stats.op.append(key[1])
+                stats.optype.append(request[0])
+                stats.filter.append(request[1])
+                stats.err.append(int(err))
+                stats.nentries.append(int(nentries))
+                stats.wtime.append(nan if wtime is None else float(wtime))
+                stats.optime.append(nan if optime is None else float(optime))
+                stats.etime.append(float(etime))
+        return stats
+
+    @classmethod
+    def parse_files(cls, paths, workers=1):
+        """Parse several log files and merge their statistics
+        @param paths - the log file paths, oldest first
+        @param workers - the number of processes parsing the files concurrently
+        @return - an AccessLogStats object
+        """
+        if workers > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return cls.merge(executor.map(cls.parse_file, paths))
+        return cls.merge(map(cls.parse_file, paths))
+
+    @classmethod
+    def merge(cls, parts):
+        """Merge the statistics of consecutive logs.  The results of requests
+        logged in a previous log get their operation type and filter back.
+        @param parts - an iterable of AccessLogStats objects, oldest first
+        @return - an AccessLogStats object
+        """
+        stats = cls()
+        filter_lookup = {}
+        for part in parts:
+            offset = len(stats)
+            # Renumber the filters of the part
+            filter_map = array('q')
+            for search_filter in part.filters:
+                filter_idx = filter_lookup.get(search_filter)
+                if filter_idx is None:
+                    filter_idx = filter_lookup[search_filter] = len(stats.filters)
+                    stats.filters.append(search_filter)
+                filter_map.append(filter_idx)
+            for name, typecode in cls.COLUMNS:
+                if name == 'filter':
+                    stats.filter.extend(array('q', [-1 if idx < 0 else filter_map[idx] for idx in part.filter]))
+                else:
+                    getattr(stats, name).extend(getattr(part, name))
+
+            for key, row in part._orphans.items():
+                request = stats._pending.pop(key, None)
+                if request is None:
+                    stats._orphans[key] = offset + row
+                else:
+                    stats.optype[offset + row] = request[0]
+                    stats.filter[offset + row] = request[1]
+            for key, (optype, filter_idx) in part._pending.items():
+                stats._pending[key] = (optype, -1 if filter_idx < 0 else filter_map[filter_idx])
+        return stats
+
+    @staticmethod
+    def _read_blocks(path):
+        """Yield blocks of complete lines of a log"""
+        if path.endswith('.gz'):
+            lf = gzip.open(path, 'rt')
+        else:
+            lf = open(path, 'r')
+        with lf:
+            partial = ''
+            while True:
+                block = lf.read(PARSE_BLOCK_SIZE)
+                if not block:
+                    break
+                block = partial + block
+                end = block.rfind('\n') + 1
+                partial = block[end:]
+                yield block[:end]
+            if partial:
+                yield partial
+
+    @staticmethod
+    def _parse_epoch(timestamp):
+        """Convert an access log timestamp to seconds since the epoch, without
+        the sub-second part
+        @param timestamp - e.g. 27/Apr/2016:12:49:49.726093186 +1000
+        @return - a float
+        """
+        day, month, rest = timestamp.split('/', 2)
+        year, hour, minute, second = rest[:19].split(':')
+        tz = timestamp[-5:]
+        offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[3:5]))
+        if tz[0] == '-':
+            offset = -offset
+        return datetime(int(year), MONTH_LOOKUP[month], int(day), int(hour), int(minute),
+                        int(second[:2]), tzinfo=timezone(offset)).timestamp()
+
+    def _rows(self, optype=None):
+        """Return the rows of an operation type, or all the rows"""
+        if optype is None:
+            return range(len(self))
+        optype_idx = ACCESS_OP_LOOKUP[optype]
+        return [row for row, value in enumerate(self.optype) if value == optype_idx]
+
+    def percentiles(self, column='etime', percents=(50, 90, 99, 99.9), optype=None):
+        """Return the percentiles of a timing column (nearest rank)
+        @param column - etime, wtime or optime
+        @param percents - the percentiles to compute
+        @param optype - only use the operations of this type, e.g. SRCH
+        @return - a dict of percent to value, values are None without operations
+        """
+        values = getattr(self, column)
+        if optype is None:
+            data = sorted(value for value in values if value == value)
+        else:
+            data = sorted(values[row] for row in self._rows(optype) if values[row] == values[row])
+        result = {}
+        for percent in percents:
+            if len(data) == 0:
+                result[percent] = None
+            else:
+                rank = max(int(-(-percent * len(data) // 100)), 1)
+                result[percent] = data[min(rank, len(data)) - 1]
+        return result
+
+    def optype_counts(self):
+        """Return the number of operations of each type
+        @return - a dict of operation type to count
+        """
+        counts = {}
+        for optype_idx in self.optype:
+            optype = ACCESS_OP_TYPES[optype_idx]
+            counts[optype] = counts.get(optype, 0) + 1
+        return counts
+
+    def top_filters(self, count=10, column='etime', sort_by='max'):
+        """Return the slowest search filters
+        @param count - the number of filters to return
+        @param column - the timing column, etime, wtime or optime
+        @param sort_by - max, avg, total or count
+        @return - a list of dicts with the filter, count, total, avg and max
+        """
+        values = getattr(self, column)
+        groups = {}
+        for row, filter_idx in enumerate(self.filter):
+            if filter_idx < 0:
+                continue
+            value = values[row]
+            if value != value:
+                continue
+            group = groups.get(filter_idx)
+            if group is None:
+                groups[filter_idx] = [1, value, value]
+            else:
+                group[0] += 1
+                group[1] += value
+                if value > group[2]:
+                    group[2] = value
+        result = [{'filter': self.filters[filter_idx], 'count': nb, 'total': total,
+                   'avg': total / nb, 'max': maximum}
+                  for filter_idx, (nb, total, maximum) in groups.items()]
+        result.sort(key=lambda group: group[sort_by], reverse=True)
+        return result[:count]
+
+    def connections(self, count=None, sort_by='ops'):
+        """Return a rollup of the operations per connection
+        @param count - the number of connections to return, or all of them
+        @param sort_by - ops, etime, max_etime, errors or nentries
+        @return - a list of dicts with the conn, ops, errors, nentries,
+                  etime (total) and max_etime, sorted in descending order
+        """
+        groups = {}
+        for row, conn in enumerate(self.conn):
+            etime = self.etime[row]
+            group = groups.get(conn)
+            if group is None:
+                group = groups[conn] = {'conn': conn, 'ops': 0, 'errors': 0, 'nentries': 0,
+                                        'etime': 0.0, 'max_etime': 0.0}
+            group['ops'] += 1
+            if self.err[row] != 0:
+                group['errors'] += 1
+            group['nentries'] += self.nentries[row]
+            group['etime'] += etime
+            if etime > group['max_etime']:
+                group['max_etime'] = etime
+        result = sorted(groups.values(), key=lambda group: group[sort_by], reverse=True)
+        if count is not None:
+            result = result[:count]
+        return result
+
 
 class DirsrvErrorLog(DirsrvLog):
     """Directory Server Error log class"""
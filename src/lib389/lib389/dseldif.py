@@ -12,9 +12,11 @@ import os
 import base64
 import time
 import fnmatch
+import tempfile
+from contextlib import contextmanager
 from struct import pack, unpack
 from datetime import timedelta
-from stat import ST_MODE
+from stat import ST_MODE, S_IMODE
 # from lib389.utils import print_nice_time
 from lib389.paths import Paths
 from lib389._mapped_object_lint import DSLint
@@ -27,16 +29,60 @@ from lib389.lint import (
 )
 
 
+class DSEldifEntry(object):
+    """An entry of a dse.ldif file
+
+    The lines keep their original text (folding included) next to their
+    unfolded value, so that unmodified lines are written back as they were.
+
+    :param lines: a list of [text, unfolded line] pairs, starting with the dn
+                  line (unless this is the header of the file)
+    :type lines: list
+    """
+
+    __slots__ = ('dn', 'lines')
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.dn = None
+        if lines and lines[0][1].startswith('dn:'):
+            self.dn = lines[0][1][3:].strip()
+
+    def key(self):
+        return self.dn.lower() if self.dn is not None else None
+
+    def attr_lines(self, attr):
+        """Return the indexes of the lines of an attribute"""
+
+        prefix = "{}:".format(attr)
+        indexes = []
+        for i, (_, line) in enumerate(self.lines):
+            if line == "\n":
+                # We are at the end of the entry
+                break
+            if line.startswith(prefix):
+                indexes.append(i)
+        return indexes
+
+
 class DSEldif(DSLint):
     """A class for working with dse.ldif file
 
+    The entries are kept in file order in a dict used as an ordered set,
+    so they can be removed in constant time, and are indexed by DN.  Each
+    change is written to the file at once, unless it is done in a transaction() that writes all the changes
+    when it ends.  The file is replaced atomically.
+
     :param instance: An instance
     :type instance: lib389.DirSrv
     """
 
     def __init__(self, instance, serverid=None, path=None):
         self._instance = instance
-        self._contents = []
+        self._entries = {}
+        self._index = {}
+        self._transaction = 0
+        self._dirty = False
 
         if path:
             self.path = path
@@ -50,18 +96,44 @@ class DSEldif(DSLint):
             ds_paths = Paths(self._instance.serverid, self._instance)
             self.path = os.path.join(ds_paths.config_dir, 'dse.ldif')
 
+        self._load()
+
+    @staticmethod
+    def _parse(lines):
+        """Split ldif lines in entries, unfolding the continuation lines"""
+
+        entries = []
+        entry_lines = []
+        for line in lines:
+            if line.startswith(' ') and entry_lines:
+                entry_lines[-1][0] += line
+                entry_lines[-1][1] = entry_lines[-1][1][:-1] + line[1:]
+                continue
+            if line.startswith('dn:') and entry_lines:
+                entries.append(DSEldifEntry(entry_lines))
+                entry_lines = []
+            entry_lines.append([line, line])
+        if entry_lines:
+            entries.append(DSEldifEntry(entry_lines))
+        return entries
+
+    def _load(self):
         with open(self.path, 'r') as file_dse:
-            processed_line = ""
-            for line in file_dse.readlines():
-                if not line.startswith(' '):
-                    if processed_line:
-                        self._contents.append(processed_line)
-                    if line.startswith('dn:'):
-                        processed_line = line.lower()
-                    else:
-                        processed_line = line
-                else:
-                    processed_line = processed_line[:-1] + line[1:]
+            self._entries = dict.fromkeys(self._parse(file_dse))
+        self._reindex()
+
+    def _reindex(self):
+        self._index = {entry.key(): entry for entry in self._entries if entry.dn is not None}
+
+    @property
+    def _contents(self):
+        """The unfolded lines of the file (with lower case dn lines)"""
+
+        contents = []
+        for entry in self._entries:
+            for _, line in entry.lines:
+                contents.append(line.lower() if line.startswith('dn:') else line)
+        return contents
 
     @classmethod
     def lint_uid(cls):
@@ -90,46 +162,121 @@ class DSEldif(DSLint):
                 report['check'] = f'dseldif:nsstate'
                 yield report
 
+    @contextmanager
+    def transaction(self):
+        """Group changes so the dse.ldif is written once, when the outermost
+        transaction ends.  If it ends with an exception, the changes are
+        dropped and the entries are read again from the file.
+        """
+
+        self._transaction += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction -= 1
+            if self._transaction == 0:
+                self._dirty = False
+                self._load()
+            raise
+        self._transaction -= 1
+        if self._transaction == 0 and self._dirty:
+            self._dirty = False
+            self._write()
+
     def _update(self):
         """Update the dse.ldif with a new contents"""
 
-        with open(self.path, "w") as file_dse:
-            file_dse.write("".join(self._contents))
+        if self._transaction:
+            self._dirty = True
+        else:
+            self._write()
+
+    def _write(self):
+        """Replace the dse.ldif with a synced temporary file, so the file is
+        never seen partially written
+        """
+
+        contents = "".join(raw for entry in self._entries for raw, _ in entry.lines)
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        try:
+            (fd, tmp_path) = tempfile.mkstemp(prefix='.dse.ldif.', dir=dirname)
+        except PermissionError:
+            # We can not create files next to it, so lets update it in place
+            with open(self.path, "w") as file_dse:
+                file_dse.write(contents)
+            return
+        try:
+            with os.fdopen(fd, "w") as file_dse:
+                file_dse.write(contents)
+                file_dse.flush()
+                os.fsync(file_dse.fileno())
+            if os.path.exists(self.path):
+                st = os.stat(self.path)
+                os.chmod(tmp_path, S_IMODE(st[ST_MODE]))
+                try:
+                    os.chown(tmp_path, st.st_uid, st.st_gid)
+                except PermissionError:
+                    pass
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        dir_fd = os.open(dirname, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    @staticmethod
+    def _refold(text, line):
+        """Fold an unfolded line at the width its original text was folded"""
+
+        folds = text.split('\n')[:-1]
+        if len(folds) < 2:
+            return line
+        width = len(folds[0])
+        value = line[:-1]
+        folded = [value[:width]]
+        value = value[width:]
+        while value:
+            folded.append(' ' + value[:width - 1])
+            value = value[width - 1:]
+        return '\n'.join(folded) + '\n'
 
     def globalSubstitute(self, strfrom, strto):
-        for i in range(0, len(self._contents)-1):
-            self._contents[i] = self._contents[i].replace(strfrom, strto)
+        for entry in self._entries:
+            for line in entry.lines:
+                if strfrom in line[1]:
+                    line[1] = line[1].replace(strfrom, strto)
+                    line[0] = self._refold(line[0], line[1])
+            if entry.dn is not None:
+                entry.dn = entry.lines[0][1][3:].strip()
+        self._reindex()
         self._update()
 
+    def _get_entry(self, entry_dn):
+        try:
+            return self._index[entry_dn.lower()]
+        except KeyError:
+            raise ValueError("Entry {} wasn't found".format(entry_dn.lower()))
+
     def _find_attr(self, entry_dn, attr):
         """Find all attribute values and indexes under a given entry
 
-        Returns entry dn index and attribute data dict:
-        relative attribute indexes and the attribute value
+        Returns the entry and attribute data dict:
+        the entry line indexes and the attribute value
         """
 
-        entry_dn_i = self._contents.index("dn: {}\n".format(entry_dn.lower()))
+        entry = self._get_entry(entry_dn)
         attr_data = {}
-
-        # Find where the entry ends
-        try:
-            dn_end_i = self._contents[entry_dn_i:].index("\n")
-        except ValueError:
-            # We are in the end of the list
-            dn_end_i = len(self._contents)
-
-        entry_slice = self._contents[entry_dn_i:entry_dn_i + dn_end_i]
-
-        # Find the attribute
-        for line in entry_slice:
-            if line.startswith("{}:".format(attr)):
-                attr_value = line.split(" ", 1)[1][:-1]
-                attr_data.update({entry_slice.index(line): attr_value})
+        for attr_i in entry.attr_lines(attr):
+            attr_data[attr_i] = entry.lines[attr_i][1].split(" ", 1)[1][:-1]
 
         if not attr_data:
             raise ValueError("Attribute {} wasn't found under dn: {}".format(attr, entry_dn.lower()))
 
-        return entry_dn_i, attr_data
+        return entry, attr_data
 
     def get(self, entry_dn, attr, single=False):
         """Return attribute values under a given entry
@@ -152,17 +299,50 @@ class DSEldif(DSLint):
             return vals[0] if len(vals) > 0 else None
         return vals
 
+    def get_entries(self):
+        """Return the entries of the file
+
+        :returns: A list of (dn, attributes) tuples, the attributes are a dict
+                  of the attribute names and of their lists of bytes values
+        """
+
+        entries = []
+        for entry in self._entries:
+            if entry.dn is None:
+                continue
+            dn = entry.dn
+            attrs = {}
+            for _, line in entry.lines[1:]:
+                if line == "\n":
+                    # We are at the end of the entry
+                    break
+                if line.startswith('#') or ':' not in line:
+                    continue
+                (attr, value) = line.rstrip('\n').split(':', 1)
+                if value.startswith(':'):
+                    value = base64.b64decode(value[1:].strip())
+                else:
+                    value = value.lstrip(' ').encode()
+                attrs.setdefault(attr, []).append(value)
+            if dn.startswith(':'):
+                dn = base64.b64decode(dn[1:].strip()).decode()
+            entries.append((dn, attrs))
+        return entries
+
     def get_indexes(self, backend):
         """Return a list of backend indexes
 
         :param backend: a backend to get the indexes of
         """
         indexes = []
-        for entry in self._contents:
-            if fnmatch.fnmatch(entry, "*,cn=index,cn={}*".format(backend.lower())):
-                start = entry.find("cn=")
-                end = entry.find(",")
-                indexes.append(entry[start+len('cn='):end])
+        for entry in self._entries:
+            if entry.dn is None:
+                continue
+            dn = entry.key()
+            if fnmatch.fnmatch(dn, "*,cn=index,cn={}*".format(backend.lower())):
+                start = dn.find("cn=")
+                end = dn.find(",")
+                indexes.append(dn[start+len('cn='):end])
 
         return indexes
 
@@ -174,9 +354,14 @@ class DSEldif(DSLint):
         :type value: str list
         """
 
-        if self._contents[-1] != "\n":
-            self._contents.append("\n")
-        self._contents.extend(entry)
+        if self._entries:
+            last = next(reversed(self._entries))
+            if last.lines[-1][1] != "\n":
+                last.lines.append(["\n", "\n"])
+        for new_entry in self._parse(entry):
+            self._entries[new_entry] = None
+            if new_entry.dn is not None:
+                self._index[new_entry.key()] = new_entry
         self._update()
 
 
@@ -191,8 +376,9 @@ class DSEldif(DSLint):
         :type value: str
         """
 
-        entry_dn_i = self._contents.index("dn: {}\n".format(entry_dn.lower()))
-        self._contents.insert(entry_dn_i+1, "{}: {}\n".format(attr, value))
+        entry = self._get_entry(entry_dn)
+        line = "{}: {}\n".format(attr, value)
+        entry.lines.insert(1, [line, line])
         self._update()
 
     def rename(self, entry_dn, new_dn, del_old_rdn=True):
@@ -214,15 +400,20 @@ class DSEldif(DSLint):
         new_rdn_attr = new_rdn.split('=')[0]
         new_rdn_val = new_rdn.split('=')[1]
 
-        # Handle the rdn attribute
-        if del_old_rdn:
-           self.delete(entry_dn, rdn_attr)
-        self.add(entry_dn, new_rdn_attr, new_rdn_val)
-
-        # Rename the entry
-        entry_dn_i = self._contents.index("dn: {}\n".format(entry_dn.lower()))
-        self._contents[entry_dn_i] = f"dn: {new_dn}\n"
-        self._update()
+        with self.transaction():
+            # Handle the rdn attribute
+            if del_old_rdn:
+                self.delete(entry_dn, rdn_attr)
+            self.add(entry_dn, new_rdn_attr, new_rdn_val)
+
+            # Rename the entry
+            entry = self._get_entry(entry_dn)
+            del self._index[entry.key()]
+            line = f"dn: {new_dn}\n"
+            entry.lines[0] = [line, line]
+            entry.dn = new_dn
+            self._index[entry.key()] = entry
+            self._update()
 
     def delete_dn(self, entry_dn):
         """Delete the whole entry by DN
@@ -231,16 +422,9 @@ class DSEldif(DSLint):
         :type entry_dn: str
         """
 
-        entry_dn_i = self._contents.index("dn: {}\n".format(entry_dn.lower()))
-
-        # Find where the entry ends
-        try:
-            dn_end_i = self._contents[entry_dn_i:].index("\n")
-        except ValueError:
-            # We are in the end of the list
-            dn_end_i = len(self._contents)
-
-        del self._contents[entry_dn_i:entry_dn_i+dn_end_i+1]
+        entry = self._get_entry(entry_dn)
+        del self._entries[entry]
+        del self._index[entry.key()]
         self._update()
 
     def delete(self, entry_dn, attr, value=None):
@@ -254,15 +438,11 @@ class DSEldif(DSLint):
         :type value: str
         """
 
-        entry_dn_i, attr_data = self._find_attr(entry_dn, attr)
+        entry, attr_data = self._find_attr(entry_dn, attr)
 
-        if value is not None:
-            for attr_i, attr_value in attr_data.items():
-                if attr_value == value:
-                    del self._contents[entry_dn_i + attr_i]
-        else:
-            for attr_i in sorted(attr_data.keys(), reverse=True):
-                del self._contents[entry_dn_i + attr_i]
+        for attr_i in sorted(attr_data.keys(), reverse=True):
+            if value is None or attr_data[attr_i] == value:
+                del entry.lines[attr_i]
         self._update()
 
     def replace(self, entry_dn, attr, value):
@@ -276,12 +456,12 @@ class DSEldif(DSLint):
         :type value: str
         """
 
-        try:
-            self.delete(entry_dn, attr)
-        except ValueError as e:
-            self._instance.log.debug("During replace operation: {}".format(e))
-        self.add(entry_dn, attr, value)
-        self._update()
+        with self.transaction():
+            try:
+                self.delete(entry_dn, attr)
+            except ValueError as e:
+                self._instance.log.debug("During replace operation: {}".format(e))
+            self.add(entry_dn, attr, value)
 
     # Read NsState helper functions
     def _flipend(self, end):
@@ -432,9 +612,10 @@ class DSEldif(DSLint):
         newNsState = newNsState.decode('utf-8')
         self._instance.log.debug(f'newNsState is {newNsState}')
         # Lets replace the value.
-        (entry_dn_i, attr_data) = self._find_attr(nsState['dn'], 'nsState')
+        (entry, attr_data) = self._find_attr(nsState['dn'], 'nsState')
         attr_i = next(iter(attr_data))
-        self._contents[entry_dn_i + attr_i] = f"nsState:: {newNsState}"
+        line = f"nsState:: {newNsState}\n"
+        entry.lines[attr_i] = [line, line]
         self._update()
 
 
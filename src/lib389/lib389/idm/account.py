@@ -9,10 +9,13 @@
 
 import os
 import time
+import logging
 import subprocess
 from enum import Enum
 import ldap
-from lib389._mapped_object import DSLdapObject, DSLdapObjects, _gen_or, _gen_filter, _term_gen
+from ldap.controls import SimplePagedResultsControl
+from lib389._entry import Entry
+from lib389._mapped_object import DSLdapObject, DSLdapObjects, _gen_and, _gen_or, _gen_filter, _term_gen
 from lib389._constants import SER_ROOT_DN, SER_ROOT_PW
 from lib389.utils import gentime_to_posix_time, gentime_to_datetime
 from lib389.plugins import AccountPolicyPlugin, AccountPolicyConfig, AccountPolicyEntry
@@ -87,102 +90,7 @@ class Account(DSLdapObject):
                   {"status": status, "params": activity_data, "calc_time": epoch_time}
         """
 
-        inst = self._instance
-
-        # Fetch Account Policy data if its enabled
-        plugin = AccountPolicyPlugin(inst)
-        try:
-            config_dn = plugin.get_attr_val_utf8("nsslapd-pluginarg0")
-        except IndexError:
-            self._log.debug("The bound user doesn't have rights to access Account Policy settings. Not checking.")
-        state_attr = ""
-        alt_state_attr = ""
-        limit = ""
-        spec_attr = ""
-        limit_attr = ""
-        process_account_policy = False
-        mapping_trees = MappingTrees(inst)
-        try:
-            root_suffix = mapping_trees.get_root_suffix_by_entry(self.dn)
-            if str.lower(root_suffix) == str.lower(self.dn):
-                raise ValueError("Root suffix can't be locked or unlocked via dsidm functionality.")
-        except ldap.NO_SUCH_OBJECT:
-            self._log.debug("Can't acquire root suffix from user DN. Probably - insufficient rights. Skipping this step.")
-        try:
-            process_account_policy = plugin.status()
-        except IndexError:
-            pass
-
-        if process_account_policy and config_dn is not None:
-            config = AccountPolicyConfig(inst, config_dn)
-            config_settings = config.get_attrs_vals_utf8(["stateattrname", "altstateattrname",
-                                                          "specattrname", "limitattrname"])
-            state_attr = self._dict_get_with_ignore_indexerror(config_settings, "stateattrname")
-            alt_state_attr = self._dict_get_with_ignore_indexerror(config_settings, "altstateattrname")
-            spec_attr = self._dict_get_with_ignore_indexerror(config_settings, "specattrname")
-            limit_attr = self._dict_get_with_ignore_indexerror(config_settings, "limitattrname")
-
-            mapping_trees = MappingTrees(inst)
-            root_suffix = mapping_trees.get_root_suffix_by_entry(self.dn)
-            cos_entries = CosTemplates(inst, root_suffix)
-            accpol_entry_dn = ""
-            for cos in cos_entries.list():
-                if cos.present(spec_attr):
-                    accpol_entry_dn = cos.get_attr_val_utf8_l(spec_attr)
-            if accpol_entry_dn:
-                accpol_entry = AccountPolicyEntry(inst, accpol_entry_dn)
-            else:
-                accpol_entry = config
-            limit = accpol_entry.get_attr_val_utf8_l(limit_attr)
-
-        # Fetch account data
-        account_data = self.get_attrs_vals_utf8(["createTimestamp", "modifyTimeStamp",
-                                                 "nsAccountLock", state_attr])
-
-        last_login_time = self._dict_get_with_ignore_indexerror(account_data, state_attr)
-        if not last_login_time:
-            last_login_time = self._dict_get_with_ignore_indexerror(account_data, alt_state_attr)
-
-        create_time = self._dict_get_with_ignore_indexerror(account_data, "createTimestamp")
-        modify_time = self._dict_get_with_ignore_indexerror(account_data, "modifyTimeStamp")
-
-        acct_roles = self.get_attr_vals_utf8_l("nsRole")
-        mapping_trees = MappingTrees(inst)
-        root_suffix = ""
-        try:
-            root_suffix = mapping_trees.get_root_suffix_by_entry(self.dn)
-        except ldap.NO_SUCH_OBJECT:
-            self._log.debug("The bound user doesn't have rights to access disabled roles settings. Not checking.")
-        if root_suffix:
-            roles = Roles(inst, root_suffix)
-            try:
-                disabled_roles = roles.get_disabled_roles()
-
-                # Locked indirectly through a role
-                locked_indirectly_role_dn = ""
-                for role in acct_roles:
-                    if str.lower(role) in [str.lower(role.dn) for role in disabled_roles.keys()]:
-                        locked_indirectly_role_dn = role
-                if locked_indirectly_role_dn:
-                    return self._format_status_message(AccountState.INDIRECTLY_LOCKED, create_time, modify_time,
-                                                       last_login_time, limit, locked_indirectly_role_dn)
-            except ldap.NO_SUCH_OBJECT:
-                pass
-
-        # Locked directly
-        if self._dict_get_with_ignore_indexerror(account_data, "nsAccountLock") == "true":
-            return self._format_status_message(AccountState.DIRECTLY_LOCKED,
-                                               create_time, modify_time, last_login_time, limit)
-
-        # Locked indirectly through Account Policy plugin
-        if process_account_policy and last_login_time:
-            # Now check the Account Policy Plugin inactivity limits
-            remaining_time = float(limit) - (time.mktime(time.gmtime()) - gentime_to_posix_time(last_login_time))
-            if remaining_time <= 0:
-                return self._format_status_message(AccountState.INACTIVITY_LIMIT_EXCEEDED,
-                                                   create_time, modify_time, last_login_time, limit)
-        # All checks are passed - we are active
-        return self._format_status_message(AccountState.ACTIVATED, create_time, modify_time, last_login_time, limit)
+        return AccountStatusEvaluator(self._instance).status(self)
 
     def ensure_lock(self):
         """Ensure nsAccountLock is set to 'true'"""
@@ -380,6 +288,204 @@ class Accounts(DSLdapObjects):
         )
 
 
+class AccountStatusEvaluator(object):
+    """Compute the status of accounts (see Account.status()) loading the
+    Account Policy plugin configuration, the mapping trees, and the CoS
+    templates and disabled roles of each suffix only once.
+
+    :param instance: An instance
+    :type instance: lib389.DirSrv
+    """
+
+    def __init__(self, instance):
+        self._instance = instance
+        self._log = logging.getLogger(type(self).__name__)
+        self._contexts = {}
+        self.state_attr = ""
+        self.alt_state_attr = ""
+        self.spec_attr = ""
+        self.limit_attr = ""
+        self._config = None
+
+        # Fetch Account Policy data if its enabled
+        plugin = AccountPolicyPlugin(instance)
+        config_dn = None
+        try:
+            config_dn = plugin.get_attr_val_utf8("nsslapd-pluginarg0")
+        except IndexError:
+            self._log.debug("The bound user doesn't have rights to access Account Policy settings. Not checking.")
+        self.process_account_policy = False
+        try:
+            self.process_account_policy = plugin.status()
+        except IndexError:
+            pass
+        if self.process_account_policy and config_dn is not None:
+            self._config = AccountPolicyConfig(instance, config_dn)
+            config_settings = self._config.get_attrs_vals_utf8(["stateattrname", "altstateattrname",
+                                                                "specattrname", "limitattrname"])
+            self.state_attr = self._first_value(config_settings, "stateattrname")
+            self.alt_state_attr = self._first_value(config_settings, "altstateattrname")
+            self.spec_attr = self._first_value(config_settings, "specattrname")
+            self.limit_attr = self._first_value(config_settings, "limitattrname")
+
+        # The root suffixes, the longest first
+        self._suffixes = sorted([mt.rdn for mt in MappingTrees(instance).list()], key=len, reverse=True)
+
+        # The attributes needed to compute the status of an account
+        self.attrlist = ["createTimestamp", "modifyTimeStamp", "nsAccountLock", "nsRole"]
+        for attr in (self.state_attr, self.alt_state_attr):
+            if attr and attr.lower() not in [a.lower() for a in self.attrlist]:
+                self.attrlist.append(attr)
+
+    def _first_value(self, values, attr):
+        for key, vals in values.items():
+            if key.lower() == attr.lower():
+                return vals[0] if vals else ""
+        return ""
+
+    def get_root_suffix(self, dn):
+        """Get the root suffix to which the entry belongs
+        (see MappingTrees.get_root_suffix_by_entry())
+
+        :param dn: An entry DN
+        :type dn: str
+        :returns: str
+        :raises: ldap.NO_SUCH_OBJECT - if the entry doesn't belong to any suffix
+        """
+
+        dn_parts = ldap.dn.str2dn(dn)
+        while True:
+            compare_dn = ldap.dn.dn2str(dn_parts).lower()
+            for suffix in self._suffixes:
+                if compare_dn == suffix.lower():
+                    return suffix
+            if not dn_parts:
+                break
+            dn_parts.pop(0)
+        raise ldap.NO_SUCH_OBJECT(f"{dn} doesn't belong to any suffix")
+
+    def _get_context(self, root_suffix):
+        """Get the inactivity limit and the disabled roles of a suffix"""
+
+        key = root_suffix.lower()
+        if key in self._contexts:
+            return self._contexts[key]
+        limit = ""
+        if self._config is not None:
+            accpol_entry_dn = ""
+            if self.spec_attr and root_suffix:
+                for cos in CosTemplates(self._instance, root_suffix).list(prefetch=[self.spec_attr]):
+                    if cos.present(self.spec_attr):
+                        accpol_entry_dn = cos.get_attr_val_utf8_l(self.spec_attr)
+            if accpol_entry_dn:
+                accpol_entry = AccountPolicyEntry(self._instance, accpol_entry_dn)
+            else:
+                accpol_entry = self._config
+            limit = accpol_entry.get_attr_val_utf8_l(self.limit_attr)
+
+        disabled_roles = set()
+        if root_suffix:
+            try:
+                disabled_roles = set([role.dn.lower() for role in Roles(self._instance, root_suffix).get_disabled_roles()])
+            except ldap.NO_SUCH_OBJECT:
+                pass
+        self._contexts[key] = (limit, disabled_roles)
+        return self._contexts[key]
+
+    def status(self, account):
+        """Compute the status of an account, the account attributes are read
+        from the entry pinned with the attrlist attributes if any.
+
+        :param account: An account
+        :type account: Account
+        :returns: a dict in a format -
+                  {"status": status, "params": activity_data, "calc_time": epoch_time}
+        :raises: ValueError - if the account is a root suffix
+        """
+
+        root_suffix = ""
+        try:
+            root_suffix = self.get_root_suffix(account.dn)
+            if str.lower(root_suffix) == str.lower(account.dn):
+                raise ValueError("Root suffix can't be locked or unlocked via dsidm functionality.")
+        except ldap.NO_SUCH_OBJECT:
+            self._log.debug("Can't acquire root suffix from user DN. Probably - insufficient rights. Skipping this step.")
+        limit, disabled_roles = self._get_context(root_suffix)
+
+        # Fetch account data
+        account_data = account.get_attrs_vals_utf8(self.attrlist)
+        last_login_time = self._first_value(account_data, self.state_attr) if self.state_attr else ""
+        if not last_login_time and self.alt_state_attr:
+            last_login_time = self._first_value(account_data, self.alt_state_attr)
+        create_time = self._first_value(account_data, "createTimestamp")
+        modify_time = self._first_value(account_data, "modifyTimeStamp")
+
+        # Locked indirectly through a role
+        locked_indirectly_role_dn = ""
+        for values in [vals for key, vals in account_data.items() if key.lower() == "nsrole"]:
+            for role in values:
+                if role.lower() in disabled_roles:
+                    locked_indirectly_role_dn = role.lower()
+        if locked_indirectly_role_dn:
+            return account._format_status_message(AccountState.INDIRECTLY_LOCKED, create_time, modify_time,
+                                                  last_login_time, limit, locked_indirectly_role_dn)
+
+        # Locked directly
+        if self._first_value(account_data, "nsAccountLock") == "true":
+            return account._format_status_message(AccountState.DIRECTLY_LOCKED,
+                                                  create_time, modify_time, last_login_time, limit)
+
+        # Locked indirectly through Account Policy plugin
+        if self.process_account_policy and last_login_time and limit:
+            # Now check the Account Policy Plugin inactivity limits
+            remaining_time = float(limit) - (time.mktime(time.gmtime()) - gentime_to_posix_time(last_login_time))
+            if remaining_time <= 0:
+                return account._format_status_message(AccountState.INACTIVITY_LIMIT_EXCEEDED,
+                                                      create_time, modify_time, last_login_time, limit)
+        # All checks are passed - we are active
+        return account._format_status_message(AccountState.ACTIVATED, create_time, modify_time, last_login_time, limit)
+
+    def search(self, basedn, search_filter=None, scope=ldap.SCOPE_SUBTREE, page_size=500):
+        """Search the accounts with a paged search fetching all the attributes
+        needed to compute their status, and compute it.
+
+        :param basedn: The search base
+        :type basedn: str
+        :param search_filter: A filter the accounts must match
+        :type search_filter: str
+        :param scope: The search scope
+        :type scope: int
+        :param page_size: The number of entries returned per page
+        :type page_size: int
+        :returns: A generator of (Account, status) tuples
+        """
+
+        accounts = Accounts(self._instance, basedn)
+        if search_filter:
+            filterstr = _gen_and([accounts._get_objectclass_filter(), search_filter])
+        else:
+            filterstr = accounts._get_objectclass_filter()
+        req_pr_ctrl = SimplePagedResultsControl(True, size=page_size, cookie='')
+        while True:
+            try:
+                msgid = self._instance.search_ext(base=basedn, scope=scope, filterstr=filterstr,
+                                                  attrlist=self.attrlist, serverctrls=[req_pr_ctrl],
+                                                  escapehatch='i am sure')
+                rtype, rdata, rmsgid, rctrls = self._instance.result3(msgid, escapehatch='i am sure')
+            except ldap.NO_SUCH_OBJECT:
+                return
+            for r in rdata:
+                entry = Entry(r)
+                account = Account(self._instance, entry.dn)
+                account._pin_entry(entry, self.attrlist)
+                yield (account, self.status(account))
+            pctrls = [c for c in rctrls if c.controlType == SimplePagedResultsControl.controlType]
+            if pctrls and pctrls[0].cookie:
+                req_pr_ctrl.cookie = pctrls[0].cookie
+            else:
+                break
+
+
 class Anonymous(DSLdapObject):
     """A single instance of Anonymous bind
 
@@ -6,6 +6,7 @@
 # See LICENSE for details.
 # --- END COPYRIGHT BLOCK ---
 
+import heapq
 import ldap
 
 import sys
@@ -22,6 +23,12 @@ if MAJOR >= 3 or (MAJOR == 2 and MINOR >= 7):
     from ldap.controls.readentry import PostReadControl
 
 DEFAULT_INDEX_DN = "cn=default indexes,%s" % DN_CONFIG_LDBM
+# Default of nsslapd-idlistscanlimit
+DEFAULT_IDLISTSCANLIMIT = 2147483646
+# Index key prefix -> index type
+INDEX_KEY_TYPES = {'=': 'eq', '*': 'sub', '+': 'pres', '~': 'approx', ':': 'matchingrule'}
+# Upper bounds of the ID list length histogram buckets
+IDLIST_HISTOGRAM_BOUNDS = (1, 10, 100, 1000, 10000, 100000, 1000000)
 
 
 class Index(DSLdapObject):
@@ -179,6 +186,182 @@ class VLVIndexes(DSLdapObjects):
         self._basedn = basedn
 
 
+def dbscan_index_keys(lines):
+    """Parse the output of "dbscan -n -r" on an index file and yield the
+    (key, number of IDs) of each key, the number is None if the key reached
+    ALLIDS.
+
+    The key and the ID count are not separated when the key is 40
+    characters or more, so the count is taken from the ID list line.
+
+    :param lines: dbscan output lines
+    :type lines: iterable of str
+    :returns: A generator of (str, int) tuples
+    """
+    pending = None
+    for line in lines:
+        if line.startswith('\t'):
+            if pending is not None:
+                # dbscan prints each ID followed by a space: count them
+                # without splitting the line, it can have millions of IDs
+                count = line.count(' ')
+                yield (pending[:len(pending) - len(str(count))].rstrip(), count)
+                pending = None
+            continue
+        line = line.rstrip('\n')
+        if line.endswith('(allids)'):
+            pending = None
+            yield (line[:-len('(allids)')].rstrip(), None)
+        elif line.strip():
+            pending = line
+
+
+class IndexKeyStats(object):
+    """Key cardinality and ID list length distribution of an index
+
+    :param name: The index (attribute) name
+    :type name: str
+    :param scanlimit: The ID list scan limit (nsslapd-idlistscanlimit)
+    :type scanlimit: int
+    :param limits: The nsIndexIDListScanLimit values of the index
+    :type limits: list of str
+    :param top: The number of largest keys to report
+    :type top: int
+    """
+
+    def __init__(self, name, scanlimit=DEFAULT_IDLISTSCANLIMIT, limits=None, top=10):
+        self.name = name
+        self.scanlimit = scanlimit
+        self.limits = [self._parse_limit(limit) for limit in limits or []]
+        self.top = top
+        self.keys = 0
+        self.ids = 0
+        self.types = {}
+        self.histogram = [0] * (len(IDLIST_HISTOGRAM_BOUNDS) + 1)
+        self.allids = []
+        self.over_limit = []
+        self._largest = []
+
+    @staticmethod
+    def _parse_limit(value):
+        # nsIndexIDListScanLimit: limit=N [type=eq[,sub]] [flags=AND] [values=v1[,v2]]
+        limit = {'limit': None, 'type': None, 'flags': None, 'values': None}
+        for param in value.split():
+            (name, _, val) = param.partition('=')
+            if name.lower() == 'limit':
+                limit['limit'] = int(val)
+            elif name.lower() in ('type', 'values'):
+                limit[name.lower()] = [v.lower() for v in val.split(',')]
+            elif name.lower() == 'flags':
+                limit['flags'] = val
+        return limit
+
+    def key_limit(self, key):
+        """Return the ID list scan limit applying to an index key
+
+        :param key: The index key (like "=value")
+        :type key: str
+        :returns: int
+        """
+        ktype = INDEX_KEY_TYPES.get(key[:1])
+        for limit in self.limits:
+            if limit['type'] is not None and ktype not in limit['type']:
+                continue
+            if limit['values'] is not None and key[1:].lower() not in limit['values']:
+                continue
+            if limit['limit'] is not None and limit['flags'] is None:
+                return limit['limit']
+        return self.scanlimit
+
+    def add(self, key, count):
+        """Account an index key
+
+        :param key: The index key
+        :type key: str
+        :param count: The length of its ID list, None for ALLIDS
+        :type count: int
+        """
+        ktype = INDEX_KEY_TYPES.get(key[:1], 'other')
+        stats = self.types.setdefault(ktype, {'keys': 0, 'ids': 0, 'max': 0, 'over_limit': 0})
+        self.keys += 1
+        stats['keys'] += 1
+        if count is None:
+            self.allids.append(key)
+            stats['over_limit'] += 1
+            return
+        self.ids += count
+        stats['ids'] += count
+        stats['max'] = max(stats['max'], count)
+        bucket = 0
+        while bucket < len(IDLIST_HISTOGRAM_BOUNDS) and count > IDLIST_HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+        limit = self.key_limit(key)
+        if limit >= 0 and count > limit:
+            self.over_limit.append((key, count))
+            stats['over_limit'] += 1
+        if len(self._largest) < self.top:
+            heapq.heappush(self._largest, (count, key))
+        elif self.top > 0:
+            heapq.heappushpop(self._largest, (count, key))
+
+    def largest(self):
+        """Return the (key, count) of the keys with the longest ID lists"""
+        return [(key, count) for (count, key) in sorted(self._largest, reverse=True)]
+
+    def histogram_dict(self):
+        """Return the ID list length histogram as a {bucket: number of keys} dict"""
+        res = {}
+        low = 1
+        for (bound, nb) in zip(IDLIST_HISTOGRAM_BOUNDS, self.histogram):
+            res[str(bound) if bound == low else f"{low}-{bound}"] = nb
+            low = bound + 1
+        res[f">{IDLIST_HISTOGRAM_BOUNDS[-1]}"] = self.histogram[-1]
+        return res
+
+    def recommendations(self):
+        """Return the suggested changes of the index configuration"""
+        res = []
+        if self.allids:
+            res.append(f"Index {self.name}: {len(self.allids)} key(s) reached ALLIDS "
+                       f"({', '.join(self.allids[:5])}), reindex the attribute to rebuild "
+                       "their ID lists.")
+        for (ktype, stats) in sorted(self.types.items()):
+            if stats['over_limit'] == 0:
+                continue
+            if stats['over_limit'] == stats['keys']:
+                res.append(f"Index {self.name}: every {ktype} key has more IDs than the ID list "
+                           f"scan limit, searches can not use it: remove the {ktype} index type.")
+                continue
+            keys = [(key, count) for (key, count) in self.over_limit
+                    if INDEX_KEY_TYPES.get(key[:1], 'other') == ktype]
+            if not keys:
+                continue
+            values = ','.join(key[1:] for (key, _) in keys[:5])
+            maxcount = max(count for (_, count) in keys)
+            res.append(f"Index {self.name}: {len(keys)} {ktype} key(s) have more IDs than the ID "
+                       f"list scan limit, so searches on them are unindexed. Set "
+                       f"\"nsIndexIDListScanLimit: limit={maxcount} type={ktype} values={values}\" "
+                       "on the index if they are searched alone, or "
+                       f"\"nsIndexIDListScanLimit: limit=0 type={ktype} flags=AND values={values}\" "
+                       "if they are only used in AND filters with other indexed attributes.")
+        return res
+
+    def to_dict(self):
+        """Return the statistics as a dict"""
+        return {
+            'index': self.name,
+            'keys': self.keys,
+            'ids': self.ids,
+            'types': self.types,
+            'histogram': self.histogram_dict(),
+            'largest': [{'key': key, 'ids': count} for (key, count) in self.largest()],
+            'allids': self.allids,
+            'over_limit': [{'key': key, 'ids': count} for (key, count) in self.over_limit],
+            'recommendations': self.recommendations(),
+        }
+
+
 class IndexLegacy(object):
 
     def __init__(self, conn):
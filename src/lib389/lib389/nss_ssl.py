@@ -13,13 +13,18 @@ import copy
 import os
 import re
 import socket
+import sqlite3
 import time
 import shutil
 import logging
 import subprocess
 import uuid
 from datetime import datetime, timedelta
+from pathlib import Path
 from subprocess import check_output, run, PIPE
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.backends import default_backend
 from lib389.passwd import password_generate
 from lib389._mapped_object_lint import DSLint
 from lib389.lint import DSCERTLE0001, DSCERTLE0002
@@ -39,6 +44,22 @@ USER_ISSUER = 'CN={HOSTNAME},%s' % CERT_SUFFIX
 VALID = 24 # Months
 VALID_MIN = 61  # Days
 
+# Names used by certutil for the DN attributes unknown to RFC 4514
+NSS_DN_ATTRS = {
+    NameOID.EMAIL_ADDRESS: 'E',
+    NameOID.GIVEN_NAME: 'givenName',
+    NameOID.SURNAME: 'SN',
+    NameOID.SERIAL_NUMBER: 'serialNumber',
+    NameOID.TITLE: 'title',
+}
+# CKA_CLASS value of the certificate objects in the nssPublic table of cert9.db
+# (whose columns are named after the PKCS#11 attribute types: a0 is CKA_CLASS,
+# a3 is CKA_LABEL and a11 is CKA_VALUE)
+CKO_CERTIFICATE = b'\x00\x00\x00\x01'
+
+# Certificate inventories indexed by NSS database path
+_cert_inventory_cache = {}
+
 # My logger
 log = logging.getLogger(__name__)
 
@@ -81,24 +102,18 @@ class NssSsl(DSLint):
         """Check all the certificates in the db if they will expire within 30 days
         or have already expired.
         """
-        cert_list = []
-        all_certs = self._rsa_cert_list()
-        for cert in all_certs:
-            cert_list.append(self.get_cert_details(cert[0]))
-
-        for cert in cert_list:
-            cert_date = cert[3].split()[0]
-            diff_date = datetime.strptime(cert_date, '%Y-%m-%d').date() - datetime.today().date()
+        for cert in self.get_cert_inventory():
+            diff_date = cert['not_after'].date() - datetime.today().date()
             if diff_date < timedelta(days=0):
                 # Expired
                 report = copy.deepcopy(DSCERTLE0002)
-                report['detail'] = report['detail'].replace('CERT', cert[0])
+                report['detail'] = report['detail'].replace('CERT', cert['nickname'])
                 report['check'] = f'tls:certificate_expiration'
                 yield report
             elif diff_date < timedelta(days=30):
                 # Expiring within 30 days
                 report = copy.deepcopy(DSCERTLE0001)
-                report['detail'] = report['detail'].replace('CERT', cert[0])
+                report['detail'] = report['detail'].replace('CERT', cert['nickname'])
                 report['check'] = f'tls:certificate_expiration'
                 yield report
 
@@ -1086,6 +1101,132 @@ only.
 
         return ensure_str(result)
 
+    def _db_files_state(self):
+        # The NSS database files modification times and sizes
+        state = []
+        for f in self.db_files["sql_backend"] + self.db_files["dbm_backend"]:
+            try:
+                st = os.stat(f)
+            except OSError:
+                continue
+            state.append((f, st.st_mtime_ns, st.st_size))
+        return tuple(state)
+
+    def _sql_db_certs(self):
+        """Read all the certificates stored in the sql database (cert9.db)
+
+        :returns: A dict mapping the nicknames to their list of certificates
+        """
+        certs = {}
+        uri = Path(f'{self._certdb}/cert9.db').absolute().as_uri() + '?mode=ro'
+        try:
+            conn = sqlite3.connect(uri, uri=True)
+        except sqlite3.Error as e:
+            self.log.debug("Unable to open %s: %s", uri, e)
+            return certs
+        try:
+            for label, der in conn.execute('SELECT a3, a11 FROM nssPublic WHERE a0 = ?', (CKO_CERTIFICATE,)):
+                if not label or not der:
+                    continue
+                try:
+                    cert = x509.load_der_x509_certificate(bytes(der), default_backend())
+                except ValueError:
+                    continue
+                certs.setdefault(ensure_str(bytes(label)).rstrip('\0'), []).append(cert)
+        except sqlite3.Error as e:
+            self.log.debug("Unable to read the certificates from %s: %s", uri, e)
+            return {}
+        finally:
+            conn.close()
+        return certs
+
+    def _export_certs(self, nickname):
+        """Export the certificates of a nickname with certutil
+
+        :param nickname: name of certificate
+        :type nickname: str
+        :returns: The list of certificates
+        :raises: ValueError - if certutil fails
+        """
+        cmd = [
+            '/usr/bin/certutil',
+            '-L',
+            '-d', self._certdb,
+            '-n', nickname,
+            '-a',
+            '-f',
+            '%s/%s' % (self._certdb, PWD_TXT),
+        ]
+        self.log.debug("_export_certs cmd: %s", format_cmd_list(cmd))
+        try:
+            result = ensure_str(check_output(cmd, stderr=subprocess.STDOUT))
+        except subprocess.CalledProcessError as e:
+            raise ValueError(e.output.decode('utf-8').rstrip())
+        pems = re.findall(r'-----BEGIN CERTIFICATE-----.*?-----END CERTIFICATE-----', result, re.DOTALL)
+        return [x509.load_pem_x509_certificate(pem.encode(), default_backend()) for pem in pems]
+
+    def _nss_dn(self, name):
+        # Format a DN the way certutil displays it
+        try:
+            return name.rfc4514_string(attr_name_overrides=NSS_DN_ATTRS)
+        except TypeError:
+            # cryptography < 36
+            return name.rfc4514_string()
+
+    def _build_cert_inventory(self):
+        sql_certs = self._sql_db_certs()
+        inventory = []
+        seen = {}
+        for nickname, trust_flags in self._rsa_cert_list():
+            certs = sql_certs.get(nickname)
+            if not certs:
+                # dbm database or a nickname not found in cert9.db
+                certs = self._export_certs(nickname)
+                sql_certs[nickname] = certs
+            if not certs:
+                continue
+            # certutil lists a nickname once per certificate
+            idx = seen.get(nickname, 0)
+            seen[nickname] = idx + 1
+            cert = certs[min(idx, len(certs) - 1)]
+            try:
+                not_before = cert.not_valid_before_utc.replace(tzinfo=None)
+                not_after = cert.not_valid_after_utc.replace(tzinfo=None)
+            except AttributeError:
+                # cryptography < 42
+                not_before = cert.not_valid_before
+                not_after = cert.not_valid_after
+            inventory.append({
+                'nickname': nickname,
+                'subject': self._nss_dn(cert.subject),
+                'issuer': self._nss_dn(cert.issuer),
+                'serial_number': cert.serial_number,
+                'not_before': not_before,
+                'not_after': not_after,
+                'trust_flags': trust_flags,
+            })
+        return inventory
+
+    def get_cert_inventory(self):
+        """Get the details of all the certificates of the NSS database
+
+        The certificates are listed and parsed in a single pass, and the result
+        is cached until one of the NSS database files is modified.
+
+        :returns: A list of dict with the nickname, subject, issuer, serial_number,
+                  not_before, not_after (datetime in UTC) and trust_flags keys
+        :raises: ValueError - if certutil fails
+        """
+        state = self._db_files_state()
+        cached = _cert_inventory_cache.get(self._certdb)
+        if cached is None or cached[0] != state:
+            cached = (state, self._build_cert_inventory())
+            _cert_inventory_cache[self._certdb] = cached
+        return [dict(cert) for cert in cached[1]]
+
+    def _cert_details(self, cert):
+        return [cert['nickname'], cert['subject'], cert['issuer'], str(cert['not_after']), cert['trust_flags']]
+
     def get_cert_details(self, nickname):
         """Get the trust flags, subject DN, issuer, and expiration date
 
@@ -1096,54 +1237,19 @@ only.
             3 - expire date
             4 - trust_flags
         """
-        all_certs = self._rsa_cert_list()
-        for cert in all_certs:
-            if cert[0] == nickname:
-                trust_flags = cert[1]
-                certdetails = self.display_cert_details(nickname)
-                end_date_str = certdetails.split("Not After : ")[1].split("\n")[0]
-                date_format = '%a %b %d %H:%M:%S %Y'
-                end_date = datetime.strptime(end_date_str, date_format)
-
-                # Subject DN
-                subject = ""
-                for line in certdetails.splitlines():
-                    line = line.lstrip()
-                    if line.startswith("Subject: "):
-                        subject = line.split("Subject: ")[1].split("\n")[0]
-                    elif subject != "":
-                        if not line.startswith("Subject Public Key Info:"):
-                            subject += line
-                        else:
-                            # Done, strip off quotes
-                            subject = subject[1:-1]
-                            break
-
-                # Issuer
-                issuer = ""
-                for line in certdetails.splitlines():
-                    line = line.lstrip()
-                    if line.startswith("Issuer: "):
-                        issuer = line.split("Issuer: ")[1].split("\n")[0]
-                    elif issuer != "":
-                        if not line.startswith("Validity:"):
-                            issuer += line
-                        else:
-                            issuer = issuer[1:-1]
-                            break
-
-                return ([nickname,  subject, issuer, str(end_date), trust_flags])
+        for cert in self.get_cert_inventory():
+            if cert['nickname'] == nickname:
+                return self._cert_details(cert)
 
         # Did not find cert with that name
         raise ValueError("Certificate '{}' not found in NSS database".format(nickname))
 
     def list_certs(self, ca=False):
-        all_certs = self._rsa_cert_list()
         certs = []
-        for cert in all_certs:
-            trust_flags = cert[1]
+        for cert in self.get_cert_inventory():
+            trust_flags = cert['trust_flags']
             if (ca and "CT" in trust_flags) or (not ca and "CT" not in trust_flags):
-                certs.append(self.get_cert_details(cert[0]))
+                certs.append(self._cert_details(cert))
         return certs
 
     def list_ca_certs(self):
@@ -19,8 +19,12 @@ import subprocess
 import multiprocessing
 import time
 import json
+import math
+import ast
+import threading
+import ldap
 import statistics
-from random import shuffle, seed, randint, choice
+from random import shuffle, seed, randint, choice, Random
 from lib389._constants import *
 from lib389.properties import *
 from lib389.idm.user import UserAccounts
@@ -146,6 +150,275 @@ class CsvFile:
         colid = self.pos + dpl - 1
         return f"{self.n(int(colid/26))}{self.n(colid%26+1)}{self.lineid}"
 
+class LatencyHistogram:
+    # HDR style histogram of latencies.
+    # Values are recorded in micro seconds in log-linear buckets: a value is
+    # kept with its _subBits most significant bits, so the recorded value is
+    # within 1% of the real one whatever its magnitude, while the number of
+    # buckets stays small.  Histograms can be merged and serialized so results
+    # of different workers (or runs) can be compared.
+
+    def __init__(self, subBits=8):
+        self._subBits = subBits
+        self._counts = {}   # { (shift, topBits) : count }
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        usec = max(int(seconds * 1000000), 0)
+        shift = max(usec.bit_length() - self._subBits, 0)
+        key = (shift, usec >> shift)
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self.count += 1
+        self.total += usec
+        if self.min is None or usec < self.min:
+            self.min = usec
+        if self.max is None or usec > self.max:
+            self.max = usec
+
+    def merge(self, other):
+        for key, count in other._counts.items():
+            self._counts[key] = self._counts.get(key, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for val in (other.min, other.max):
+            if val is not None:
+                if self.min is None or val < self.min:
+                    self.min = val
+                if self.max is None or val > self.max:
+                    self.max = val
+        return self
+
+    def percentile(self, pct):
+        # Return the pct percentile latency in micro seconds (the highest
+        # value equivalent to the bucket holding it)
+        if self.count == 0:
+            return None
+        rank = max(math.ceil(self.count * pct / 100), 1)
+        seen = 0
+        for (shift, top) in sorted(self._counts, key=lambda k: k[1] << k[0]):
+            seen += self._counts[(shift, top)]
+            if seen >= rank:
+                return min(((top + 1) << shift) - 1, self.max)
+        return self.max
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def toDict(self):
+        # Serializable summary (latencies in milli seconds) + raw buckets
+        def ms(usec):
+            return None if usec is None else usec / 1000
+        return {
+            "count" : self.count,
+            "min" : ms(self.min),
+            "max" : ms(self.max),
+            "mean" : ms(self.mean()),
+            "p50" : ms(self.percentile(50)),
+            "p90" : ms(self.percentile(90)),
+            "p99" : ms(self.percentile(99)),
+            "p999" : ms(self.percentile(99.9)),
+            "buckets" : [ [shift, top, count] for (shift, top), count in sorted(self._counts.items()) ],
+        }
+
+    @staticmethod
+    def fromDict(d, subBits=8):
+        hist = LatencyHistogram(subBits)
+        for shift, top, count in d['buckets']:
+            hist._counts[(shift, top)] = count
+        hist.count = d['count']
+        hist.min = None if d['min'] is None else int(d['min'] * 1000)
+        hist.max = None if d['max'] is None else int(d['max'] * 1000)
+        hist.total = 0 if d['mean'] is None else int(d['mean'] * 1000 * hist.count)
+        return hist
+
+
+class LoadGenerator:
+    # Native load generator: a pool of worker threads, each one with its own
+    # connection, performs a weighted mix of operations on the users created
+    # by PerformanceTools.initInstance().
+    #
+    # If a rate is provided the load is open-loop: operations are scheduled at
+    # the target rate (linearly ramping from startRate during rampTime) whether
+    # or not the previous ones are completed, and the latency is measured from
+    # the scheduled time, so a server that falls behind is not hidden by
+    # workers waiting for it.  Without rate, each worker sends its operations
+    # as fast as it can (closed-loop).
+    #
+    # A failed operation is counted and the worker backs off exponentially
+    # until an operation succeeds again.  A worker whose operations keep
+    # failing stops.
+
+    OPERATIONS = ( 'search', 'modify', 'add', 'bind' )
+    MAX_BACKOFF = 1.0
+    MAX_CONSECUTIVE_ERRORS = 100
+
+    def __init__(self, instance, usersParentDn, nbUsers, mix={'search': 1}, nbWorkers=1,
+                 rate=None, startRate=None, rampTime=0, duration=60, interval=5, seed='lib389PerfTools'):
+        for op in mix:
+            if op not in LoadGenerator.OPERATIONS:
+                raise ValueError(f"Unknown operation {op} in the mix. Supported operations are: {', '.join(LoadGenerator.OPERATIONS)}")
+        self._ops = [ op for op, weight in mix.items() if weight > 0 ]
+        if len(self._ops) == 0:
+            raise ValueError("The operation mix is empty")
+        self._weights = [ mix[op] for op in self._ops ]
+        self._instance = instance
+        self._usersParentDn = usersParentDn
+        self._nbUsers = nbUsers
+        self._nbWorkers = nbWorkers
+        self._rate = rate
+        self._startRate = rate if startRate is None else startRate
+        self._rampTime = rampTime
+        self._duration = duration
+        self._interval = interval
+        self._seed = seed
+        self._lock = threading.Lock()
+        self._nextSlot = 0.0
+
+    def uri(self):
+        return f"ldap://{self._instance.host}:{self._instance.port}"
+
+    def rateAt(self, offset):
+        # Target rate (operations per second) at offset seconds of the run
+        if self._rampTime and offset < self._rampTime:
+            rate = self._startRate + (self._rate - self._startRate) * offset / self._rampTime
+        else:
+            rate = self._rate
+        return max(rate, 1)
+
+    def _schedule(self, now):
+        # Return the offset at which next operation should be sent
+        # or None once the run is over
+        if self._rate is None:
+            return now if now < self._duration else None
+        with self._lock:
+            slot = self._nextSlot
+            if slot >= self._duration:
+                return None
+            self._nextSlot = slot + 1 / self.rateAt(slot)
+            return slot
+
+    def _connect(self):
+        conn = ldap.initialize(self.uri())
+        conn.set_option(ldap.OPT_PROTOCOL_VERSION, 3)
+        conn.simple_bind_s(self._instance.binddn, self._instance.bindpw)
+        return conn
+
+    def _userDn(self, rng):
+        uid = IdGeneratorWithNumbers.formatId(rng.randint(0, self._nbUsers - 1))
+        return f"uid={uid},{self._usersParentDn}"
+
+    def _doOperation(self, conn, op, rng, state):
+        if op == 'search':
+            uid = IdGeneratorWithNumbers.formatId(rng.randint(0, self._nbUsers - 1))
+            conn.search_s(self._usersParentDn, ldap.SCOPE_SUBTREE, f"(uid={uid})")
+        elif op == 'modify':
+            val = f"random modify {rng.randint(0, 99999):05d}"
+            conn.modify_s(self._userDn(rng), [(ldap.MOD_REPLACE, 'sn', val.encode())])
+        elif op == 'add':
+            # A failed add does not reuse its uid
+            uid = f"load{state['worker']}-{state['nextAdd']}"
+            state['nextAdd'] += 1
+            dn = f"uid={uid},{self._usersParentDn}"
+            conn.add_s(dn, [
+                ('objectClass', [b'top', b'inetOrgPerson']),
+                ('uid', [uid.encode()]),
+                ('cn', [uid.encode()]),
+                ('sn', [uid.encode()]),
+            ])
+            state['added'].append(dn)
+        elif op == 'bind':
+            conn.simple_bind_s(self._instance.binddn, self._instance.bindpw)
+
+    def _worker(self, idx, startTime, result):
+        rng = Random(f"{self._seed}-{idx}")
+        state = { 'worker' : idx, 'added' : [], 'nextAdd' : 0 }
+        hists = { op : LatencyHistogram() for op in self._ops }
+        errors = { op : 0 for op in self._ops }
+        intervals = {}
+        failures = 0
+        aborted = False
+        conn = self._connect()
+        try:
+            while True:
+                slot = self._schedule(time.monotonic() - startTime)
+                if slot is None:
+                    break
+                delay = startTime + slot - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                op = rng.choices(self._ops, weights=self._weights)[0]
+                try:
+                    self._doOperation(conn, op, rng, state)
+                except ldap.LDAPError:
+                    errors[op] += 1
+                    failures += 1
+                    if failures >= self.MAX_CONSECUTIVE_ERRORS:
+                        aborted = True
+                        break
+                    time.sleep(min(self.MAX_BACKOFF, 0.001 * 2 ** failures))
+                    continue
+                failures = 0
+                end = time.monotonic()
+                hists[op].record(end - startTime - slot)
+                bucket = int((end - startTime) / self._interval)
+                intervals[bucket] = intervals.get(bucket, 0) + 1
+            # Remove the added entries so the instance can be reused
+            for dn in state['added']:
+                try:
+                    conn.delete_s(dn)
+                except ldap.LDAPError:
+                    pass
+        finally:
+            conn.unbind_s()
+        result[idx] = (hists, errors, intervals, aborted)
+
+    def run(self):
+        # Run the load and return a dict with the latency histograms and the
+        # number of operations completed per interval
+        self._nextSlot = 0.0
+        result = [ None ] * self._nbWorkers
+        startTime = time.monotonic()
+        threads = [ threading.Thread(target=self._worker, args=(idx, startTime, result))
+                    for idx in range(self._nbWorkers) ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - startTime
+        hists = { op : LatencyHistogram() for op in self._ops }
+        errors = { op : 0 for op in self._ops }
+        intervals = {}
+        aborted = 0
+        for res in result:
+            if res is None:
+                raise RuntimeError("A load worker failed, see the traceback above")
+            for op in self._ops:
+                hists[op].merge(res[0][op])
+                errors[op] += res[1][op]
+            for bucket, count in res[2].items():
+                intervals[bucket] = intervals.get(bucket, 0) + count
+            aborted += res[3]
+        # Only keep complete intervals
+        nbIntervals = int(self._duration / self._interval)
+        rates = [ intervals.get(bucket, 0) / self._interval for bucket in range(nbIntervals) ]
+        total = LatencyHistogram()
+        for hist in hists.values():
+            total.merge(hist)
+        return {
+            "elapsed" : elapsed,
+            "rates" : rates,
+            "latency" : { op : hist.toDict() for op, hist in hists.items() },
+            "total_latency" : total.toDict(),
+            "errors" : errors,
+            "aborted_workers" : aborted,
+        }
+
+
 class PerformanceTools:
 
     def __init__(self, options = {}):
@@ -168,6 +441,52 @@ class PerformanceTools:
             f.write("objectclass: inetOrgPerson\n");
         self._users_parents_dn = f"ou=People,{self._options['suffix']}"
 
+    @staticmethod
+    def readLog(fname):
+        # Iterate over the results stored in a (verbose) log file
+        with open(fname) as f:
+            for line in f:
+                if (line[0] != '{'):
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Log written by an older version (python repr)
+                    try:
+                        yield ast.literal_eval(line.strip())
+                    except (ValueError, SyntaxError):
+                        continue
+
+    @staticmethod
+    def resultKey(res):
+        return (res['measure_name'], res.get('nb_threads', ""), res['nbUsers'], res['db_lib'])
+
+    @staticmethod
+    def compareLogs(fname1, fname2, fout):
+        # Compare the last result of each measure of two log files
+        # and generate a csv file with the relative differences
+        results = []
+        for fname in (fname1, fname2):
+            results.append({ PerformanceTools.resultKey(res) : res for res in PerformanceTools.readLog(fname) })
+        keys = sorted(set(results[0]) & set(results[1]), key=str)
+        cols = [ 'safemean', 'p50', 'p99', 'p999' ]
+        with CsvFile(fout, 4 + 3*len(cols)) as csv:
+            for col in ( "test name", "threads", "users", "db" ):
+                csv.nf(col)
+            for col in cols:
+                csv.nf(f"{col} 1")
+                csv.nf(f"{col} 2")
+                csv.nf("%")
+            csv.nl()
+            for k in keys:
+                for val in k:
+                    csv.nf(f"{val}")
+                for col in cols:
+                    csv.nf(results[0][k].get(col))
+                    csv.nf(results[1][k].get(col))
+                    csv.nf(f"=({csv.ref(-1)}-{csv.ref(-2)})/{csv.ref(-2)}")
+                csv.nl()
+
     @staticmethod
     def log2Csv(fname, fout):
         # Convert (verbose) log file into csv file  (easier for comparing the results)
@@ -176,33 +495,27 @@ class PerformanceTools:
         has_threads={} # { Name : { threads : { users : users } } } Map
         # Read log file
         maxmes=0
-        with open(fname) as f:
-            for line in f:
-                if (line[0] != '{'):
-                    continue
-                if (line[-1] == '\n'):
-                    line = line[:-1]
-                res = eval(line.replace('\n','\\n'))
-                nb_users = res['nbUsers']
-                db_lib = res['db_lib']
-                name = res['measure_name']
-                names[name] = None
-                try:
-                    nbthreads = res['nb_threads']
-                except KeyError:
-                    nbthreads = ""
-                if not name in has_threads:
-                    has_threads[name] = {}
-                if not nbthreads in has_threads[name]:
-                    has_threads[name][nbthreads] = {}
-                has_threads[name][nbthreads][nb_users] = nb_users
-                key = ( nb_users, name, nbthreads, db_lib)
-                if not key in map:
-                    map[key] = []
-                m = map[key]
-                m.append(res)
-                if maxmes < len(m):
-                    maxmes = len(m)
+        for res in PerformanceTools.readLog(fname):
+            nb_users = res['nbUsers']
+            db_lib = res['db_lib']
+            name = res['measure_name']
+            names[name] = None
+            try:
+                nbthreads = res['nb_threads']
+            except KeyError:
+                nbthreads = ""
+            if not name in has_threads:
+                has_threads[name] = {}
+            if not nbthreads in has_threads[name]:
+                has_threads[name][nbthreads] = {}
+            has_threads[name][nbthreads][nb_users] = nb_users
+            key = ( nb_users, name, nbthreads, db_lib)
+            if not key in map:
+                map[key] = []
+            m = map[key]
+            m.append(res)
+            if maxmes < len(m):
+                maxmes = len(m)
         # Displays the result: by test name then by thread number then by users number
         # Generates all combinations
         keys=[]
@@ -247,6 +560,9 @@ class PerformanceTools:
 
     def log(self, filename, msg):
         with open(self.getFilePath(filename), "at") as f:
+            if isinstance(msg, dict):
+                # One json object per line (see readLog)
+                msg = json.dumps(msg, default=str)
             f.write(str(msg))
             f.write("\n")
 
@@ -361,7 +677,7 @@ class PerformanceTools:
             res["rawmean"] = statistics.mean(rawres)
             res["saferesults"] = self.safeMeasures(rawres) # discard first measure result
             res["safemean"] = statistics.mean(res["saferesults"])
-            pretty_res_keys = [ 'start_time', 'stop_time', 'measure_name', 'safemean', 'db_lib', 'nbUsers', 'nb_threads' ]
+            pretty_res_keys = [ 'start_time', 'stop_time', 'measure_name', 'safemean', 'db_lib', 'nbUsers', 'nb_threads', 'p50', 'p99', 'p999' ]
             pretty_res = dict(filter(lambda elem: elem[0] in pretty_res_keys, res.items()))
         except statistics.StatisticsError as e:
             print(e)
@@ -411,20 +727,55 @@ class PerformanceTools:
         # Lets parse the result
         res = { "measure_name" : measure_name,
                 "cmd" : cmd,
-                "stdout" : result.stdout,
-                "stderr" : result.stderr,
+                "stdout" : result.stdout.decode(errors='replace'),
+                "stderr" : result.stderr.decode(errors='replace'),
                 "returncode" : result.returncode,
                 "start_time" : start_time,
                 "stop_time" : stop_time,
                 "stop_time" : stop_time,
                 "nb_threads" : nbThreads,
                 **self.getEnvInfo() }
-        rawres = re.findall(r'Average rate: [^ ]*\s*.([^/]*)', str(result.stdout))
+        rawres = re.findall(r'Average rate: [^ ]*\s*.([^/]*)', res["stdout"])
         rawres = [float(i) for i in rawres]
         res["measure0"] = rawres[0]
         res["rawresults"] = rawres[1:]   # Discard first measure
         return self.finalizeResult(res)
 
+    def load(self, measure_name, mix, nbThreads=10, rate=None, startRate=None, rampTime=0, duration=60, interval=5):
+        # Run the native load generator (see LoadGenerator)
+        # The operation rate of each interval is used as a measure
+        # (the first one is discarded as for ldclt)
+        loadgen = LoadGenerator(self._instance, self._users_parents_dn, self._options['nbUsers'],
+                                mix=mix, nbWorkers=nbThreads, rate=rate, startRate=startRate,
+                                rampTime=rampTime, duration=duration, interval=interval,
+                                seed=self._options['seed'])
+        start_time = time.time()
+        print (f"Running load {measure_name} during {duration} seconds ...\r")
+        load = loadgen.run()
+        print (" Done.")
+        if load["aborted_workers"]:
+            print (f"Warning: {load['aborted_workers']} workers stopped on repeated errors: {load['errors']}")
+        stop_time = time.time()
+        total = load["total_latency"]
+        res = { "measure_name" : measure_name,
+                "mix" : mix,
+                "rate" : rate,
+                "start_rate" : startRate,
+                "ramp_time" : rampTime,
+                "duration" : duration,
+                "start_time" : start_time,
+                "stop_time" : stop_time,
+                "nb_threads" : nbThreads,
+                "p50" : total["p50"],
+                "p99" : total["p99"],
+                "p999" : total["p999"],
+                **load,
+                **self.getEnvInfo() }
+        rawres = load["rates"]
+        res["measure0"] = rawres[0] if rawres else None
+        res["rawresults"] = rawres[1:]   # Discard first measure
+        return self.finalizeResult(res)
+
     def measure_search_by_uid(self, name, nb_threads = 1):
         nb_users = self._options['nbUsers']
         args  = { "-b" : self._users_parents_dn,
@@ -528,6 +879,25 @@ class PerformanceTools:
             perftools.initInstance()
             return perftools;
 
+    class TesterLoad(Tester):
+        # A tester using the native load generator with a mix of operations
+        def __init__(self, name, description, mix):
+            super().__init__(name, description, None)
+            self._mix = mix
+
+        def argsused(self):
+            return [ "nb_threads", "name", "mix", "rate", "start_rate", "ramp_time", "duration" ]
+
+        def run(self, perftools, args):
+            args['name'] = self._base_name
+            res = perftools.load(self._base_name, args.get('mix') or self._mix,
+                                 nbThreads=args['nb_threads'],
+                                 rate=args.get('rate'),
+                                 startRate=args.get('start_rate'),
+                                 rampTime=args.get('ramp_time') or 0,
+                                 duration=args.get('duration') or 60)
+            print (res['pretty'])
+
     class TesterImportExport(Tester):
         # A special tester for export/import
         def __init__(self):
@@ -550,6 +920,8 @@ class PerformanceTools:
             PerformanceTools.Tester("search_uid", "Measure number of searches per seconds using filter with random existing uid.", "measure_search_by_uid"),
             PerformanceTools.Tester("search_uid_in_dn", "Measure number of searches per seconds using filter with random existing uid in dn (i.e: (uid:dn:uid_value)).", "measure_search_by_filtering_the_dn"),
             PerformanceTools.Tester("modify_sn", "Measure number of modify per seconds replacing sn by random value on random entries.", "measure_modify"),
+            PerformanceTools.TesterLoad("load_search", "Measure number of searches per seconds and their latency using the native load generator.", {'search': 1}),
+            PerformanceTools.TesterLoad("load_mixed", "Measure number of operations per seconds and their latency using the native load generator with 80% searches, 15% modifies, 4% adds and 1% binds.", {'search': 80, 'modify': 15, 'add': 4, 'bind': 1}),
             PerformanceTools.TesterImportExport(),
         ] }
 
@@ -7,6 +7,7 @@
 # --- END COPYRIGHT BLOCK ---
 
 import os
+import re
 import base64
 import ldap
 import decimal
@@ -16,6 +17,9 @@ import logging
 import uuid
 import json
 import copy
+import contextvars
+from collections import deque
+from concurrent import futures
 from operator import itemgetter
 from itertools import permutations
 from lib389._constants import CONSUMER_REPLICAID, REPLICA_RDWR_TYPE, REPLICA_FLAGS_WRITE, REPLICA_RDONLY_TYPE, \
@@ -26,7 +30,7 @@ from lib389._constants import CONSUMER_REPLICAID, REPLICA_RDWR_TYPE, REPLICA_FLA
 from lib389.properties import REPLICA_OBJECTCLASS_VALUE, REPLICA_OBJECTCLASS_VALUE, REPLICA_SUFFIX, \
                               REPLICA_PROPNAME_TO_ATTRNAME, REPL_BINDDN, REPL_TYPE, REPL_ID, REPL_FLAGS, \
                               REPL_BIND_GROUP, SER_HOST, SER_PORT, SER_SECURE_PORT, SER_ROOT_DN, SER_ROOT_PW, \
-                              REPL_ROOT, inProperties, rawProperty
+                              REPL_ROOT, AGMT_HOST, AGMT_PORT, inProperties, rawProperty
 
 from lib389.utils import (normalizeDN, escapeDNValue, ensure_bytes, ensure_str,
                           ensure_list_str, ds_is_older, copy_with_permissions,
@@ -35,7 +39,7 @@ from lib389 import DirSrv, Entry, NoSuchEntryError, InvalidArgumentError
 from lib389._mapped_object import DSLdapObjects, DSLdapObject
 from lib389.passwd import password_generate
 from lib389.mappingTree import MappingTrees
-from lib389.agreement import Agreements
+from lib389.agreement import Agreements, RUVCache
 from lib389.dirsrv_log import DirsrvErrorLog
 from lib389.tombstone import Tombstones
 from lib389.tasks import CleanAllRUVTask
@@ -968,85 +972,244 @@ class RUV(object):
 
 
 class ChangelogLDIF(object):
-    def __init__(self, file_path, output_file):
+    def __init__(self, file_path, output_file, min_csn=None, max_csn=None, rids=None):
         """A class for working with Changelog LDIF file
 
+        The file is read one change at a time, so the memory used does not
+        depend on the size of the changelog.  The changes can be filtered by
+        a CSN (or time) range and by replica ID, the RUV entries are kept.
+
         :param file_path: LDIF file path
         :type file_path: str
         :param output_file: LDIF file path
--       :type output_file: str
+        :type output_file: str
+        :param min_csn: Skip the changes with an older CSN (a CSN, a CSN prefix, or a time)
+        :type min_csn: str
+        :param max_csn: Skip the changes with a newer CSN (a CSN, a CSN prefix, or a time)
+        :type max_csn: str
+        :param rids: Only keep the changes of these replica IDs
+        :type rids: list[int]
         """
         self.file_path = file_path
         self.output_file = output_file
+        self.min_csn = self.csn_bound(min_csn)
+        self.max_csn = self.csn_bound(max_csn)
+        self.rids = set(int(rid) for rid in rids) if rids else None
 
-    def grep_csn(self):
-        """Grep and interpret CSNs
+    @staticmethod
+    def csn_bound(value):
+        """Convert a CSN range bound to a lower case CSN (or CSN prefix)
 
-        :param file: LDIF file path
-        :type file: str
-        """
-        with open(self.output_file, 'w') as LDIF_OUT:
-            LDIF_OUT.write(f"# LDIF File: {self.output_file}\n")
-            with open(self.file_path) as LDIF_IN:
-                for line in LDIF_IN.readlines():
-                    if "ruv:" in line or "csn:" in line:
-                        csn = ""
-                        maxcsn = ""
-                        modts = ""
-                        line = line.split("\n")[0]
-                        if "ruv:" in line:
-                            ruv = RUV([line.split("ruv: ")[1]])
-                            ruv_dict = ruv.format_ruv()
-                            csn = ruv_dict["csn"]
-                            maxcsn = ruv_dict["maxcsn"]
-                            modts = ruv_dict["modts"]
-                        elif "csn:" in line:
-                            csn = RUV().parse_csn(line.split("csn: ")[1])
-                        if maxcsn or modts:
-                            LDIF_OUT.write(f'{line} ({csn}\n')
-                            if maxcsn:
-                                LDIF_OUT.write(f"; {maxcsn}\n")
-                            if modts:
-                                LDIF_OUT.write(f"; {modts}\n")
-                            LDIF_OUT.write(")\n")
-                        else:
-                            LDIF_OUT.write(f"{line} ({csn})\n")
+        :param value: A CSN, a CSN prefix, a time ('2024-01-31 10:00:00'), or a UNIX timestamp
+        :type value: str
+        :returns: str
+        :raises: ValueError - if the value is not a valid bound
+        """
+        if value is None:
+            return None
+        value = str(value).strip()
+        if re.fullmatch(r'[0-9a-fA-F]{8}([0-9a-fA-F]{12})?', value):
+            return value.lower()
+        if value.isdigit():
+            return '%08x' % int(value)
+        try:
+            dt = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid CSN or time: {value}")
+        if dt.tzinfo is None:
+            # CSNs use UTC, like the times displayed for them
+            dt = dt.replace(tzinfo=datetime.timezone.utc)
+        return '%08x' % int(dt.timestamp())
 
-    def decode(self):
-        """Decode the changelog
+    @staticmethod
+    def csn_rid(csn):
+        """Get the replica ID of a CSN
 
-        :param file: LDIF file path
-        :type file: str
+        :param csn: A CSN
+        :type csn: str
+        :returns: int
         """
+        return int(csn[12:16], 16)
+
+    def _match(self, csn):
+        if csn is None:
+            # Not a change (the RUV entries)
+            return True
+        csn = csn.lower()
+        if self.min_csn is not None and csn < self.min_csn:
+            return False
+        if self.max_csn is not None and csn[:len(self.max_csn)] > self.max_csn:
+            return False
+        if self.rids is not None and self.csn_rid(csn) not in self.rids:
+            return False
+        return True
+
+    def records(self):
+        """Read the changelog LDIF file
+
+        :returns: A generator of (csn, lines) tuples, one per entry.  The csn
+                  is None for the entries which are not changes, the lines
+                  keep their end of line.
+        """
+        lines = []
+        csn = None
+        with open(self.file_path) as LDIF_IN:
+            for line in LDIF_IN:
+                if line.strip() == '':
+                    if lines:
+                        if self._match(csn):
+                            yield (csn, lines)
+                        lines = []
+                        csn = None
+                    continue
+                if line.startswith('csn:'):
+                    csn = line[4:].strip()
+                lines.append(line)
+        if lines and self._match(csn):
+            yield (csn, lines)
+
+    def _write(self, converter):
         with open(self.output_file, 'w') as LDIF_OUT:
             LDIF_OUT.write(f"# LDIF File: {self.output_file}\n")
-            with open(self.file_path) as LDIF_IN:
-                encoded_str = ""
-                for line in LDIF_IN.readlines():
-                    if line.startswith("change::") or line.startswith("changes::"):
-                        LDIF_OUT.write("change::\n")
-                        try:
-                            encoded_str = line.split("change:: ")[1]
-                        except IndexError:
-                            encoded_str = line.split("changes:: ")[1]
-                        continue
-                    if not encoded_str:
-                        LDIF_OUT.write(line.split('\n')[0] + "\n")
-                        continue
-                    if line == "\n":
-                        decoded_str = ensure_str(base64.b64decode(encoded_str))
-                        LDIF_OUT.write(decoded_str + "\n")
-                        encoded_str = ""
-                        continue
-                    encoded_str += line
+            for (csn, lines) in self.records():
+                for line in converter(lines):
+                    LDIF_OUT.write(line if line.endswith('\n') else line + '\n')
+                LDIF_OUT.write('\n')
+
+    @staticmethod
+    def _grep_csn_lines(lines):
+        for line in lines:
+            if "ruv:" in line:
+                # {replica 1 ldap://host:port} mincsn maxcsn modts
+                line = line.rstrip('\n')
+                csns = line.rsplit('}', 1)[-1].split()
+                if csns:
+                    yield f"{line} ({'; '.join(RUV.parse_csn(csn) for csn in csns)})"
+                else:
+                    yield line
+            elif line.startswith("csn:"):
+                line = line.rstrip('\n')
+                yield f"{line} ({RUV.parse_csn(line[4:].strip())})"
+
+    @staticmethod
+    def _decode_lines(lines):
+        encoded = None
+        for line in lines:
+            if encoded is not None:
+                if line.startswith(' '):
+                    # Continuation of the base64 value
+                    encoded.append(line.strip())
+                    continue
+                yield ensure_str(base64.b64decode(''.join(encoded)))
+                encoded = None
+            if line.startswith("change::") or line.startswith("changes::"):
+                yield "change::"
+                encoded = [line.split('::', 1)[1].strip()]
+            else:
+                yield line
+        if encoded is not None:
+            yield ensure_str(base64.b64decode(''.join(encoded)))
+
+    def grep_csn(self):
+        """Grep and interpret CSNs"""
+        self._write(self._grep_csn_lines)
+
+    def decode(self):
+        """Decode the changelog"""
+        self._write(self._decode_lines)
 
     def process(self):
-        # Process the file as is, just log it into the new custom file
-        with open(self.output_file, 'w') as LDIF_OUT:
-            LDIF_OUT.write(f"# LDIF File: {self.output_file}")
-            with open(self.file_path) as LDIF_IN:
-                for line in LDIF_IN.readlines():
-                    LDIF_OUT.write(line)
+        """Process the file as is, just log it into the new custom file"""
+        self._write(iter)
+
+    def analyze(self, top=10):
+        """Report the replication load recorded in the changelog: the number
+        of changes and the change rate of each replica ID, the peak number of
+        changes in a second, the operation mix, and the most modified entries.
+
+        The changelog is sorted by CSN, so the changes per second are counted
+        as the file is read.
+
+        :param top: The number of most modified entries to report
+        :type top: int
+        :returns: dict
+        """
+        total = 0
+        operations = {}
+        dns = {}
+        rids = {}
+        first_csn = None
+        last_csn = None
+        second = None
+        second_changes = 0
+        peak_second = None
+        peak_changes = 0
+        for (csn, lines) in self.records():
+            if csn is None:
+                continue
+            csn = csn.lower()
+            total += 1
+            if first_csn is None or csn < first_csn:
+                first_csn = csn
+            if last_csn is None or csn > last_csn:
+                last_csn = csn
+            rid = self.csn_rid(csn)
+            rid_stats = rids.get(rid)
+            if rid_stats is None:
+                rids[rid] = rid_stats = {'changes': 0, 'first_csn': csn, 'last_csn': csn}
+            rid_stats['changes'] += 1
+            rid_stats['first_csn'] = min(rid_stats['first_csn'], csn)
+            rid_stats['last_csn'] = max(rid_stats['last_csn'], csn)
+            if csn[:8] != second:
+                second = csn[:8]
+                second_changes = 0
+            second_changes += 1
+            if second_changes > peak_changes:
+                peak_changes = second_changes
+                peak_second = second
+
+            changetype = 'unknown'
+            dn = None
+            for line in lines:
+                if line.startswith('changetype:'):
+                    changetype = line[11:].strip().lower()
+                elif line.startswith('dn::'):
+                    dn = ensure_str(base64.b64decode(line[4:].strip()))
+                elif line.startswith('dn:'):
+                    dn = line[3:].strip()
+            operations[changetype] = operations.get(changetype, 0) + 1
+            if dn is not None:
+                dn = dn.lower()
+                dns[dn] = dns.get(dn, 0) + 1
+
+        def _rate(changes, first, last):
+            # Changes per second over the time range of the changes
+            return round(changes / max(int(last[:8], 16) - int(first[:8], 16), 1), 3)
+
+        result = {
+            'changes': total,
+            'first_csn': first_csn,
+            'first_change': RUV.parse_csn(first_csn) if first_csn else None,
+            'last_csn': last_csn,
+            'last_change': RUV.parse_csn(last_csn) if last_csn else None,
+            'changes_per_second': _rate(total, first_csn, last_csn) if total else 0,
+            'peak_changes_per_second': peak_changes,
+            'peak_second': RUV.parse_csn(peak_second) if peak_second else None,
+            'operations': dict(sorted(operations.items(), key=itemgetter(1), reverse=True)),
+            'rids': [],
+            'top_dns': [{'dn': dn, 'changes': changes}
+                        for (dn, changes) in sorted(dns.items(), key=itemgetter(1), reverse=True)[:top]],
+        }
+        for rid in sorted(rids):
+            rid_stats = rids[rid]
+            result['rids'].append({'rid': rid,
+                                   'changes': rid_stats['changes'],
+                                   'first_change': RUV.parse_csn(rid_stats['first_csn']),
+                                   'last_change': RUV.parse_csn(rid_stats['last_csn']),
+                                   'changes_per_second': _rate(rid_stats['changes'],
+                                                               rid_stats['first_csn'],
+                                                               rid_stats['last_csn'])})
+        return result
 
 
 class Changelog(DSLdapObject):
@@ -1800,7 +1963,8 @@ class Replicas(DSLdapObjects):
             replica._populate_suffix()
         return replica
 
-    def process_and_dump_changelog(self, replica_root, output_file, csn_only=False, preserve_ldif_done=False, decode=False):
+    def process_and_dump_changelog(self, replica_root, output_file, csn_only=False, preserve_ldif_done=False, decode=False,
+                                   min_csn=None, max_csn=None, rids=None, analyze=False, top=10):
         """Dump and decode Directory Server replication changelog
 
         :param replica_root: Replica suffix that needs to be processed
@@ -1813,6 +1977,17 @@ class Replicas(DSLdapObjects):
         :type preserve_ldif_done: bool
         :param decode: Decode any base64 values from the changelog
         :type log: bool
+        :param min_csn: Skip the changes older than this CSN or time
+        :type min_csn: str
+        :param max_csn: Skip the changes newer than this CSN or time
+        :type max_csn: str
+        :param rids: Only keep the changes of these replica IDs
+        :type rids: list[int]
+        :param analyze: Return the analysis of the changes instead of writing output_file
+        :type analyze: bool
+        :param top: The number of most modified entries in the analysis
+        :type top: int
+        :returns: The analysis (dict) if analyze is set, None otherwise
         """
 
         # Dump the changelog for the replica
@@ -1824,13 +1999,17 @@ class Replicas(DSLdapObjects):
         except:
             raise ValueError(f'The suffix "{replica_root}" is not enabled for replication')
 
+        # Check the filters before dumping the changelog
+        cl_ldif = ChangelogLDIF(file_path, output_file=output_file, min_csn=min_csn, max_csn=max_csn, rids=rids)
         replica.begin_task_cl2ldif()
         if not replica.task_finished():
             raise ValueError("The changelog to LDIF task (CL2LDIF) did not complete in time")
 
         # Decode the dumped changelog if we are using a non default location
-        cl_ldif = ChangelogLDIF(file_path, output_file=output_file)
-        if csn_only:
+        result = None
+        if analyze:
+            result = cl_ldif.analyze(top=top)
+        elif csn_only:
             cl_ldif.grep_csn()
         elif decode:
             cl_ldif.decode()
@@ -1841,6 +2020,7 @@ class Replicas(DSLdapObjects):
             os.rename(file_path, f'{file_path}.done')
         else:
             os.remove(file_path)
+        return result
 
     def restore_changelog(self, replica_root, log=None):
         """Restore Directory Server replication changelog from '.ldif' or '.ldif.done' file
@@ -2613,6 +2793,10 @@ class ReplicationManager(object):
         return replica.get_rid()
 
 
+# The number of instances contacted at the same time by the replication monitor
+REPL_MONITOR_WORKERS = 8
+
+
 class ReplicationMonitor(object):
     """The lib389 replication monitor. This is used to check the status
     of many instances at once.
@@ -2632,21 +2816,27 @@ class ReplicationMonitor(object):
         else:
             self._log = logging.getLogger(__name__)
 
-    def _get_replica_status(self, instance, report_data, use_json, get_credentials=None):
+    def _get_replica_status(self, instance, report_data, use_json, get_credentials=None, ruv_cache=None):
         """Load all of the status data to report
         and add new hostname:port pairs for future processing
         :type get_credentials: function
+        :type ruv_cache: RUVCache
         """
 
         replicas_status = []
         replicas = Replicas(instance)
-        for replica in replicas.list():
+        # Each replica and agreement is read many times below, fetch them once
+        for replica in replicas.list(prefetch=True):
             replica_id = replica.get_rid()
             replica_root = replica.get_suffix()
-            replica_maxcsn = replica.get_maxcsn()
+            if ruv_cache is not None:
+                ruv = RUV(ruv_cache.get_ruv_entry(instance, replica_root)['nsds50ruv'])
+                replica_maxcsn = ruv._rid_maxcsn.get(replica_id, '00000000000000000000')
+            else:
+                replica_maxcsn = replica.get_maxcsn()
             agmts_status = []
             agmts = replica.get_agreements()
-            for agmt in agmts.list():
+            for agmt in agmts.list(prefetch=True):
                 host = agmt.get_attr_val_utf8_l("nsds5replicahost")
                 port = agmt.get_attr_val_utf8_l("nsds5replicaport")
                 if get_credentials is not None:
@@ -2663,9 +2853,10 @@ class ReplicationMonitor(object):
                 if consumer not in report_data:
                     report_data[f"{consumer}:{protocol}"] = None
                 if use_json:
-                    agmts_status.append(json.loads(agmt.status(use_json=True, binddn=binddn, bindpw=bindpw)))
+                    agmts_status.append(json.loads(agmt.status(use_json=True, binddn=binddn, bindpw=bindpw,
+                                                               ruv_cache=ruv_cache)))
                 else:
-                    agmts_status.append(agmt.status(binddn=binddn, bindpw=bindpw))
+                    agmts_status.append(agmt.status(binddn=binddn, bindpw=bindpw, ruv_cache=ruv_cache))
             replicas_status.append({"replica_id": replica_id,
                                     "replica_root": replica_root,
                                     "replica_status": "Online",
@@ -2673,70 +2864,108 @@ class ReplicationMonitor(object):
                                     "agmts_status": agmts_status})
         return replicas_status
 
-    def generate_report(self, get_credentials, use_json=False):
+    def _get_supplier_status(self, supplier, credentials, use_json, ruv_cache):
+        """Connect to a supplier found in an agreement and load its status.
+        It runs in a worker thread of generate_report().
+
+        :param supplier: The "host:port:protocol" of the supplier
+        :type supplier: str
+        :param credentials: The binddn and bindpw to connect with
+        :type credentials: dict
+        :returns: A tuple of the status, and the dict of the suppliers found
+                  in its agreements (None if the supplier is unreachable)
+        """
+
+        s_splitted = supplier.split(":")
+        supplier_hostname = s_splitted[0]
+        supplier_port = s_splitted[1]
+        supplier_protocol = s_splitted[2]
+
+        # Open a connection to the consumer, or reuse the one used by its agreement status
+        try:
+            supplier_inst = ruv_cache.get_connection(supplier_hostname, supplier_port, supplier_protocol,
+                                                     credentials["binddn"], credentials["bindpw"])
+        except ldap.LDAPError as e:
+            self._log.debug(f"Connection to consumer ({supplier_hostname}:{supplier_port}) failed, error: {e}")
+            return [{"replica_status": f"Unreachable - {e.args[0]['desc']}"}], None
+
+        found = {}
+        return self._get_replica_status(supplier_inst, found, use_json, ruv_cache=ruv_cache), found
+
+    def generate_report(self, get_credentials, use_json=False, workers=REPL_MONITOR_WORKERS, timeout=None):
         """Generate a replication report for each supplier or hub and the instances
         that are connected with it by agreements.
 
+        The instances are crawled concurrently. One connection is opened to
+        each instance, and its RUV is read once for the whole report.
+
         :param get_credentials: A user-defined callback function with parameters (host, port) which returns
                                 a dictionary with binddn and bindpw keys -
                                 example values "cn=Directory Manager" and "password"
         :type get_credentials: function
+        :param workers: The number of instances to contact at the same time
+        :type workers: int
+        :param timeout: The connection and operation timeout for each instance, in seconds
+        :type timeout: int
         :returns: dict
         """
         report_data = {}
+        ruv_cache = RUVCache(verbose=self._instance.verbose, timeout=timeout, logger=self._log)
         initial_inst_key = f"{self._instance.config.get_attr_val_utf8_l('nsslapd-localhost')}:{self._instance.config.get_attr_val_utf8_l('nsslapd-port')}"
+        ruv_cache.register(initial_inst_key, self._instance)
         # Do this on an initial instance to get the agreements to other instances
+        found = {}
         try:
-            report_data[initial_inst_key] = self._get_replica_status(self._instance, report_data, use_json, get_credentials)
+            report_data[initial_inst_key] = self._get_replica_status(self._instance, found, use_json,
+                                                                     get_credentials, ruv_cache)
         except ldap.LDAPError as e:
-            self._log.debug(f"Connection to consumer ({supplier_hostname}:{supplier_port}) failed, error: {e}")
+            self._log.debug(f"Connection to consumer ({initial_inst_key}) failed, error: {e}")
             report_data[initial_inst_key] = [{"replica_status": f"Unreachable - {e.args[0]['desc']}"}]
 
         # Check if at least some replica report on other instances was generated
         repl_exists = False
 
-        # While we have unprocessed instances - continue
-        while True:
-            try:
-                supplier = [host_port for host_port, processed_data in report_data.items() if processed_data is None][0]
-            except IndexError:
-                break
-
-            del report_data[supplier]
-            s_splitted = supplier.split(":")
-            supplier_hostname = s_splitted[0]
-            supplier_port = s_splitted[1]
-            supplier_protocol = s_splitted[2]
-            supplier_hostport_only = ":".join(s_splitted[:2])
-
-            # The function should be defined outside and
-            # it should have all the logic for figuring out the credentials.
-            # It is done for flexibility purpuses between CLI, WebUI and lib389 API applications
-            credentials = get_credentials(supplier_hostname, supplier_port)
-            if not credentials["binddn"]:
-                report_data[supplier_hostport_only] = [{"replica_status": "Unavailable - Bind DN was not specified"}]
-                continue
-
-            # Open a connection to the consumer
-            supplier_inst = DirSrv(verbose=self._instance.verbose)
-            args_instance = {SER_HOST: supplier_hostname}
-            if supplier_protocol == "ssl" or supplier_protocol == "ldaps":
-                args_instance[SER_SECURE_PORT] = int(supplier_port)
-            else:
-                args_instance[SER_PORT] = int(supplier_port)
-            args_instance[SER_ROOT_DN] = credentials["binddn"]
-            args_instance[SER_ROOT_PW] = credentials["bindpw"]
-            args_standalone = args_instance.copy()
-            supplier_inst.allocate(args_standalone)
-            try:
-                supplier_inst.open()
-            except ldap.LDAPError as e:
-                self._log.debug(f"Connection to consumer ({supplier_hostname}:{supplier_port}) failed, error: {e}")
-                report_data[supplier_hostport_only] = [{"replica_status": f"Unreachable - {e.args[0]['desc']}"}]
-                continue
-
-            report_data[supplier_hostport_only] = self._get_replica_status(supplier_inst, report_data, use_json)
-            repl_exists = True
+        # The report keeps the order in which the instances are found
+        queued = set([initial_inst_key])
+        pending = {}
+        try:
+            with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    for supplier in found:
+                        supplier_hostport_only = ":".join(supplier.split(":")[:2])
+                        if supplier_hostport_only in queued:
+                            continue
+                        queued.add(supplier_hostport_only)
+                        report_data[supplier_hostport_only] = None
+
+                        # The function should be defined outside and
+                        # it should have all the logic for figuring out the credentials.
+                        # It is done for flexibility purpuses between CLI, WebUI and lib389 API applications
+                        s_splitted = supplier.split(":")
+                        credentials = get_credentials(s_splitted[0], s_splitted[1])
+                        if not credentials["binddn"]:
+                            report_data[supplier_hostport_only] = [{"replica_status": "Unavailable - Bind DN was not specified"}]
+                            continue
+                        # The worker runs in a copy of the caller context, so what it
+                        # logs goes where the caller output goes (see dsconf rpc)
+                        future = executor.submit(contextvars.copy_context().run,
+                                                 self._get_supplier_status, supplier, credentials,
+                                                 use_json, ruv_cache)
+                        pending[future] = supplier_hostport_only
+
+                    if not pending:
+                        break
+                    done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                    found = {}
+                    for future in done:
+                        supplier_hostport_only = pending.pop(future)
+                        status, supplier_found = future.result()
+                        report_data[supplier_hostport_only] = status
+                        if supplier_found is not None:
+                            repl_exists = True
+                            found.update(supplier_found)
+        finally:
+            ruv_cache.close()
 
         # Get rid of the repeated items
         report_data_parsed = {}
@@ -2759,3 +2988,228 @@ class ReplicationMonitor(object):
                 report_data_final[key] = value
 
         return report_data_final
+
+
+# The number of samples kept for each agreement by the replication lag monitor
+REPL_LAG_HISTORY = 360
+
+
+class ReplicationLagMonitor(object):
+    """Sample the replication lag of the agreements of a supplier or hub at
+    a fixed interval. The connections to the consumers are kept open between
+    the samples, and the last samples of each agreement are kept to follow
+    the trends.
+
+    The lag of an agreement is the largest difference, over the replica IDs
+    of the supplier RUV, between the time of the supplier maxcsn and the time
+    of the consumer maxcsn. The CSN rate is the number of seconds of CSN time
+    the consumer applied per second since the previous sample.
+
+    :param instance: A supplier or hub
+    :type instance: lib389.DirSrv
+    :param get_credentials: A user-defined callback function with parameters (host, port) which returns
+                            a dictionary with binddn and bindpw keys to connect to the consumers. The
+                            supplier credentials are used by default.
+    :type get_credentials: function
+    :param history: The number of samples kept for each agreement
+    :type history: int
+    :param timeout: The connection and operation timeout for each consumer, in seconds
+    :type timeout: int
+    :param logger: A logging interface
+    :type logger: python logging
+    """
+
+    def __init__(self, instance, get_credentials=None, history=REPL_LAG_HISTORY, timeout=None, logger=None):
+        self._instance = instance
+        self._get_credentials = get_credentials
+        self._history_size = history
+        if logger is not None:
+            self._log = logger
+        else:
+            self._log = logging.getLogger(__name__)
+        self._ruv_cache = RUVCache(verbose=instance.verbose, timeout=timeout, logger=self._log)
+        self._credentials = {}
+        self._history = {}
+        self._supplier = f"{instance.config.get_attr_val_utf8_l('nsslapd-localhost')}:{instance.config.get_attr_val_utf8_l('nsslapd-port')}"
+        self._ruv_cache.register(self._supplier, instance)
+
+    @staticmethod
+    def _csn_time(csn):
+        """Get the time of a CSN, or None for a missing or empty CSN"""
+
+        if not csn:
+            return None
+        return int(csn[:8], 16) or None
+
+    def _get_consumer_credentials(self, host, port):
+        key = f"{host}:{port}"
+        if key not in self._credentials:
+            if self._get_credentials is not None:
+                self._credentials[key] = self._get_credentials(host, port)
+            else:
+                self._credentials[key] = {"binddn": self._instance.binddn,
+                                          "bindpw": self._instance.bindpw}
+        return self._credentials[key]
+
+    def _get_consumer_ruv(self, agmt, suffix):
+        """Read the RUV of an agreement consumer, keeping the connection open
+
+        :returns: RUV
+        :raises: LDAPError
+        """
+
+        host = agmt.get_attr_val_utf8_l(AGMT_HOST)
+        port = agmt.get_attr_val_utf8_l(AGMT_PORT)
+        protocol = agmt.get_attr_val_utf8_l('nsds5replicatransportinfo')
+        credentials = self._get_consumer_credentials(host, port)
+        consumer = self._ruv_cache.get_connection(host, port, protocol,
+                                                  credentials["binddn"], credentials["bindpw"])
+        try:
+            return RUV(self._ruv_cache.get_ruv_entry(consumer, suffix)['nsds50ruv'])
+        except (ldap.SERVER_DOWN, ldap.CONNECT_ERROR, ldap.TIMEOUT):
+            # Connect again on the next sample
+            self._ruv_cache.discard(host, port, credentials["binddn"])
+            raise
+
+    def sample(self):
+        """Read the supplier and consumer RUVs once, and compute the lag of
+        every agreement. The sample is added to the history.
+
+        :returns: A list of dicts, one per agreement, with the keys time,
+                  supplier, suffix, agreement, consumer, supplier_maxcsn,
+                  consumer_maxcsn, lag, csn_rate and error. lag and csn_rate
+                  are None when they are not known.
+        """
+
+        now = time.time()
+        self._ruv_cache.invalidate()
+        samples = []
+        for replica in Replicas(self._instance).list(prefetch=True):
+            suffix = replica.get_suffix()
+            supplier_ruv = RUV(self._ruv_cache.get_ruv_entry(self._instance, suffix)['nsds50ruv'])
+            for agmt in replica.get_agreements().list(prefetch=True):
+                consumer = "{}:{}".format(agmt.get_attr_val_utf8_l(AGMT_HOST), agmt.get_attr_val_utf8_l(AGMT_PORT))
+                sample = {"time": now,
+                          "supplier": self._supplier,
+                          "suffix": suffix,
+                          "agreement": agmt.get_attr_val_utf8('cn'),
+                          "consumer": consumer,
+                          "supplier_maxcsn": None,
+                          "consumer_maxcsn": None,
+                          "lag": None,
+                          "csn_rate": None,
+                          "error": None}
+                try:
+                    consumer_ruv = self._get_consumer_ruv(agmt, suffix)
+                except ldap.LDAPError as e:
+                    self._log.debug(f"Failed to read the RUV of consumer ({consumer}), error: {e}")
+                    sample["error"] = e.args[0]['desc'] if e.args and isinstance(e.args[0], dict) else str(e)
+                    consumer_ruv = None
+                if consumer_ruv is not None:
+                    lags = []
+                    for rid, maxcsn in supplier_ruv._rid_maxcsn.items():
+                        supplier_time = self._csn_time(maxcsn)
+                        con_maxcsn = consumer_ruv._rid_maxcsn.get(rid)
+                        consumer_time = self._csn_time(con_maxcsn)
+                        if supplier_time is None or consumer_time is None:
+                            continue
+                        lags.append(max(0, supplier_time - consumer_time))
+                        if sample["supplier_maxcsn"] is None or maxcsn > sample["supplier_maxcsn"]:
+                            sample["supplier_maxcsn"] = maxcsn
+                        if sample["consumer_maxcsn"] is None or con_maxcsn > sample["consumer_maxcsn"]:
+                            sample["consumer_maxcsn"] = con_maxcsn
+                    if lags:
+                        sample["lag"] = max(lags)
+
+                history = self._history.setdefault(agmt.dn, deque(maxlen=self._history_size))
+                if history and sample["consumer_maxcsn"] is not None and history[-1]["consumer_maxcsn"] is not None:
+                    elapsed = now - history[-1]["time"]
+                    if elapsed > 0:
+                        applied = self._csn_time(sample["consumer_maxcsn"]) - self._csn_time(history[-1]["consumer_maxcsn"])
+                        sample["csn_rate"] = applied / elapsed
+                history.append(sample)
+                samples.append(sample)
+        return samples
+
+    def watch(self, interval, count=None):
+        """Take a sample every interval seconds
+
+        :param interval: The number of seconds between two samples
+        :type interval: int
+        :param count: The number of samples to take, None to never stop
+        :type count: int
+        :returns: A generator of the samples, see sample()
+        """
+
+        taken = 0
+        next_sample = time.monotonic()
+        while count is None or taken < count:
+            yield self.sample()
+            taken += 1
+            if count is not None and taken >= count:
+                break
+            next_sample += interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # The sample took longer than the interval, don't try to catch up
+                next_sample = time.monotonic()
+
+    def get_history(self, agmt_dn=None):
+        """Get the samples kept for the agreements
+
+        :param agmt_dn: The DN of an agreement, None for all the agreements
+        :type agmt_dn: str
+        :returns: A list of samples, or a dict of the agreement DN to its samples
+        """
+
+        if agmt_dn is not None:
+            return list(self._history.get(agmt_dn, []))
+        return {dn: list(samples) for dn, samples in self._history.items()}
+
+    @staticmethod
+    def to_json_lines(samples):
+        """Format samples as JSON lines, one JSON object per agreement
+
+        :param samples: The samples, see sample()
+        :type samples: list
+        :returns: str
+        """
+
+        return "\n".join(json.dumps(sample, sort_keys=True) for sample in samples)
+
+    def to_prometheus(self):
+        """Format the last sample of every agreement in the Prometheus text
+        exposition format
+
+        :returns: str
+        """
+
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        metrics = [("ds_replication_lag_seconds", "The replication lag of the agreement consumer, in seconds.",
+                    lambda sample: sample["lag"]),
+                   ("ds_replication_csn_rate", "The seconds of CSN time applied by the consumer per second.",
+                    lambda sample: sample["csn_rate"]),
+                   ("ds_replication_consumer_up", "1 if the RUV of the consumer could be read, else 0.",
+                    lambda sample: 0 if sample["error"] else 1)]
+        lines = []
+        for name, desc, get_value in metrics:
+            lines.append(f"# HELP {name} {desc}")
+            lines.append(f"# TYPE {name} gauge")
+            for samples in self._history.values():
+                sample = samples[-1]
+                value = get_value(sample)
+                if value is None:
+                    continue
+                labels = ",".join(f'{label}="{escape(sample[label])}"'
+                                  for label in ("supplier", "suffix", "agreement", "consumer"))
+                lines.append(f"{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Close the connections to the consumers"""
+
+        self._ruv_cache.close()
@@ -10,6 +10,7 @@
    You will access this from:
    schema = Schema(instance)
 """
+import copy
 import glob
 import ldap
 import ldif
@@ -68,6 +69,131 @@ ATTR_SYNTAXES = {"1.3.6.1.4.1.1466.115.121.1.5": "Binary",
 X_ORIGIN_REGEX = r'\'(.*?)\''
 
 
+SCHEMA_MODELS = (AttributeType, ObjectClass, MatchingRule)
+
+
+class SchemaCache(object):
+    """The parsed schema definitions of a given schema CSN
+
+    The definitions are parsed on first use, and indexed by their lower case
+    names and aliases.  The objectclasses are also indexed by the attributes
+    they must or may have.  The cached objects are shared, so they should be
+    copied before being modified or handed to a caller.
+
+    :param csn: The nsSchemaCSN of the schema
+    :type csn: str
+    :param values: The schema definitions of each object model
+    :type values: dict
+    """
+
+    def __init__(self, csn, values):
+        self.csn = csn
+        self._values = values
+        self._objects = {}
+        self._json_objects = {}
+        self._index = {}
+        self._json_index = {}
+        self._must = None
+        self._may = None
+
+    @staticmethod
+    def _to_json(object_model, obj):
+        obj_i = vars(object_model(obj))
+        if len(obj_i["names"]) == 1:
+            obj_i['name'] = obj_i['names'][0]
+            obj_i['aliases'] = None
+        elif len(obj_i["names"]) > 1:
+            obj_i['name'] = obj_i['names'][0]
+            obj_i['aliases'] = obj_i['names'][1:]
+        else:
+            obj_i['name'] = ""
+
+        # Temporary workaround for X-ORIGIN in ObjectClass objects.
+        # It should be removed after https://github.com/python-ldap/python-ldap/pull/247 is merged
+        if " X-ORIGIN " in obj and obj_i['names'] == vars(object_model(obj))['names']:
+            remainder = obj.split(" X-ORIGIN ")[1]
+            if remainder[:1] == "(":
+                # Have multiple values
+                end = remainder.rfind(')')
+                vals = remainder[1:end]
+                vals = re.findall(X_ORIGIN_REGEX, vals)
+                # For now use the first value, but this should be a set (another bug in python-ldap)
+                obj_i['x_origin'] = vals[0]
+            else:
+                # Single X-ORIGIN value
+                obj_i['x_origin'] = obj.split(" X-ORIGIN ")[1].split("'")[1]
+        return obj_i
+
+    @staticmethod
+    def _build_index(objects, get_names):
+        index = {}
+        for obj_i in objects:
+            for name in get_names(obj_i):
+                index.setdefault(name.lower(), []).append(obj_i)
+        return index
+
+    def get_objects(self, object_model):
+        """Return the sorted python-ldap objects of a model"""
+
+        if object_model not in self._objects:
+            object_insts = [object_model(obj_i) for obj_i in self._values[object_model]]
+            self._objects[object_model] = sorted(object_insts, key=lambda x: x.names, reverse=False)
+        return self._objects[object_model]
+
+    def get_json_objects(self, object_model):
+        """Return the sorted JSON representations of the objects of a model"""
+
+        if object_model not in self._json_objects:
+            object_insts = [self._to_json(object_model, obj) for obj in self._values[object_model]]
+            object_insts = sorted(object_insts, key=itemgetter('name'))
+            # Ensure that the string values are in list so we can use React filter component with it
+            for obj_i in object_insts:
+                for key, value in obj_i.items():
+                    if isinstance(value, str):
+                        obj_i[key] = (value, )
+            self._json_objects[object_model] = object_insts
+        return self._json_objects[object_model]
+
+    def lookup(self, name, object_model, json=False):
+        """Return the object of a model with a name or alias, or None if
+        there is not exactly one such object
+        """
+
+        if json:
+            if object_model not in self._json_index:
+                self._json_index[object_model] = self._build_index(self.get_json_objects(object_model),
+                                                                   lambda obj_i: obj_i["names"])
+            index = self._json_index[object_model]
+        else:
+            if object_model not in self._index:
+                self._index[object_model] = self._build_index(self.get_objects(object_model),
+                                                              lambda obj_i: obj_i.names)
+            index = self._index[object_model]
+        schema_object = index.get(name.lower(), [])
+        if len(schema_object) != 1:
+            return None
+        return schema_object[0]
+
+    def get_must_may(self, attributetypenames):
+        """Return the lists of the objectclasses that must and may have one
+        of the attribute names
+        """
+
+        if self._must is None:
+            self._must = {}
+            self._may = {}
+            for oc in self.get_objects(ObjectClass):
+                for index, attrs in ((self._must, oc.must), (self._may, oc.may)):
+                    for attr in set(map(str.lower, attrs)):
+                        index.setdefault(attr, []).append(oc)
+        must = []
+        may = []
+        for attributetypename in attributetypenames:
+            must.extend(self._must.get(attributetypename.lower(), []))
+            may.extend(self._may.get(attributetypename.lower(), []))
+        return must, may
+
+
 class Schema(DSLdapObject):
     """An object that represents the schema entry
 
@@ -116,71 +242,63 @@ class Schema(DSLdapObject):
             result = ATTR_SYNTAXES
         return result
 
+    def _get_schema_cache(self):
+        """Return the SchemaCache of the current schema CSN.  The parsed
+        schema is shared by all the Schema objects of the instance, and the
+        schema is only fetched again when its CSN changes, or when it was
+        changed or reloaded through a Schema object.
+        """
+        # A schema reload does not change the CSN: nothing is cached until
+        # the reload task is complete.
+        reload_task = getattr(self._instance, '_schema_reload_task', None)
+        if reload_task is not None and reload_task.is_complete():
+            self._instance._schema_reload_task = None
+            reload_task = None
+        csn = self.get_schema_csn()
+        cache = getattr(self._instance, '_schema_cache', None)
+        if reload_task is None and cache is not None and csn is not None and cache.csn == csn:
+            return cache
+        attrs = [model.schema_attribute for model in SCHEMA_MODELS] + ['nsSchemaCSN']
+        entry = self.get_attrs_vals_utf8(attrs)
+        csn = (entry.get('nsSchemaCSN') or [None])[0]
+        cache = SchemaCache(csn, {model: entry.get(model.schema_attribute, []) for model in SCHEMA_MODELS})
+        if reload_task is None:
+            self._instance._schema_cache = cache
+        return cache
+
+    def invalidate_schema_cache(self):
+        """Drop the parsed schema of the instance, the next query fetches the
+        schema again even if its CSN did not change.  The CSN has a one second
+        resolution, so a change and a query in the same second keep it.
+        """
+        self._instance._schema_cache = None
+
     def _get_schema_objects(self, object_model, json=False):
         """Get all the schema objects for a specific model: Attribute, Objectclass,
         or Matchingreule.
         """
-        attr_name = self._get_attr_name_by_model(object_model)
-        results = self.get_attr_vals_utf8(attr_name)
+        self._get_attr_name_by_model(object_model)
+        cache = self._get_schema_cache()
 
         if json:
-            object_insts = []
-            for obj in results:
-                obj_i = vars(object_model(obj))
-                if len(obj_i["names"]) == 1:
-                    obj_i['name'] = obj_i['names'][0]
-                    obj_i['aliases'] = None
-                elif len(obj_i["names"]) > 1:
-                    obj_i['name'] = obj_i['names'][0]
-                    obj_i['aliases'] = obj_i['names'][1:]
-                else:
-                    obj_i['name'] = ""
-
-                # Temporary workaround for X-ORIGIN in ObjectClass objects.
-                # It should be removed after https://github.com/python-ldap/python-ldap/pull/247 is merged
-                if " X-ORIGIN " in obj and obj_i['names'] == vars(object_model(obj))['names']:
-                    remainder = obj.split(" X-ORIGIN ")[1]
-                    if remainder[:1] == "(":
-                        # Have multiple values
-                        end = remainder.rfind(')')
-                        vals = remainder[1:end]
-                        vals = re.findall(X_ORIGIN_REGEX, vals)
-                        # For now use the first value, but this should be a set (another bug in python-ldap)
-                        obj_i['x_origin'] = vals[0]
-                    else:
-                        # Single X-ORIGIN value
-                        obj_i['x_origin'] = obj.split(" X-ORIGIN ")[1].split("'")[1]
-                object_insts.append(obj_i)
-
-            object_insts = sorted(object_insts, key=itemgetter('name'))
-            # Ensure that the string values are in list so we can use React filter component with it
-            for obj_i in object_insts:
-                for key, value in obj_i.items():
-                    if isinstance(value, str):
-                        obj_i[key] = (value, )
-
-            return {'type': 'list', 'items': object_insts}
+            return {'type': 'list', 'items': [dict(obj_i) for obj_i in cache.get_json_objects(object_model)]}
         else:
-            object_insts = [object_model(obj_i) for obj_i in results]
-            return sorted(object_insts, key=lambda x: x.names, reverse=False)
+            return [copy.copy(obj_i) for obj_i in cache.get_objects(object_model)]
 
     def _get_schema_object(self, name, object_model, json=False):
-        objects = self._get_schema_objects(object_model, json=json)
-        if json:
-            schema_object = [obj_i for obj_i in objects["items"] if name.lower() in
-                             list(map(str.lower, obj_i["names"]))]
-        else:
-            schema_object = [obj_i for obj_i in objects if name.lower() in
-                             list(map(str.lower, obj_i.names))]
+        self._get_attr_name_by_model(object_model)
+        schema_object = self._get_schema_cache().lookup(name, object_model, json=json)
 
-        if len(schema_object) != 1:
+        if schema_object is None:
             # This is an error.
             if json:
                 raise ValueError('Could not find: %s' % name)
             else:
                 return None
 
-        return schema_object[0]
+        if json:
+            return dict(schema_object)
+        return copy.copy(schema_object)
 
     def _add_schema_object(self, parameters, object_model):
         attr_name = self._get_attr_name_by_model(object_model)
@@ -222,13 +340,19 @@ class Schema(DSLdapObject):
             if k == "x_origin" and v is None:
                 continue
             setattr(schema_object, k, OBJECT_MODEL_PARAMS[object_model][k])
-        return self.add(attr_name, str(schema_object))
+        try:
+            return self.add(attr_name, str(schema_object))
+        finally:
+            self.invalidate_schema_cache()
 
     def _remove_schema_object(self, name, object_model):
         attr_name = self._get_attr_name_by_model(object_model)
         schema_object = self._get_schema_object(name, object_model)
 
-        return self.remove(attr_name, str(schema_object))
+        try:
+            return self.remove(attr_name, str(schema_object))
+        finally:
+            self.invalidate_schema_cache()
 
     def _edit_schema_object(self, name, parameters, object_model):
         attr_name = self._get_attr_name_by_model(object_model)
@@ -274,12 +398,15 @@ class Schema(DSLdapObject):
         if schema_object_str == schema_object_str_old:
             raise ValueError('Schema is already in the required state. Nothing to change')
 
-        self.remove(attr_name, schema_object_str_old)
         try:
-            return self.add(attr_name, schema_object_str)
-        except ldap.LDAPError:
-            self.add(attr_name, schema_object_str_old)
-            raise
+            self.remove(attr_name, schema_object_str_old)
+            try:
+                return self.add(attr_name, schema_object_str)
+            except ldap.LDAPError:
+                self.add(attr_name, schema_object_str_old)
+                raise
+        finally:
+            self.invalidate_schema_cache()
 
     def reload(self, schema_dir=None):
         """Reload the schema"""
@@ -291,6 +418,8 @@ class Schema(DSLdapObject):
             task_properties['schemadir'] = schema_dir
 
         task.create(properties=task_properties)
+        self.invalidate_schema_cache()
+        self._instance._schema_reload_task = task
 
         return task
 
@@ -491,8 +620,10 @@ class Schema(DSLdapObject):
         # First, get the attribute that matches name. We need to consider
         # alternate names. There is no way to search this, so we have to
         # filter our set of all attribute types.
+        cache = self._get_schema_cache()
         attributetype = self._get_schema_object(attributetypename, AttributeType, json=json)
-        objectclasses = self.get_objectclasses()
+        if attributetype is None:
+            return None
 
         # Get the primary name of this attribute
         if json:
@@ -500,21 +631,13 @@ class Schema(DSLdapObject):
         else:
             attributetypenames = attributetype.names
 
-        # Build a set if they have may.
-        may = []
-        for attributetypename in attributetypenames:
-            may.extend([oc for oc in objectclasses if attributetypename.lower() in
-                        list(map(str.lower, oc.may))])
-        # Build a set if they have must.
-        must = []
-        for attributetypename in attributetypenames:
-            must.extend([oc for oc in objectclasses if attributetypename.lower() in
-                         list(map(str.lower, oc.must))])
+        # Get the objectclasses that must or may have one of its names
+        must, may = cache.get_must_may(attributetypenames)
 
         if json:
             # convert Objectclass class to dict, then sort each list
-            may = [vars(oc) for oc in may]
-            must = [vars(oc) for oc in must]
+            may = [dict(vars(oc)) for oc in may]
+            must = [dict(vars(oc)) for oc in must]
             # Add normalized 'name' for sorting
             for oc in may:
                 oc['name'] = oc['names'][0]
@@ -528,7 +651,7 @@ class Schema(DSLdapObject):
                       'must': must}
             return result
         else:
-            return str(attributetype), may, must
+            return str(attributetype), [copy.copy(oc) for oc in may], [copy.copy(oc) for oc in must]
 
     def validate_syntax(self, basedn, _filter=None):
         """Create a validate syntax task
@@ -9,9 +9,11 @@
 import time
 import os.path
 import ldap
+import ldap.dn
+from ldap.controls.psearch import PersistentSearchControl, EntryChangeNotificationControl, CHANGE_TYPES_INT
 from datetime import datetime
 from lib389 import Entry
-from lib389._mapped_object import DSLdapObject
+from lib389._mapped_object import DSLdapObject, _search_ext_s
 from lib389.utils import ensure_str
 from lib389.exceptions import Error
 from lib389._constants import *
@@ -21,6 +23,20 @@ from lib389.properties import (
         )
 
 
+# The attributes holding the state of a task, read in a single search
+TASK_STATUS_ATTRS = ['nsTaskExitCode', 'nsTaskLog', 'nsTaskWarning', 'nsTaskStatus']
+# The first pause between two polls of unfinished tasks, it is doubled up
+# to the sleep_interval of the wait
+TASK_POLL_MIN_INTERVAL = 0.1
+# How often the tasks are searched again while waiting on a persistent
+# search, in case a change notification was lost
+TASK_PSEARCH_RECHECK = 30
+
+
+def _normalize_task_dn(dn):
+    return ldap.dn.dn2str(ldap.dn.str2dn(ensure_str(dn).lower()))
+
+
 class Task(DSLdapObject):
     """A single instance of a task entry
 
@@ -36,29 +52,59 @@ class Task(DSLdapObject):
         self._must_attributes = ['cn']
         self._create_objectclasses = ['top', 'extensibleObject']
         self._protected = False
+        self._reset_status()
+
+    def _reset_status(self):
+        """Forget the cached state of a previous run of the task"""
+
         self._exit_code = None
         self._task_log = ""
         self._task_warn = None
+        self._task_status = None
+        self._completed = False
 
     def status(self):
         """Return the decoded status of the task
         """
         return self.get_attr_val_utf8('nsTaskStatus')
 
-    def is_complete(self):
-        """Return True if task is complete, else False."""
+    def _update_status(self, entry):
+        """Update the task state from an entry holding TASK_STATUS_ATTRS,
+        or from None if the task entry does not exist anymore
 
-        self._exit_code = self.get_attr_val_utf8("nsTaskExitCode")
-        self._task_log = self.get_attr_val_utf8("nsTaskLog")
-        self._task_warn = self.get_attr_val_utf8("nsTaskWarning")
-        if not self.exists():
+        :returns: True if the task is complete
+        """
+
+        if entry is None:
             self._log.debug("complete: task has self cleaned ...")
             # The task cleaned it self up.
+            self._completed = True
             return True
-        elif self._exit_code is not None:
-            self._log.debug("complete status: %s -> %s" % (self._exit_code, self.status()))
+        self._exit_code = entry.getValue('nsTaskExitCode')
+        self._task_log = entry.getValue('nsTaskLog')
+        self._task_warn = entry.getValue('nsTaskWarning')
+        self._task_status = entry.getValue('nsTaskStatus')
+        for attr in ('_exit_code', '_task_log', '_task_warn', '_task_status'):
+            if getattr(self, attr) is not None:
+                setattr(self, attr, ensure_str(getattr(self, attr)))
+        if self._exit_code is not None:
+            self._log.debug("complete status: %s -> %s" % (self._exit_code, self._task_status))
+            self._completed = True
+        return self._completed
+
+    def is_complete(self):
+        """Return True if task is complete, else False."""
+
+        # A finished task does not change anymore, there is no need to read it again
+        if self._completed:
             return True
-        return False
+        try:
+            entries = _search_ext_s(self._instance, self._dn, ldap.SCOPE_BASE, self._object_filter,
+                                    attrlist=TASK_STATUS_ATTRS, serverctrls=self._server_controls,
+                                    clientctrls=self._client_controls, escapehatch='i am sure')
+        except ldap.NO_SUCH_OBJECT:
+            entries = []
+        return self._update_status(entries[0] if entries else None)
 
     def get_exit_code(self):
         """Return task's exit code if task is complete, else None."""
@@ -89,17 +135,17 @@ class Task(DSLdapObject):
         return None
 
     def wait(self, timeout=120, sleep_interval=2):
-        """Wait until task is complete."""
+        """Wait until task is complete.
+
+        The task entry is watched with a persistent search when the server
+        allows it, else it is polled with an increasing pause of up to
+        sleep_interval seconds.
+        """
 
-        time_passed = 0
         if timeout is None or timeout == 0:
             self._log.debug("No timeout is set, this may take a long time ...")
-
-        while timeout is None or timeout == 0 or time_passed < timeout:
-            if self.is_complete():
-                break
-            time_passed = time_passed + sleep_interval
-            time.sleep(sleep_interval)
+        for task in wait_for_tasks([self], timeout=timeout, sleep_interval=sleep_interval):
+            pass
 
     def create(self, rdn=None, properties={}, basedn=None):
         """Create a Task entry
@@ -115,6 +161,9 @@ class Task(DSLdapObject):
         """
 
         properties['cn'] = self.cn
+        # is_complete() trusts a cached completion, it must not be the one
+        # of a previous run
+        self._reset_status()
         return super(Task, self).create(rdn, properties, basedn)
 
     @staticmethod
@@ -124,6 +173,130 @@ class Task(DSLdapObject):
         return datetime.now().isoformat()
 
 
+def _wait_for_tasks_psearch(instance, pending, deadline):
+    """Wait for the pending tasks with a persistent search on cn=tasks.
+
+    Returns when all the tasks are complete, at the deadline, or if the
+    server refuses or ends the persistent search. The tasks still pending
+    are left in pending.
+    """
+
+    ctrl = PersistentSearchControl(criticality=True, changeTypes=['add', 'delete', 'modify'],
+                                   changesOnly=False, returnECs=True)
+    try:
+        msgid = instance.search_ext(DN_TASKS, ldap.SCOPE_SUBTREE, '(objectClass=*)',
+                                    attrlist=TASK_STATUS_ATTRS, serverctrls=[ctrl],
+                                    escapehatch='i am sure')
+    except ldap.LDAPError as e:
+        instance.log.debug("Persistent search on tasks failed, polling them: %s" % e)
+        return
+    recheck = time.monotonic() + TASK_PSEARCH_RECHECK
+    try:
+        while pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return
+            if now >= recheck:
+                for dn, task in list(pending.items()):
+                    if task.is_complete():
+                        del pending[dn]
+                        yield task
+                recheck = now + TASK_PSEARCH_RECHECK
+                continue
+            wait = recheck - now
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            try:
+                rtype, rdata, _, _, _, _ = instance.result4(msgid, all=0, timeout=wait, add_ctrls=1)
+            except ldap.TIMEOUT:
+                continue
+            if rtype == ldap.RES_SEARCH_RESULT:
+                # The server ended the persistent search
+                instance.log.debug("Persistent search on tasks ended, polling them")
+                return
+            if rtype != ldap.RES_SEARCH_ENTRY:
+                continue
+            for dn, attrs, ctrls in rdata:
+                task = pending.get(_normalize_task_dn(dn))
+                if task is None:
+                    continue
+                deleted = any(isinstance(c, EntryChangeNotificationControl) and c.changeType == CHANGE_TYPES_INT['delete']
+                              for c in ctrls)
+                if task._update_status(None if deleted else Entry((dn, attrs))):
+                    del pending[_normalize_task_dn(dn)]
+                    yield task
+    except ldap.LDAPError as e:
+        instance.log.debug("Persistent search on tasks failed, polling them: %s" % e)
+    finally:
+        try:
+            instance.abandon(msgid)
+        except ldap.LDAPError:
+            pass
+
+
+def _wait_for_tasks_poll(pending, deadline, sleep_interval):
+    """Poll the pending tasks, with a pause doubling from TASK_POLL_MIN_INTERVAL
+    up to sleep_interval seconds between two rounds.
+    """
+
+    pause = min(TASK_POLL_MIN_INTERVAL, sleep_interval)
+    while pending:
+        for dn, task in list(pending.items()):
+            if task.is_complete():
+                del pending[dn]
+                yield task
+        if not pending:
+            return
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(pause, remaining))
+        else:
+            time.sleep(pause)
+        pause = min(pause * 2, sleep_interval)
+
+
+def wait_for_tasks(tasks, timeout=120, sleep_interval=2):
+    """Wait until the tasks are complete, and yield each task as soon as it
+    is complete.
+
+    When the tasks belong to the same instance they are watched with a
+    persistent search on cn=tasks,cn=config, else or if the server refuses
+    it, they are polled with a pause doubling up to sleep_interval seconds.
+    Every check of a task reads all its status attributes in one search.
+
+    :param tasks: The tasks to wait for
+    :type tasks: list of Task
+    :param timeout: The number of seconds to wait, None or 0 to wait forever
+    :type timeout: int
+    :param sleep_interval: The longest pause between two polls of the tasks
+    :type sleep_interval: int
+    :returns: A generator of the tasks, in the order they complete. The tasks
+              not complete at the timeout are not yielded.
+    """
+
+    pending = {}
+    for task in tasks:
+        if task.is_complete():
+            yield task
+        else:
+            pending[_normalize_task_dn(task.dn)] = task
+    if not pending:
+        return
+
+    deadline = None
+    if timeout is not None and timeout != 0:
+        deadline = time.monotonic() + timeout
+    instances = {id(task._instance): task._instance for task in pending.values()}
+    if len(instances) == 1:
+        instance = list(instances.values())[0]
+        yield from _wait_for_tasks_psearch(instance, pending, deadline)
+    if deadline is not None and time.monotonic() >= deadline:
+        return
+    yield from _wait_for_tasks_poll(pending, deadline, sleep_interval)
+
+
 class AutomemberRebuildMembershipTask(Task):
     """A single instance of automember rebuild membership task entry
 
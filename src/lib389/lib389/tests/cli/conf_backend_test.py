@@ -11,6 +11,7 @@ import io
 import sys
 import pytest
 import time
+import json
 
 from lib389.cli_conf.backend import (backend_list, backend_get, backend_set, backend_get_dn,
                                      backend_create, backend_delete, backend_export,
@@ -19,7 +20,7 @@ from lib389.cli_conf.backend import (backend_list, backend_get, backend_set, bac
                                      backend_del_index, backend_attr_encrypt, get_monitor,
                                      backend_create_vlv, backend_del_vlv, backend_create_vlv_index,
                                      backend_get_vlv, backend_edit_vlv, backend_reindex_vlv,
-                                     backend_list_vlv)
+                                     backend_list_vlv, backend_get_tree)
 
 from lib389.cli_base import LogCapture, FakeArgs
 from lib389.tests.cli import check_output
@@ -191,6 +192,48 @@ def test_backend_cli(topology_st, create_backend):
     # Done!
 
 
+def test_backend_get_tree(topology_st, create_backend):
+    """Test the suffix tree of the backends
+
+    :id: 5c0e2a7d-9b3f-4f16-8d41-7e6a2b9c1f05
+    :setup: Standalone instance
+    :steps:
+        1. Add a subsuffix
+        2. Get the suffix tree
+        3. Delete the subsuffix
+    :expectedresults:
+        1. Success
+        2. The subsuffix is a child of the backend suffix
+        3. Success
+    """
+    topology_st.logcap = LogCapture()
+    sys.stdout = io.StringIO()
+
+    args = FakeArgs()
+    args.json = False
+    args.parent_suffix = SUFFIX
+    args.suffix = SUB_SUFFIX
+    args.be_name = SUB_BE_NAME
+    args.create_entries = True
+    backend_create(topology_st.standalone, None, topology_st.logcap.log, args)
+    check_output("The database was successfully created")
+
+    args.json = True
+    backend_get_tree(topology_st.standalone, None, topology_st.logcap.log, args)
+    nodes = json.loads(topology_st.logcap.outputs[-1].getMessage())
+    node = [node for node in nodes if node['id'] == SUFFIX][0]
+    assert node['type'] == 'suffix'
+    assert node['be'] == BE_NAME
+    assert [(sub['id'], sub['type'], sub['be']) for sub in node['children']] == \
+        [(SUB_SUFFIX, 'subsuffix', SUB_BE_NAME.lower())]
+    assert SUB_SUFFIX not in [node['id'] for node in nodes]
+
+    args.json = False
+    args.ack = True
+    backend_delete(topology_st.standalone, None, topology_st.logcap.log, args, warn=False)
+    check_output("successfully deleted")
+
+
 def test_indexes(topology_st, create_backend):
     """Test creating, listing, getting, and deleting an index
 
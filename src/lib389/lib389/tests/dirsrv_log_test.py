@@ -9,9 +9,11 @@
 from lib389._constants import *
 from lib389.utils import ensure_bytes, ensure_str
 from lib389 import DirSrv, Entry
+from lib389.dirsrv_log import AccessLogStats
 import pytest
 import time
 import shutil
+import gzip
 import datetime
 from dateutil.tz import tzoffset
 
@@ -63,6 +65,31 @@ def test_access_log_rotation(topology):
     assert(len(access_lines) > 0)
 
 
+def test_access_log_iter(topology):
+    """
+    Check we can stream rotated, compressed and current logs in time order,
+    backwards and in a time window.
+    """
+    access_log = topology.standalone.ds_access_log
+    lpath = access_log._get_log_path()
+    shutil.copyfile(lpath, lpath + '.20160516-104822')
+    with open(lpath, 'rb') as lf, gzip.open(lpath + '.20160517-104822.gz', 'wb') as gz:
+        shutil.copyfileobj(lf, gz)
+
+    access_lines = access_log.readlines_archive()
+    assert(list(access_log.iter_lines(archive=True)) == access_lines)
+    assert(list(access_log.iter_lines(archive=True, reverse=True)) == access_lines[::-1])
+
+    fd_lines = access_log.match_archive('.*fd=.*')
+    assert(len(fd_lines) > 0)
+    assert(access_log.match_last('.*fd=.*', count=2, archive=True) == fd_lines[-2:])
+    assert(list(access_log.iter_match('.*fd=.*', archive=True, limit=1)) == fd_lines[:1])
+
+    # Nothing was logged in the future
+    since = datetime.datetime.now() + datetime.timedelta(days=1)
+    assert(list(access_log.iter_lines(archive=True, since=since)) == [])
+
+
 def test_access_log(topology):
     """Check the parsing of the access log"""
     access_lines = topology.standalone.ds_access_log.readlines()
@@ -101,6 +128,37 @@ def test_access_log(topology):
     )
 
 
+def test_access_log_stats(tmp_path):
+    """Check the columnar access log parser and its aggregates"""
+    rotated = tmp_path / 'access.20160427-124949.gz'
+    current = tmp_path / 'access'
+    with gzip.open(str(rotated), 'wt') as lf:
+        lf.write('[27/Apr/2016:12:49:49.726093186 +1000] conn=1 fd=64 slot=64 connection from ::1 to ::1\n'
+                 '[27/Apr/2016:12:49:49.727235997 +1000] conn=1 op=0 BIND dn="cn=Directory Manager" method=128 version=3\n'
+                 '[27/Apr/2016:12:49:49.727235997 +1000] conn=1 op=0 RESULT err=0 tag=97 nentries=0 wtime=0.000100 optime=0.000200 etime=0.000300 dn="cn=directory manager"\n'
+                 '[27/Apr/2016:12:49:50.100000000 +1000] conn=1 op=1 SRCH base="dc=example,dc=com" scope=2 filter="(uid=*)" attrs=ALL\n')
+    current.write_text('[27/Apr/2016:12:49:51.000000000 +1000] conn=1 op=1 RESULT err=0 tag=101 nentries=10 wtime=0.1 optime=2.0 etime=2.1 notes=A\n'
+                       '[27/Apr/2016:12:49:52.000000000 +1000] conn=2 op=1 SRCH base="dc=example,dc=com" scope=2 filter="(uid=*)" attrs=ALL\n'
+                       '[27/Apr/2016:12:49:52.500000000 +1000] conn=2 op=1 RESULT err=32 tag=101 nentries=0 etime=0.5\n'
+                       '[27/Apr/2016:12:49:53.000000000 +1000] conn=2 op=2 MOD dn="uid=demo"\n'
+                       '[27/Apr/2016:12:49:53.500000000 +1000] conn=2 op=2 RESULT err=0 tag=103 nentries=0 wtime=0.0 optime=0.1 etime=0.1\n')
+
+    for workers in [1, 2]:
+        stats = AccessLogStats.parse_files([str(rotated), str(current)], workers=workers)
+        assert(len(stats) == 4)
+        # The search result in the current log is matched with its request in the rotated log
+        assert(stats.optype_counts() == {'BIND': 1, 'SRCH': 2, 'MOD': 1})
+        assert(stats.time[0] == datetime.datetime(2016, 4, 27, 12, 49, 49, 727236,
+                                                  tzinfo=tzoffset(None, 36000)).timestamp())
+        assert(stats.percentiles(percents=(50, 100)) == {50: 0.1, 100: 2.1})
+        assert(stats.percentiles(optype='SRCH', percents=(50,)) == {50: 0.5})
+        assert(stats.top_filters(count=1) == [{'filter': '(uid=*)', 'count': 2, 'total': 2.6,
+                                              'avg': 1.3, 'max': 2.1}])
+        conns = stats.connections()
+        assert([conn['conn'] for conn in conns] == [1, 2])
+        assert(conns[1]['errors'] == 1)
+
+
 def test_error_log(topology):
     """Check the parsing of the error log"""
     # No need to sleep, it's not buffered.
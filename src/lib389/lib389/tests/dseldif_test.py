@@ -128,3 +128,69 @@ def test_delete_multivalue(topo):
     dse_ldif.delete(DN_CONFIG, fake_attr)
     assert not dse_ldif.get(DN_CONFIG, fake_attr)
 
+
+
+def test_transaction(topo):
+    """Check that the changes of a transaction are written once, or dropped"""
+
+    dse_ldif = DSEldif(topo.standalone)
+    fake_attr = "fakeAttr"
+    fake_attr_values = ["fake1", "fake2", "fake3"]
+
+    log.info("Add multivalued {} to {} in a transaction".format(fake_attr, DN_CONFIG))
+    with dse_ldif.transaction():
+        for value in fake_attr_values:
+            dse_ldif.add(DN_CONFIG, fake_attr, value)
+        assert len(dse_ldif.get(DN_CONFIG, fake_attr)) == 3
+        assert not DSEldif(topo.standalone).get(DN_CONFIG, fake_attr)
+    assert len(DSEldif(topo.standalone).get(DN_CONFIG, fake_attr)) == 3
+
+    log.info("Check that a failed transaction drops its changes")
+    with pytest.raises(ValueError):
+        with dse_ldif.transaction():
+            dse_ldif.delete(DN_CONFIG, fake_attr)
+            dse_ldif.delete(DN_CONFIG, fake_attr)
+    assert len(dse_ldif.get(DN_CONFIG, fake_attr)) == 3
+
+    log.info("Clean up")
+    dse_ldif.delete(DN_CONFIG, fake_attr)
+    assert not DSEldif(topo.standalone).get(DN_CONFIG, fake_attr)
+
+
+def test_substitute_folding_and_delete_dn(tmp_path):
+    """Check that a substitution keeps the folding of a line, and that an
+    entry is deleted without changing the others
+    """
+
+    path = tmp_path / 'dse.ldif'
+    long_value = 'x' * 100 + ' /old/path'
+    text = f'description: {long_value}\n'
+    folded = text[:78] + '\n ' + text[78:]
+    path.write_text('dn: cn=config\n'
+                    'cn: config\n'
+                    f'{folded}'
+                    '\n'
+                    'dn: cn=first,cn=config\n'
+                    'cn: first\n'
+                    '\n'
+                    'dn: cn=second,cn=config\n'
+                    'cn: second\n'
+                    'nsslapd-directory: /old/path\n'
+                    '\n')
+    dse_ldif = DSEldif(None, path=str(path))
+
+    log.info("Substitute a value of a folded line")
+    dse_ldif.globalSubstitute('/old/path', '/new/path')
+    lines = path.read_text().splitlines()
+    assert lines[2] == text[:78]
+    assert all(len(line) <= 78 for line in lines)
+    assert dse_ldif.get('cn=config', 'description') == ['x' * 100 + ' /new/path']
+    assert dse_ldif.get('cn=second,cn=config', 'nsslapd-directory') == ['/new/path']
+    assert 'nsslapd-directory: /new/path' in lines
+
+    log.info("Delete an entry")
+    dse_ldif.delete_dn('cn=first,cn=config')
+    assert dse_ldif.get('cn=first,cn=config', 'cn') is None
+    reloaded = DSEldif(None, path=str(path))
+    assert [dn for (dn, _) in reloaded.get_entries()] == ['cn=config', 'cn=second,cn=config']
+    assert reloaded.get('cn=config', 'description') == ['x' * 100 + ' /new/path']
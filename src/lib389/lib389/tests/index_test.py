@@ -13,7 +13,7 @@ import ldap
 from lib389.topologies import topology_st
 
 from lib389.backend import Backends
-from lib389.index import Indexes
+from lib389.index import Indexes, IndexKeyStats, dbscan_index_keys
 
 def test_default_index_list(topology_st):
     indexes = Indexes(topology_st.standalone)
@@ -66,4 +66,35 @@ def test_backend_index(topology_st):
     assert not found
 
 
+def test_index_key_stats():
+    longkey = '=' + 'a' * 44 + '12'
+    output = [
+        '=a                                      3\n',
+        '\t1 2 3 \n',
+        '=b                                      1\n',
+        '\t4 \n',
+        longkey + '2\n',
+        '\t5 6 \n',
+        '=c                                      (allids)\n',
+        '*aaa                                    4\n',
+        '\t1 2 3 4 \n',
+    ]
+    keys = list(dbscan_index_keys(output))
+    assert keys == [('=a', 3), ('=b', 1), (longkey, 2), ('=c', None), ('*aaa', 4)]
 
+    stats = IndexKeyStats('cn', scanlimit=2, limits=['limit=5 type=eq values=A'], top=2)
+    for (key, count) in keys:
+        stats.add(key, count)
+    assert stats.keys == 5
+    assert stats.ids == 10
+    assert stats.types['eq']['keys'] == 4
+    assert stats.largest() == [('*aaa', 4), ('=a', 3)]
+    assert stats.allids == ['=c']
+    # '=a' is under its own nsIndexIDListScanLimit
+    assert stats.over_limit == [('*aaa', 4)]
+    assert stats.histogram_dict()['1'] == 1
+    assert stats.histogram_dict()['2-10'] == 3
+    recos = stats.recommendations()
+    assert len(recos) == 2
+    assert 'ALLIDS' in recos[0]
+    assert 'remove the sub index type' in recos[1]
@@ -8,8 +8,9 @@
 #
 
 from lib389.topologies import topology_st
-from lib389._mapped_object import DSLdapObject
-from lib389.idm.group import Group
+from lib389._mapped_object import DSLdapObject, SearchSnapshot
+from lib389.backend import Backends
+from lib389.idm.group import Group, Groups
 from lib389._constants import DEFAULT_SUFFIX
 
 
@@ -21,3 +22,64 @@ def test_exists(topology_st):
     assert not group.exists()
     group.create(properties={'cn': 'MyTestGroup', 'ou': 'groups'})
     assert group.exists()
+
+
+def test_prefetch(topology_st):
+    """
+    Assert that a pinned entry answers the reads, and is fetched again after
+    a write made with the same object.
+    """
+    inst = topology_st.standalone
+    group = Group(inst, dn="cn=MyPrefetchGroup,ou=Groups," + DEFAULT_SUFFIX)
+    group.create(properties={'cn': 'MyPrefetchGroup', 'ou': 'groups'})
+
+    with group.snapshot():
+        assert group.get_attr_val_utf8('ou') == 'groups'
+        # A change made with another object is not seen until invalidate()
+        Group(inst, dn=group.dn).replace('ou', 'people')
+        assert group.get_attr_val_utf8('ou') == 'groups'
+        group.invalidate()
+        assert group.get_attr_val_utf8('ou') == 'people'
+        # Writes made with this object are seen
+        group.replace('ou', 'groups')
+        assert group.get_attr_val_utf8('ou') == 'groups'
+        assert group.present('ou', 'groups')
+    assert group._pinned_entry is None
+
+    # Only the prefetched attributes are served from the pin
+    group.prefetch(['cn'])
+    assert group.get_attr_val_utf8('ou') == 'groups'
+    group.unpin()
+
+    # Objects returned by get() and list() can be pinned by the same search
+    pinned = Groups(inst, DEFAULT_SUFFIX).get('MyPrefetchGroup', prefetch=True)
+    assert pinned._pinned_entry is not None
+    assert pinned.get_attr_val_utf8('cn') == 'MyPrefetchGroup'
+    for pinned in Groups(inst, DEFAULT_SUFFIX).list(prefetch=['cn']):
+        assert pinned._pinned_entry is not None
+    group.delete()
+
+
+def test_search_snapshot(topology_st):
+    """
+    Assert that the searches in cn=config are answered from the snapshot,
+    and that a write made with a mapped object drops it.
+    """
+    inst = topology_st.standalone
+    backend = Backends(inst).list()[0]
+    suffix = backend.get_attr_val_utf8('nsslapd-suffix')
+
+    with SearchSnapshot(inst) as snapshot:
+        assert inst._search_snapshot is snapshot
+        assert snapshot._entries
+        assert Backends(inst).get(suffix).dn == backend.dn
+        assert inst.config.get_attr_val_utf8('nsslapd-sizelimit') is not None
+        # A search outside of cn=config is sent to the server
+        assert Groups(inst, DEFAULT_SUFFIX).list() is not None
+
+        sizelimit = inst.config.get_attr_val_utf8('nsslapd-sizelimit')
+        inst.config.replace('nsslapd-sizelimit', str(int(sizelimit) + 1))
+        assert not snapshot._entries
+        assert inst.config.get_attr_val_utf8('nsslapd-sizelimit') == str(int(sizelimit) + 1)
+        inst.config.replace('nsslapd-sizelimit', sizelimit)
+    assert getattr(inst, '_search_snapshot', None) is None
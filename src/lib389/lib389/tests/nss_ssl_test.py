@@ -14,7 +14,7 @@ import logging
 
 from lib389.topologies import topology_st as topo
 
-from lib389.nss_ssl import NssSsl
+from lib389.nss_ssl import NssSsl, CA_NAME, ISSUER, USER_PREFIX
 
 DEBUGGING = os.getenv('DEBUGGING', False)
 
@@ -89,6 +89,39 @@ def test_nss_ssca_users(topo):
     assert(ssca._rsa_user_exists('non_existen') is False)
 
 
+def test_nss_cert_inventory(monkeypatch):
+    """Validate that the certificate inventory is cached until the db changes.
+
+    :id: 3d5b5a8e-6f0e-4a43-9d7c-8ad6b1e2f4c7
+    :steps:
+        1. Create an nss db with a self signed ca
+        2. Get the certificate inventory twice
+        3. Create a user certificate
+        4. Get the certificate inventory
+    :expectedresults:
+        1. It works.
+        2. The ca is listed with its subject, and the second call uses the cache.
+        3. It works.
+        4. The user certificate is listed.
+    """
+    ssca = NssSsl(dbpath='/tmp/lib389-inventory')
+    ssca.reinit()
+    ssca.create_rsa_ca()
+
+    inventory = ssca.get_cert_inventory()
+    assert [cert['nickname'] for cert in inventory] == [CA_NAME]
+    assert inventory[0]['subject'] == ISSUER
+    assert ssca.get_cert_details(CA_NAME)[1] == ISSUER
+
+    with monkeypatch.context() as m:
+        m.setattr(ssca, '_rsa_cert_list', None)
+        assert ssca.get_cert_inventory() == inventory
+
+    ssca.create_rsa_user('inventory')
+    nicknames = [cert['nickname'] for cert in ssca.get_cert_inventory()]
+    assert '%sinventory' % USER_PREFIX in nicknames
+
+
 if __name__ == "__main__":
     CURRENT_FILE = os.path.realpath(__file__)
     pytest.main("-s -vv %s" % CURRENT_FILE)
@@ -0,0 +1,98 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2024 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+#
+import json
+import time
+import ldap
+import pytest
+from random import Random
+from lib389.perftools import LatencyHistogram, LoadGenerator, PerformanceTools
+
+
+def test_latency_histogram():
+    rng = Random(389)
+    values = sorted(rng.expovariate(500) for _ in range(10000))
+    hist = LatencyHistogram()
+    for val in values:
+        hist.record(val)
+    assert hist.count == len(values)
+    for pct in (50, 99, 99.9):
+        exact = values[int(len(values) * pct / 100) - 1] * 1000000
+        assert abs(hist.percentile(pct) - exact) <= exact * 0.01 + 1
+
+    # Merged and serialized histograms give the same percentiles
+    half1 = LatencyHistogram()
+    half2 = LatencyHistogram()
+    for idx, val in enumerate(values):
+        (half1 if idx % 2 else half2).record(val)
+    merged = half1.merge(half2)
+    assert merged.percentile(99) == hist.percentile(99)
+    copy = LatencyHistogram.fromDict(json.loads(json.dumps(hist.toDict())))
+    assert copy.percentile(99.9) == hist.percentile(99.9)
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_load_generator_rate():
+    loadgen = LoadGenerator(None, 'ou=people,dc=example,dc=com', 10, mix={'search': 9, 'bind': 1},
+                            rate=100, startRate=10, rampTime=10, duration=20)
+    assert loadgen.rateAt(0) == 10
+    assert loadgen.rateAt(5) == 55
+    assert loadgen.rateAt(15) == 100
+    with pytest.raises(ValueError):
+        LoadGenerator(None, 'ou=people,dc=example,dc=com', 10, mix={'compare': 1})
+
+
+class FailingConnection:
+    # Fails the adds of the uids in "failing", or all of them
+    def __init__(self, failing=None):
+        self.failing = failing
+        self.added = []
+
+    def add_s(self, dn, attrs):
+        if self.failing is None or dn in self.failing:
+            raise ldap.ALREADY_EXISTS({'desc': 'Already exists'})
+        self.added.append(dn)
+
+    def delete_s(self, dn):
+        pass
+
+    def unbind_s(self):
+        pass
+
+
+def test_load_generator_errors():
+    parent = 'ou=people,dc=example,dc=com'
+    loadgen = LoadGenerator(None, parent, 10, mix={'add': 1}, duration=0.2)
+    # A failed add is counted, and the next one uses another uid
+    conn = FailingConnection(failing=[f'uid=load0-0,{parent}'])
+    loadgen._connect = lambda: conn
+    result = [None]
+    loadgen._worker(0, time.monotonic(), result)
+    (hists, errors, intervals, aborted) = result[0]
+    assert errors['add'] == 1
+    assert not aborted
+    assert len(conn.added) == hists['add'].count > 0
+    assert conn.added[0] == f'uid=load0-1,{parent}'
+    assert len(set(conn.added)) == len(conn.added)
+
+    # A worker whose operations keep failing stops
+    loadgen = LoadGenerator(None, parent, 10, mix={'add': 1}, duration=60)
+    loadgen.MAX_CONSECUTIVE_ERRORS = 5
+    loadgen._connect = lambda: FailingConnection()
+    result = [None]
+    loadgen._worker(0, time.monotonic(), result)
+    assert result[0][1]['add'] == 5
+    assert result[0][3]
+
+
+def test_read_log(tmp_path):
+    res = {'measure_name': 'load_search', 'nb_threads': 4, 'nbUsers': 100, 'db_lib': 'mdb', 'safemean': 1000.0}
+    old = {'measure_name': 'search_uid', 'nbUsers': 100, 'db_lib': 'bdb', 'safemean': 900.0, 'stdout': b'ldclt\n'}
+    log = tmp_path / 'log'
+    log.write_text(json.dumps(res) + '\n' + str(old) + '\nnot a result\n')
+    assert list(PerformanceTools.readLog(log)) == [res, old]
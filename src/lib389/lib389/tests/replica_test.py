@@ -12,7 +12,7 @@ import pytest
 import logging
 
 from lib389 import NoSuchEntryError
-from lib389.replica import Replicas
+from lib389.replica import Replicas, ChangelogLDIF
 from lib389.backend import Backends
 from lib389.idm.domain import Domain
 from lib389._constants import (ReplicaRole, BACKEND_SUFFIX, BACKEND_NAME, REPLICA_RUV_FILTER, CONSUMER_REPLICAID,
@@ -370,6 +370,84 @@ def test_demote_fail(topo, new_suffixes, clean_up, role_from):
             replica.demote(newrole=role_to)
 
 
+CHANGELOG_LDIF = """dn: cn=replica
+clpurgeruv: {replicageneration} 65ba1a00000000010000
+clmaxruv: {replica 1} 65ba1a00000000010000 65ba1a0a000000010000 00000000
+
+changetype: modify
+replgen: 65ba1a00000000010000
+csn: 65ba1a00000000010000
+nsuniqueid: 1
+dn: uid=a,dc=example,dc=com
+change::
+ cmVwbGFjZTogZGVzY3JpcHRpb24KZG
+ VzY3JpcHRpb246IHRlc3QKLQo=
+
+changetype: modify
+replgen: 65ba1a00000000010000
+csn: 65ba1a00000100010000
+nsuniqueid: 1
+dn: uid=A,dc=example,dc=com
+change:: cmVwbGFjZTogZGVzY3JpcHRpb24KZGVzY3JpcHRpb246IHRlc3QKLQo=
+
+changetype: add
+replgen: 65ba1a00000000010000
+csn: 65ba1a02000000020000
+nsuniqueid: 2
+dn: uid=b,dc=example,dc=com
+change:: b2JqZWN0Y2xhc3M6IHRvcAo=
+
+changetype: delete
+replgen: 65ba1a00000000010000
+csn: 65ba1a0a000000010000
+nsuniqueid: 1
+dn: uid=a,dc=example,dc=com
+"""
+
+
+def test_changelog_ldif(tmp_path):
+    """Check the filters, the decoding and the analysis of a changelog LDIF file
+
+    :feature: Replication
+    :steps: 1. Decode a changelog LDIF file
+            2. Filter the changes by CSN, time and replica ID
+            3. Analyze the changes
+    :expectedresults: 1. The base64 changes are decoded
+                      2. Only the matching changes and the RUV entry are kept
+                      3. The changes are counted per replica ID, operation and entry
+    """
+
+    cl_file = str(tmp_path / 'cl.ldif')
+    out_file = str(tmp_path / 'out.ldif')
+    with open(cl_file, 'w') as f:
+        f.write(CHANGELOG_LDIF)
+
+    ChangelogLDIF(cl_file, out_file).decode()
+    with open(out_file) as f:
+        output = f.read()
+    assert output.count('description: test') == 2
+    assert 'objectclass: top' in output
+
+    def csns(**kwargs):
+        return [csn for (csn, _) in ChangelogLDIF(cl_file, out_file, **kwargs).records()]
+
+    assert csns() == [None, '65ba1a00000000010000', '65ba1a00000100010000',
+                      '65ba1a02000000020000', '65ba1a0a000000010000']
+    assert csns(rids=[2]) == [None, '65ba1a02000000020000']
+    assert csns(min_csn='65ba1a00000100010000', max_csn='65ba1a02') == [None, '65ba1a00000100010000',
+                                                                        '65ba1a02000000020000']
+    assert csns(min_csn='2024-01-31 09:59:30') == [None, '65ba1a02000000020000', '65ba1a0a000000010000']
+    with pytest.raises(ValueError):
+        ChangelogLDIF(cl_file, out_file, max_csn='yesterday')
+
+    result = ChangelogLDIF(cl_file, None).analyze(top=1)
+    assert result['changes'] == 4
+    assert result['peak_changes_per_second'] == 2
+    assert result['operations'] == {'modify': 2, 'add': 1, 'delete': 1}
+    assert [(rid['rid'], rid['changes']) for rid in result['rids']] == [(1, 3), (2, 1)]
+    assert result['top_dns'] == [{'dn': 'uid=a,dc=example,dc=com', 'changes': 3}]
+
+
 if __name__ == "__main__":
     CURRENT_FILE = os.path.realpath(__file__)
     pytest.main("-s -v %s" % CURRENT_FILE)
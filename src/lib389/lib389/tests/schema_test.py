@@ -113,6 +113,50 @@ def test_x_origin(topo):
     assert " 'USER_DEFINED' " in str(myschema.query_attributetype("testattrtwo"))
 
 
+def test_schema_cache(topo):
+    """Test that the parsed schema is cached until the schema CSN changes
+
+    :id: 3f0d7c5e-1b2a-4c6e-9f8d-7a5b4c3d2e1f
+    :setup: Standalone Instance
+    :steps:
+        1. Query an attribute and an objectclass twice
+        2. Add an attribute type
+        3. Query the new attribute type
+        4. Remove the attribute type
+        5. Reload the schema
+    :expectedresults:
+        1. The schema is parsed once for both queries
+        2. Success
+        3. The cache was dropped and the attribute type is found
+        4. The attribute type is not found anymore
+        5. The cache is dropped, and used again once the reload is complete
+    """
+
+    schema = Schema(topo.standalone)
+    schema.query_attributetype('uid')
+    cache = topo.standalone._schema_cache
+    assert cache.csn == schema.get_schema_csn()
+    schema.query_objectclass('account')
+    assert Schema(topo.standalone).query_attributetype('cn') is not None
+    assert topo.standalone._schema_cache is cache
+
+    schema.add_attributetype({'names': ('testcacheattr',), 'oid': '8.9.10.11.12.13.20',
+                              'syntax': '1.3.6.1.4.1.1466.115.121.1.15'})
+    attrtype, must, may = schema.query_attributetype('testcacheattr')
+    assert 'testcacheattr' in attrtype
+    assert topo.standalone._schema_cache is not cache
+
+    schema.remove_attributetype('testcacheattr')
+    assert schema.query_attributetype('testcacheattr') is None
+
+    task = schema.reload()
+    assert topo.standalone._schema_cache is None
+    task.wait()
+    assert task.get_exit_code() == 0
+    schema.query_attributetype('uid')
+    assert topo.standalone._schema_cache is not None
+
+
 if __name__ == '__main__':
     # Run isolated
     # -s for DEBUG mode
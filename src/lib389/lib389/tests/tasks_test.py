@@ -0,0 +1,45 @@
+# --- BEGIN COPYRIGHT BLOCK ---
+# Copyright (C) 2023 Red Hat, Inc.
+# All rights reserved.
+#
+# License: GPL (version 3 or any later version).
+# See LICENSE for details.
+# --- END COPYRIGHT BLOCK ---
+#
+
+from lib389.topologies import topology_st
+from lib389.tasks import SyntaxValidateTask, wait_for_tasks
+from lib389._constants import DEFAULT_SUFFIX
+
+
+def test_wait_for_tasks(topology_st):
+    """
+    Assert that wait_for_tasks returns every task once it is complete, that
+    the status of a complete task is not searched again, and that it is
+    searched again once the task is created again.
+    """
+    inst = topology_st.standalone
+    tasks = []
+    for i in range(3):
+        task = SyntaxValidateTask(inst)
+        task.create(properties={'basedn': DEFAULT_SUFFIX})
+        tasks.append(task)
+
+    done = list(wait_for_tasks(tasks, timeout=60))
+    assert(sorted(t.dn for t in done) == sorted(t.dn for t in tasks))
+    for task in done:
+        assert(task.is_complete())
+        assert(task.get_exit_code() == 0)
+
+    task = SyntaxValidateTask(inst)
+    task.create(properties={'basedn': DEFAULT_SUFFIX})
+    task.wait(timeout=60)
+    assert(task.is_complete())
+
+    # The completion of a previous run is not kept by create()
+    task = SyntaxValidateTask(inst)
+    task._update_status(None)
+    assert(task.is_complete())
+    task.create(properties={'basedn': DEFAULT_SUFFIX})
+    task.wait(timeout=60)
+    assert(task.get_exit_code() == 0)